@@ -0,0 +1,284 @@
+import functools
+import itertools
+import multiprocessing
+import os
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from item_store import ItemStore
+
+ITEM_TYPES = ["text", "table", "image", "page"]
+
+
+def _worker_context():
+    # Forking while the tabula thread holds a lock can deadlock the child, so workers are
+    # started from a clean process instead (forkserver on Linux, spawn elsewhere)
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def create_directories(base_dir):
+    for dir in ["images", "text", "tables", "page_images"]:
+        os.makedirs(os.path.join(base_dir, dir), exist_ok=True)
+
+
+def _table_text(table):
+    # tabula's JSON output: a table is a list of rows, a row a list of cells with a "text" field
+    return "\n".join(" | ".join(cell.get("text", "") for cell in row) for row in table["data"])
+
+
+def extract_tables(filepath, base_dir):
+    """
+    Extract the tables of every page with a single tabula run over the whole document.
+
+    Args:
+        filepath: Path to the PDF
+        base_dir: Directory holding the "tables" output folder
+
+    Returns:
+        List of table items, in page order
+    """
+    import tabula
+
+    try:
+        tables = tabula.read_pdf(filepath, pages="all", multiple_tables=True, output_format="json")
+    except Exception as e:
+        print(f"Error extracting tables from {filepath}: {str(e)}")
+        return []
+
+    items = []
+    table_counts = defaultdict(int)
+    for table in tables:
+        table_text = _table_text(table)
+        if not table_text.strip():
+            continue
+        page_num = table["page_number"] - 1
+        table_idx = table_counts[page_num]
+        table_counts[page_num] += 1
+        table_file_name = f"{base_dir}/tables/{os.path.basename(filepath)}_table_{page_num}_{table_idx}.txt"
+        with open(table_file_name, 'w') as f:
+            f.write(table_text)
+        items.append({"page": page_num, "type": "table", "text": table_text, "path": table_file_name})
+    return items
+
+
+@functools.lru_cache(maxsize=4)
+def _text_splitter(chunk_size, chunk_overlap):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len)
+
+
+def process_text_chunks(text, text_splitter, page_num, filepath, base_dir):
+    items = []
+    for i, chunk in enumerate(text_splitter.split_text(text)):
+        text_file_name = f"{base_dir}/text/{os.path.basename(filepath)}_text_{page_num}_{i}.txt"
+        with open(text_file_name, 'w') as f:
+            f.write(chunk)
+        items.append({"page": page_num, "type": "text", "text": chunk, "path": text_file_name})
+    return items
+
+
+def _image_pixmap(doc, xref):
+    import pymupdf
+
+    pix = pymupdf.Pixmap(doc, xref)
+    # PNG only supports gray and RGB (plus alpha)
+    if pix.n - pix.alpha > 3:
+        pix = pymupdf.Pixmap(pymupdf.csRGB, pix)
+    return pix
+
+
+def process_images(doc, page, page_num, filepath, store):
+    """Returns the image items of a page, and how many of their PNGs were rendered."""
+    items = []
+    rendered = 0
+    for idx, image in enumerate(page.get_images()):
+        xref = image[0]
+        image_name = store.image_path(filepath, page_num, idx, xref)
+        rendered += store.save_png(image_name, lambda: _image_pixmap(doc, xref), filepath)
+        items.append({"page": page_num, "type": "image", "path": image_name})
+    return items, rendered
+
+
+def process_page_images(page, page_num, filepath, store):
+    """Returns the page item, and whether its PNG was rendered."""
+    page_path = store.page_path(filepath, page_num)
+    rendered = store.save_png(page_path, page.get_pixmap, filepath)
+    return [{"page": page_num, "type": "page", "path": page_path}], rendered
+
+
+def _process_pages(filepath, first_page, last_page, base_dir, chunk_size, chunk_overlap):
+    """Worker: extract text chunks, embedded images and page images for pages [first_page, last_page)."""
+    import pymupdf
+
+    store = ItemStore(base_dir)
+    text_splitter = _text_splitter(chunk_size, chunk_overlap)
+    items = []
+    timings = defaultdict(float)
+    rendered = 0
+
+    with pymupdf.open(filepath) as doc:
+        for page_num in range(first_page, last_page):
+            start_time = time.perf_counter()
+            page = doc[page_num]
+            text = page.get_text()
+            timings["text"] += time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            items.extend(process_text_chunks(text, text_splitter, page_num, filepath, base_dir))
+            timings["text"] += time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            image_items, image_rendered = process_images(doc, page, page_num, filepath, store)
+            items.extend(image_items)
+            timings["image"] += time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            page_items, page_rendered = process_page_images(page, page_num, filepath, store)
+            items.extend(page_items)
+            timings["page"] += time.perf_counter() - start_time
+
+            rendered += image_rendered + page_rendered
+
+    return items, dict(timings), rendered
+
+
+class MultimodalExtractor:
+    """
+    Extract text chunks, tables, embedded images and page images from PDFs in parallel.
+
+    tabula runs once per document, in a background thread, while the pages are split
+    into ranges that a process pool works through. Items are yielded as soon as their
+    page range is done (tables as soon as tabula finishes), and every stage records its
+    busy time so `report()` shows where the time goes.
+
+    Image and page items only carry the path of their PNG; use `store` (an ItemStore)
+    to read or base64-encode it when a request needs it. PNGs left by an earlier run
+    are reused.
+
+    Args:
+        base_dir: Output directory for the extracted files (default: "data")
+        chunk_size: Text chunk size in characters (default: 700)
+        chunk_overlap: Overlap between text chunks (default: 200)
+        max_workers: Worker processes for the pages (default: os.cpu_count())
+        pages_per_task: Pages handed to a worker at a time (default: 4)
+        extract_tables: Whether to run tabula (default: True)
+    """
+
+    def __init__(self, base_dir="data", chunk_size=700, chunk_overlap=200, max_workers=None,
+                 pages_per_task=4, extract_tables=True):
+        self.base_dir = base_dir
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+        self.extract_tables = extract_tables
+        self.store = ItemStore(base_dir)
+        # Busy seconds and items per stage, all recorded from the thread running iter_items
+        self.seconds = defaultdict(float)
+        self.stage_items = defaultdict(int)
+        self.counts = dict.fromkeys(ITEM_TYPES, 0)
+        self.rendered = 0
+        self.wall_seconds = 0.0
+
+    def _timed_tables(self, filepath):
+        start_time = time.perf_counter()
+        items = extract_tables(filepath, self.base_dir)
+        return items, time.perf_counter() - start_time
+
+    def _add_timing(self, stage, seconds, items):
+        self.seconds[stage] += seconds
+        self.stage_items[stage] += items
+
+    def _table_items(self, tables):
+        items, seconds = tables.result()
+        self._add_timing("table", seconds, len(items))
+        return self._counted(items)
+
+    def iter_items(self, filepath):
+        """
+        Yield the items of a PDF as they are extracted.
+
+        Args:
+            filepath: Path to the PDF
+
+        Yields:
+            Dicts with "page", "type" ("text", "table", "image" or "page") and "path", plus
+            "text" for text and tables
+        """
+        import pymupdf
+
+        create_directories(self.base_dir)
+        start_time = time.perf_counter()
+        with pymupdf.open(filepath) as doc:
+            num_pages = len(doc)
+
+        ranges = [(first, min(first + self.pages_per_task, num_pages))
+                  for first in range(0, num_pages, self.pages_per_task)]
+
+        with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_worker_context()) as executor, \
+                ThreadPoolExecutor(max_workers=1) as table_executor:
+            # Keep a bounded number of page ranges in flight, so results stream out in page order
+            pending = deque()
+            ranges = iter(ranges)
+            for first, last in itertools.islice(ranges, 2 * self.max_workers):
+                pending.append(executor.submit(_process_pages, filepath, first, last, self.base_dir,
+                                               self.chunk_size, self.chunk_overlap))
+
+            # tabula starts once the page workers are submitted
+            tables = table_executor.submit(self._timed_tables, filepath) if self.extract_tables else None
+            while pending:
+                items, timings, rendered = pending.popleft().result()
+                self.rendered += rendered
+                next_range = next(ranges, None)
+                if next_range is not None:
+                    pending.append(executor.submit(_process_pages, filepath, *next_range, self.base_dir,
+                                                   self.chunk_size, self.chunk_overlap))
+                for stage, seconds in timings.items():
+                    self._add_timing(stage, seconds, sum(1 for item in items if item["type"] == stage))
+                if tables is not None and tables.done():
+                    yield from self._table_items(tables)
+                    tables = None
+                yield from self._counted(items)
+
+            if tables is not None:
+                yield from self._table_items(tables)
+
+        self.wall_seconds += time.perf_counter() - start_time
+
+    def _counted(self, items):
+        for item in items:
+            self.counts[item["type"]] += 1
+            yield item
+
+    def extract(self, filepath):
+        """Extract all items of a PDF into a list."""
+        return list(self.iter_items(filepath))
+
+    def report(self):
+        counts = ", ".join(f"{item_type}: {self.counts[item_type]}" for item_type in ITEM_TYPES)
+        reused = self.counts["image"] + self.counts["page"] - self.rendered
+        lines = [f"{counts} (PNGs rendered: {self.rendered}, reused: {reused})",
+                 f"{'stage':<12}{'seconds':>10}{'items':>10}"]
+        lines += [f"{stage:<12}{seconds:>10.2f}{self.stage_items[stage]:>10}" for stage, seconds in self.seconds.items()]
+        lines.append(f"{'wall':<12}{self.wall_seconds:>10.2f}")
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extract text, tables and images from a PDF and report per-stage timings.")
+    parser.add_argument("pdf", help="PDF to extract")
+    parser.add_argument("--base-dir", default="data", help="Output directory")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--pages-per-task", type=int, default=4, help="Pages per worker task")
+    parser.add_argument("--no-tables", action="store_true", help="Skip tabula")
+    args = parser.parse_args()
+
+    extractor = MultimodalExtractor(args.base_dir, max_workers=args.workers, pages_per_task=args.pages_per_task,
+                                    extract_tables=not args.no_tables)
+    items = extractor.extract(args.pdf)
+    print(f"{len(items)} items")
+    print(extractor.report())
@@ -0,0 +1,99 @@
+import base64
+import mmap
+import os
+from contextlib import contextmanager
+
+# Multiple of 3, so every chunk base64-encodes on its own without padding
+BASE64_CHUNK_SIZE = 3 * 64 * 1024
+
+
+class ItemStore:
+    """
+    PNG files of extracted images and pages, read back only when a request needs them.
+
+    Items keep just the "path" of their PNG. The bytes are memory-mapped on access, so
+    they live in the OS page cache instead of the Python heap, and are base64-encoded
+    at request time, one item at a time. PNGs that are already on disk and newer than
+    their PDF are not rendered again.
+
+    Args:
+        base_dir: Directory holding the "images" and "page_images" folders (default: "data")
+    """
+
+    def __init__(self, base_dir="data"):
+        self.base_dir = base_dir
+
+    def image_path(self, filepath, page_num, idx, xref):
+        return f"{self.base_dir}/images/{os.path.basename(filepath)}_image_{page_num}_{idx}_{xref}.png"
+
+    def page_path(self, filepath, page_num):
+        return os.path.join(self.base_dir, f"page_images/{os.path.basename(filepath)}_page_{page_num:03d}.png")
+
+    @staticmethod
+    def is_current(path, source_path):
+        """Whether `path` exists and was written after `source_path` last changed."""
+        try:
+            return os.path.getmtime(path) >= os.path.getmtime(source_path)
+        except OSError:
+            return False
+
+    def save_png(self, path, render, source_path):
+        """
+        Render and save a PNG unless an up-to-date one is already on disk.
+
+        Args:
+            path: Output path
+            render: Function returning the pymupdf Pixmap (only called when needed)
+            source_path: The PDF the PNG comes from
+
+        Returns:
+            True if the PNG was rendered, False if the existing file was reused
+        """
+        if self.is_current(path, source_path):
+            return False
+        # Write to a temporary name first, so an interrupted run never leaves a truncated PNG behind
+        tmp_path = f"{path}.tmp"
+        render().save(tmp_path, output="png")
+        os.replace(tmp_path, path)
+        return True
+
+    @staticmethod
+    @contextmanager
+    def png(item):
+        """Memory-mapped, read-only view of an item's PNG bytes."""
+        with open(item["path"], "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield memoryview(b"")
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    yield view
+                finally:
+                    view.release()
+
+    def base64(self, item):
+        """Base64 string of an item's PNG, encoded straight from the memory map."""
+        with self.png(item) as view:
+            return base64.b64encode(view).decode("ascii")
+
+    def iter_base64(self, item, chunk_size=BASE64_CHUNK_SIZE):
+        """
+        Stream the base64 encoding of an item's PNG in chunks, e.g. into a request body.
+
+        Args:
+            item: Item with a "path"
+            chunk_size: Raw bytes per chunk, must be a multiple of 3 (default: 192 KiB)
+
+        Yields:
+            ASCII bytes that concatenate to the full base64 encoding
+        """
+        if chunk_size % 3:
+            raise ValueError("chunk_size must be a multiple of 3")
+        with self.png(item) as view:
+            for start in range(0, len(view), chunk_size):
+                yield base64.b64encode(view[start:start + chunk_size])
+
+    def nbytes(self, items):
+        """Total size of the PNGs behind a list of items."""
+        return sum(os.path.getsize(item["path"]) for item in items if item["type"] in ("image", "page"))
@@ -0,0 +1,167 @@
+import json
+import traceback
+from decimal import Decimal
+from json.encoder import c_make_encoder, encode_basestring
+
+MESSAGE_VERSION = '1.0'
+
+
+def _default(value):
+    # Types DynamoDB hands back that json cannot encode on its own
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', 'replace')
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Compact separators and no \u escapes keep the bodies the agent reads small
+_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, default=_default)
+
+# JSONEncoder.encode builds a new C encoder on every call, which costs more than the
+# encoding of a small body; this one is built once (without the circular reference check)
+_c_encode = None
+if c_make_encoder is not None:
+    _c_encode = c_make_encoder(None, _default, encode_basestring, None, ':', ',', False, False, True)
+
+
+def to_json(body):
+    if _c_encode is None:
+        return _encoder.encode(body)
+    return ''.join(_c_encode(body, 0))
+
+
+class ActionError(Exception):
+    """Raised by a handler to answer with an error status and {"error": message} as the body."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class ActionRequest:
+    """
+    The Bedrock agent event of one action group call.
+
+    parameter() and property() scan the event's list for one name and stop at the first
+    match, which is all most handlers need; the parameters and properties dicts index
+    every entry on first use, for handlers that read many of them.
+
+    Args:
+        event: The Lambda event sent by the agent
+    """
+
+    __slots__ = ('event', '_parameters', '_properties')
+
+    def __init__(self, event):
+        self.event = event
+        self._parameters = None
+        self._properties = None
+
+    @property
+    def parameters(self):
+        """Parameters by name, indexed on first use."""
+        if self._parameters is None:
+            self._parameters = {item['name']: item['value'] for item in self.event.get('parameters') or ()}
+        return self._parameters
+
+    @property
+    def properties(self):
+        """Request body properties by name, indexed on first use."""
+        if self._properties is None:
+            content = (self.event.get('requestBody') or {}).get('content', {})
+            properties = content.get('application/json', {}).get('properties') or ()
+            self._properties = {item['name']: item['value'] for item in properties}
+        return self._properties
+
+    def parameter(self, name, default=None):
+        if self._parameters is not None:
+            return self._parameters.get(name, default)
+        return _find(self.event.get('parameters'), name, default)
+
+    def property(self, name, default=None):
+        if self._properties is not None:
+            return self._properties.get(name, default)
+        content = (self.event.get('requestBody') or {}).get('content', {})
+        return _find(content.get('application/json', {}).get('properties'), name, default)
+
+
+def _find(items, name, default):
+    for item in items or ():
+        if item['name'] == name:
+            return item['value']
+    return default
+
+
+class ActionRouter:
+    """
+    Dispatch Bedrock agent action group events to handlers by (apiPath, httpMethod).
+
+    Handlers take an ActionRequest and return the response body (any JSON-encodable
+    value), which is sent to the agent as JSON. A handler can raise ActionError to answer
+    with an error status; an unknown route answers 400 and an unexpected exception 500.
+
+        router = ActionRouter()
+
+        @router.route('/claims/{claimId}/gather-evidence', 'post')
+        def gather_evidence(request):
+            return {'response': {'claimId': request.parameters['claimId']}}
+
+        def lambda_handler(event, context):
+            return router.handle(event)
+    """
+
+    def __init__(self):
+        self._routes = {}
+
+    def route(self, api_path, http_method):
+        """Decorator registering a handler for an API path and HTTP method of the action group's schema."""
+        key = (api_path, http_method.lower())
+
+        def register(handler):
+            if key in self._routes:
+                raise ValueError(f"{http_method.upper()} {api_path} already has a handler")
+            # Agents send the method in upper case; both spellings are keys, so dispatch is one lookup
+            self._routes[key] = handler
+            self._routes[(api_path, http_method.upper())] = handler
+            return handler
+
+        return register
+
+    def handle(self, event):
+        """Run the handler of an event and wrap its result in the action group response format."""
+        action_group = event['actionGroup']
+        api_path = event['apiPath']
+        http_method = event['httpMethod']
+
+        handler = self._routes.get((api_path, http_method)) or self._routes.get((api_path, http_method.lower()))
+        if handler is None:
+            status_code = 400
+            body = {'error': f"{action_group}::{http_method.upper()} {api_path} is not a valid api, try another one."}
+        else:
+            try:
+                status_code, body = 200, handler(ActionRequest(event))
+            except ActionError as e:
+                status_code, body = e.status_code, {'error': e.message}
+            except Exception as e:
+                traceback.print_exc()
+                status_code, body = 500, {'error': f"{type(e).__name__}: {e}"}
+
+        # Bedrock action group response format
+        return {
+            'messageVersion': MESSAGE_VERSION,
+            'response': {
+                'actionGroup': action_group,
+                'apiPath': api_path,
+                'httpMethod': http_method,
+                'httpStatusCode': status_code,
+                'responseBody': {
+                    'application/json': {
+                        'body': to_json(body)
+                    }
+                }
+            }
+        }
@@ -1,26 +1,23 @@
 import os
-import io
-import re
-import json
-import time
-import boto3
-import base64
 import random
 import string
-import decimal
-import requests
+from dynamodb_marshaller import CLAIM_SCHEMA, Marshaller, claim_item
+from lambda_runtime import client
+from action_router import ActionRouter
 
-# DynamoDB boto3 resource and variable
-dynamodb = boto3.resource('dynamodb',region_name=os.environ['AWS_REGION'])
+# DynamoDB variables (the boto3 clients come from lambda_runtime, created on first use)
 existing_claims_table_name = os.environ['EXISTING_CLAIMS_TABLE_NAME']
+marshaller = Marshaller(CLAIM_SCHEMA)
 
-# SNS boto3 clients and variables
+# SNS variables
 sns_topic_arn = os.environ['SNS_TOPIC_ARN']
-sns_client = boto3.client('sns')
 
 # URL
 url = os.environ['CUSTOMER_WEBSITE_URL']
 
+# API paths of api-schema/create_claim.json -> handlers
+router = ActionRouter()
+
 def claim_generator():
     print("Generating Claim ID")
 
@@ -39,13 +36,14 @@ def collect_documents(claim_id):
     subject = "New Claim ID: " + claim_id
     message = "Please upload your claim evidence and required documents in the AnyCompany Insurance Portal: " + url
 
-    sns_client.publish(
+    client('sns').publish(
         TopicArn=sns_topic_arn,
         Subject=subject,
         Message=message,
     )
 
-def create_claim(event):
+@router.route('/create-claim', 'post')
+def create_claim(request):
     print("Creating Claim")
 
     # TODO: Claim creation logic
@@ -57,11 +55,10 @@ def create_claim(event):
     # Update DynamoDB
     print("Updating DynamoDB")
 
-    # Convert JSON document to DynamoDB format
-    dynamodb_item = json.loads(json.dumps(new_claim_data), parse_float=decimal.Decimal)
-    existing_claims_table = dynamodb.Table(existing_claims_table_name)
-    response = existing_claims_table.put_item(
-        Item=dynamodb_item
+    # Convert the claim to DynamoDB format, with the open-claims index key of an Open claim
+    response = client('dynamodb').put_item(
+        TableName=existing_claims_table_name,
+        Item=marshaller.marshal(claim_item(new_claim_data))
     ) 
 
     collect_documents(generated_claim)
@@ -71,33 +68,4 @@ def create_claim(event):
     }
  
 def lambda_handler(event, context):
-    response_code = 200
-    action_group = event['actionGroup']
-    api_path = event['apiPath']
-    
-    # API path routing
-    if api_path == '/create-claim':
-        body = create_claim(event)
-    else:
-        response_code = 400
-        body = {"{}::{} is not a valid api, try another one.".format(action_group, api_path)}
-
-    response_body = {
-        'application/json': {
-            'body': str(body)
-        }
-    }
-    
-    # Bedrock action group response format
-    action_response = {
-        "messageVersion": "1.0",
-        "response": {
-            'actionGroup': action_group,
-            'apiPath': api_path,
-            'httpMethod': event['httpMethod'],
-            'httpStatusCode': response_code,
-            'responseBody': response_body
-        }
-    }
- 
-    return action_response
\ No newline at end of file
+    return router.handle(event)
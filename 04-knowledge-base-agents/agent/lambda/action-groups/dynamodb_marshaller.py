@@ -0,0 +1,232 @@
+import math
+from decimal import Decimal
+
+# Field types a schema can name, besides a nested schema dict for maps
+SCALAR_TYPES = ('S', 'N', 'BOOL', 'B', 'NULL')
+
+
+def _number(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        raise ValueError(f"DynamoDB numbers must be finite, got {value}")
+    return {'N': str(value)}
+
+
+def _int(value):
+    return {'N': str(value)}
+
+
+def _string(value):
+    return {'S': value}
+
+
+def _bool(value):
+    return {'BOOL': value}
+
+
+def _null(value):
+    return {'NULL': True}
+
+
+def _binary(value):
+    return {'B': bytes(value)}
+
+
+def _list(value):
+    # An empty set has no DynamoDB form; inside a list it becomes NULL to keep the positions
+    converters = _CONVERTERS
+    return {'L': [converters.get(type(element), to_attribute)(element) or _NULL for element in value]}
+
+
+def _map(value):
+    converters = _CONVERTERS
+    attributes = {}
+    for key, element in value.items():
+        attribute = converters.get(type(element), to_attribute)(element)
+        if attribute is not None:
+            attributes[str(key)] = attribute
+    return {'M': attributes}
+
+
+def _set(value):
+    # DynamoDB has no empty sets: None tells the enclosing map to leave the field out
+    if not value:
+        return None
+    if all(type(element) is str for element in value):
+        return {'SS': sorted(value)}
+    return {'NS': sorted(_number(element)['N'] for element in value)}
+
+
+_NULL = {'NULL': True}
+
+
+# Exact type -> converter; bool gets its own entry, so it is never taken for an int
+_CONVERTERS = {
+    str: _string,
+    bool: _bool,
+    int: _int,
+    float: _number,
+    Decimal: _number,
+    type(None): _null,
+    list: _list,
+    tuple: _list,
+    dict: _map,
+    set: _set,
+    frozenset: _set,
+    bytes: _binary,
+    bytearray: _binary,
+}
+
+
+def _subclass(value):
+    # Subclasses (e.g. OrderedDict, IntEnum) take the slower isinstance path
+    for base, converter in _CONVERTERS.items():
+        if isinstance(value, base):
+            return converter(value)
+    raise TypeError(f"Cannot convert {type(value).__name__} to a DynamoDB attribute")
+
+
+def to_attribute(value):
+    """
+    Convert a Python value to a DynamoDB attribute value.
+
+    str -> S, bool -> BOOL, int/float/Decimal -> N, None -> NULL, list/tuple -> L,
+    dict -> M, set of str -> SS, set of numbers -> NS, bytes -> B. Returns None for an
+    empty set, which DynamoDB cannot store.
+    """
+    return _CONVERTERS.get(type(value), _subclass)(value)
+
+
+def from_attribute(attribute):
+    """Convert a DynamoDB attribute value back to Python (numbers become int or Decimal)."""
+    (kind, value), = attribute.items()
+    if kind == 'S' or kind == 'BOOL' or kind == 'B':
+        return value
+    if kind == 'N':
+        return int(value) if value.lstrip('-').isdigit() else Decimal(value)
+    if kind == 'M':
+        return {key: from_attribute(element) for key, element in value.items()}
+    if kind == 'L':
+        return [from_attribute(element) for element in value]
+    if kind == 'NULL':
+        return None
+    if kind == 'SS' or kind == 'BS':
+        return set(value)
+    if kind == 'NS':
+        return {int(n) if n.lstrip('-').isdigit() else Decimal(n) for n in value}
+    raise ValueError(f"Unknown DynamoDB attribute type {kind}")
+
+
+def _plan(field_type):
+    # Converter for one schema entry, built once per marshaller
+    if isinstance(field_type, dict):
+        fields = compile_schema(field_type)
+        return lambda value: {'M': _marshal_fields(value, fields)}
+    if field_type == 'S':
+        return lambda value: {'S': str(value)}
+    if field_type == 'N':
+        return _number
+    if field_type == 'BOOL':
+        return lambda value: {'BOOL': bool(value)}
+    if field_type == 'SS':
+        return lambda value: {'SS': sorted({str(element) for element in value})} if value else None
+    if field_type == 'NS':
+        return lambda value: {'NS': sorted({_number(element)['N'] for element in value})} if value else None
+    if field_type == 'L':
+        return _list
+    if field_type in SCALAR_TYPES:
+        return to_attribute
+    raise ValueError(f"Unknown field type {field_type!r}")
+
+
+def compile_schema(schema):
+    """Precompute a converter per field of a schema ({field: type or nested schema})."""
+    return {field: _plan(field_type) for field, field_type in schema.items()}
+
+
+def _marshal_fields(item, fields):
+    converters = _CONVERTERS
+    attributes = {}
+    for key, value in item.items():
+        if value is None:
+            attributes[key] = _NULL
+            continue
+        converter = fields.get(key) or converters.get(type(value), _subclass)
+        attribute = converter(value)
+        if attribute is not None:
+            attributes[key] = attribute
+    return attributes
+
+
+class Marshaller:
+    """
+    Convert items between plain Python and DynamoDB's attribute-value format.
+
+    Fields named in the schema use a converter built once up front; for example
+    {'policyId': 'S', 'claimAmount': {'total': 'N'}, 'tags': 'SS'} keeps policy ids as
+    strings even if they look numeric and stores tags as a string set. All other fields
+    are converted from their Python type.
+
+    Args:
+        schema: Optional dict of field name -> 'S', 'N', 'BOOL', 'B', 'NULL', 'SS', 'NS',
+            'L' or a nested schema dict for a map
+    """
+
+    def __init__(self, schema=None):
+        self.schema = schema or {}
+        self._fields = compile_schema(self.schema)
+
+    def marshal(self, item):
+        """Python dict -> DynamoDB item ({'field': {'S': ...}, ...})."""
+        return _marshal_fields(item, self._fields)
+
+    def put_request(self, item):
+        return {'PutRequest': {'Item': self.marshal(item)}}
+
+    @staticmethod
+    def unmarshal(item):
+        """DynamoDB item -> Python dict."""
+        return {key: from_attribute(value) for key, value in item.items()}
+
+
+# Key of the sparse open-claims index: the claim id while a claim is Open, absent otherwise,
+# so closed claims cost no index writes or storage
+OPEN_CLAIM_ATTRIBUTE = 'openClaimId'
+OPEN_STATUS = 'Open'
+
+# Attribute types of the claims table; everything else is inferred from the values
+CLAIM_SCHEMA = {
+    'claimId': 'S',
+    'policyId': 'S',
+    'status': 'S',
+    'pendingDocuments': 'L',
+    OPEN_CLAIM_ATTRIBUTE: 'S',
+}
+
+
+def claim_item(claim):
+    """Copy of a claim with the open-claims index key set or dropped to match its status."""
+    item = dict(claim)
+    if item.get('status') == OPEN_STATUS:
+        item[OPEN_CLAIM_ATTRIBUTE] = item['claimId']
+    else:
+        item.pop(OPEN_CLAIM_ATTRIBUTE, None)
+    return item
+
+
+def status_update(claim_id, status):
+    """
+    UpdateItem arguments that set a claim's status and keep the open-claims index key in step:
+    set while the claim is Open, removed when it is closed.
+    """
+    names = {'#s': 'status', '#o': OPEN_CLAIM_ATTRIBUTE}
+    if status == OPEN_STATUS:
+        return {
+            'UpdateExpression': 'SET #s = :s, #o = :o',
+            'ExpressionAttributeNames': names,
+            'ExpressionAttributeValues': {':s': {'S': status}, ':o': {'S': claim_id}},
+        }
+    return {
+        'UpdateExpression': 'SET #s = :s REMOVE #o',
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': {':s': {'S': status}},
+    }
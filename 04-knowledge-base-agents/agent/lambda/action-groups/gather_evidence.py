@@ -1,30 +1,17 @@
 import os
-import io
-import re
-import json
-import time
-import boto3
-import botocore
-import base64
 import string
 import secrets
+from lambda_runtime import client
+from action_router import ActionError, ActionRouter
 
-# Other boto3 clients and variables
-boto3_session = boto3.Session(region_name=os.environ['AWS_REGION'])
-dynamodb = boto3.resource('dynamodb',region_name=os.environ['AWS_REGION'])
-
-# SNS boto3 clients and variables
+# SNS variables (the boto3 client comes from lambda_runtime, created on first use)
 sns_topic_arn = os.environ['SNS_TOPIC_ARN']
-sns_client = boto3.client('sns')
 
 # URL
 url = os.environ['CUSTOMER_WEBSITE_URL']
 
-def get_named_parameter(event, name):
-    return next(item for item in event['parameters'] if item['name'] == name)['value']
-
-def get_named_property(event, name):
-    return next(item for item in event['requestBody']['content']['application/json']['properties'] if item['name'] == name)['value']
+# API paths of api-schema/gather_evidence.json -> handlers
+router = ActionRouter()
 
 def generate_upload_id(length):
     print("Generating Upload ID")
@@ -43,17 +30,18 @@ def send_evidence_url(claim_id):
     subject = "Gathering Evidence for Claim ID: " + claim_id
     message = "Please upload your claim evidence in the AnyCompany Insurance Portal: " + url
 
-    sns_client.publish(
+    client('sns').publish(
         TopicArn=sns_topic_arn,
         Subject=subject,
         Message=message,
     )
 
-def gather_evidence(event):
+@router.route('/claims/{claimId}/gather-evidence', 'post')
+def gather_evidence(request):
     print("Gathering Evidence")
 
     # Extracting claimId value from event parameters
-    claim_id = get_named_parameter(event, 'claimId')
+    claim_id = request.parameter('claimId')
     '''
     for param in event.get('parameters', []):
         if param.get('name') == 'claimId': 
@@ -62,6 +50,9 @@ def gather_evidence(event):
 
     print("Claim ID: " + str(claim_id))
 
+    if not claim_id:
+        raise ActionError('Missing claimId parameter')
+
     send_evidence_url(claim_id)
 
     # Generate a random string of length 7 (to match the format '12a3456')
@@ -77,33 +68,4 @@ def gather_evidence(event):
     }
 
 def lambda_handler(event, context):
-    response_code = 200
-    action_group = event['actionGroup']
-    api_path = event['apiPath']
-    
-    # API path routing
-    if api_path == '/claims/{claimId}/gather-evidence':
-        body = gather_evidence(event)
-    else:
-        response_code = 400
-        body = {"{}::{} is not a valid api, try another one.".format(action_group, api_path)}
-
-    response_body = {
-        'application/json': {
-            'body': str(body)
-        }
-    }
-    
-    # Bedrock action group response format
-    action_response = {
-        "messageVersion": "1.0",
-        "response": {
-            'actionGroup': action_group,
-            'apiPath': api_path,
-            'httpMethod': event['httpMethod'],
-            'httpStatusCode': response_code,
-            'responseBody': response_body
-        }
-    }
- 
-    return action_response
\ No newline at end of file
+    return router.handle(event)
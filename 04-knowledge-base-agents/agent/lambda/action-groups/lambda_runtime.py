@@ -0,0 +1,42 @@
+import os
+import threading
+
+# Connection settings shared by every client: a small keep-alive pool (one per
+# concurrent request of the function), short connect timeouts and standard retries
+CLIENT_CONFIG = {
+    'max_pool_connections': 10,
+    'tcp_keepalive': True,
+    'connect_timeout': 2,
+    'read_timeout': 10,
+    'retries': {'mode': 'standard', 'max_attempts': 3},
+}
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def client(service_name):
+    """
+    The boto3 client for a service, created on first use and reused for the life of the container.
+
+    boto3 itself is only imported here, so functions that never reach AWS (e.g. an invalid
+    apiPath) do not pay for it during init.
+    """
+    service_client = _clients.get(service_name)
+    if service_client is None:
+        with _lock:
+            service_client = _clients.get(service_name)
+            if service_client is None:
+                import boto3
+                from botocore.config import Config
+
+                service_client = boto3.client(service_name, region_name=os.environ.get('AWS_REGION'),
+                                              config=Config(**CLIENT_CONFIG))
+                _clients[service_name] = service_client
+    return service_client
+
+
+def reset():
+    """Forget the cached clients (e.g. between tests that mock AWS)."""
+    with _lock:
+        _clients.clear()
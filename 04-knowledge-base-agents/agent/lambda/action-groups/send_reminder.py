@@ -1,45 +1,81 @@
 import os
-import io
-import re
-import json
-import time
-import boto3
-import base64
 import string
 import secrets
-import requests
 import ast
+from dynamodb_marshaller import from_attribute
+from lambda_runtime import client
+from action_router import ActionError, ActionRouter
 
-# DynamoDB boto3 clients and variables
-dynamodb = boto3.resource('dynamodb',region_name=os.environ['AWS_REGION'])
-dynamodb_client = boto3.client('dynamodb')
+# DynamoDB variables (the boto3 clients come from lambda_runtime, created on first use)
 existing_claims_table_name = os.environ['EXISTING_CLAIMS_TABLE_NAME']
 
-# SNS boto3 clients and variables
-sns_topic_arn = os.environ['SNS_TOPIC_ARN']
-sns_client = boto3.client('sns')
+# Sparse global secondary index (keys only) on the attribute only open claims carry, see
+# dynamodb_marshaller.claim_item, and the number of parallel scan segments used when the
+# table does not have that index
+open_claims_index_name = os.environ.get('OPEN_CLAIMS_INDEX_NAME', 'open-claims-index')
+open_claims_scan_segments = int(os.environ.get('OPEN_CLAIMS_SCAN_SEGMENTS', '4'))
 
-def get_named_parameter(event, name):
-    return next(item for item in event['parameters'] if item['name'] == name)['value']
+# SNS variables
+sns_topic_arn = os.environ['SNS_TOPIC_ARN']
 
-def get_named_property(event, name):
-    return next(item for item in event['requestBody']['content']['application/json']['properties'] if item['name'] == name)['value']
+# API paths of api-schema/send_reminder.json -> handlers
+router = ActionRouter()
 
-def open_claims():
-    print("Finding Open Claims")
+def query_open_claim_ids():
+    # The sparse index holds only the open claims, so reading all of it (following
+    # LastEvaluatedKey across pages) needs no key condition or filter on status
+    paginator = client('dynamodb').get_paginator('scan')
+    pages = paginator.paginate(
+        TableName=existing_claims_table_name,
+        IndexName=open_claims_index_name,
+        ProjectionExpression='claimId'
+    )
+    for page in pages:
+        for item in page.get('Items', []):
+            yield item['claimId']['S']
 
-    response = dynamodb_client.scan(
+def scan_open_claim_ids_segment(segment, total_segments):
+    paginator = client('dynamodb').get_paginator('scan')
+    pages = paginator.paginate(
         TableName=existing_claims_table_name,
+        Segment=segment,
+        TotalSegments=total_segments,
         FilterExpression='#s = :s',
         ExpressionAttributeNames={'#s': 'status'},
-        ExpressionAttributeValues={
-            ':s': {'S': 'Open'}
-        }
+        ExpressionAttributeValues={':s': {'S': 'Open'}},
+        ProjectionExpression='claimId'
     )
+    return [item['claimId']['S'] for page in pages for item in page.get('Items', []) if 'claimId' in item]
+
+def scan_open_claim_ids(total_segments=None):
+    # Fallback for tables without the open-claims index: a full, paginated scan split into parallel segments
+    from concurrent.futures import ThreadPoolExecutor
+
+    total_segments = total_segments or open_claims_scan_segments
+    with ThreadPoolExecutor(max_workers=total_segments) as executor:
+        for claim_ids in executor.map(scan_open_claim_ids_segment, range(total_segments), [total_segments] * total_segments):
+            yield from claim_ids
+
+def iter_open_claim_ids():
+    # Streams the open claim ids, from the open-claims index when the table has one
+    from botocore.exceptions import ClientError
+
+    try:
+        yield from query_open_claim_ids()
+    except ClientError as e:
+        # Missing index: rejected on the first page, before any id was yielded
+        # (ValidationException from DynamoDB, ResourceNotFoundException from local emulators)
+        if e.response['Error']['Code'] not in ('ValidationException', 'ResourceNotFoundException'):
+            raise
+        print(f"Index {open_claims_index_name} not available ({e.response['Error']['Message']}), scanning instead")
+        yield from scan_open_claim_ids()
+
+@router.route('/open-claims', 'get')
+def open_claims(request=None):
+    print("Finding Open Claims")
 
-    items = response.get('Items', [])
-    # Extracting the 'claimId' attribute for items with 'status' equal to 'Open'
-    open_claim_ids = [item['claimId']['S'] for item in items if 'claimId' in item]
+    open_claim_ids = list(iter_open_claim_ids())
+    print(f"Open claims: {len(open_claim_ids)}")
 
     return open_claim_ids
 
@@ -60,7 +96,7 @@ def send_reminder(claim_id, pending_documents):
     message = "Here is a reminder to upload your pending documents: " + str(pending_documents)
     print("Email Message: " + message)
 
-    sns_client.publish(
+    client('sns').publish(
         TopicArn=sns_topic_arn,
         Subject=subject,
         Message=message,
@@ -73,11 +109,12 @@ def send_reminder(claim_id, pending_documents):
     return reminder_id
 
 ## Agent runtime Retrieve API with boto3 client ##
-def notify_pending_documents(event):
+@router.route('/claims/{claimId}/notify-pending-documents', 'post')
+def notify_pending_documents(request):
     print("Notify Pending Documents")
     
     # Extracting claimId value from event parameters
-    claim_id = get_named_parameter(event, 'claimId')
+    claim_id = request.parameter('claimId')
     '''claim_id = None
     for param in event.get('parameters', []):
         if param.get('name') == 'claimId': 
@@ -87,14 +124,11 @@ def notify_pending_documents(event):
     print("Claim ID: " + str(claim_id))
 
     if not claim_id:
-        return {
-            'statusCode': 400,
-            'response': 'Missing claimId parameter'
-        }
+        raise ActionError('Missing claimId parameter')
 
     try:
         # Define the query parameters
-        response = dynamodb_client.get_item(
+        response = client('dynamodb').get_item(
             TableName=existing_claims_table_name,
             Key={
                 'claimId': {'S': claim_id}
@@ -103,29 +137,23 @@ def notify_pending_documents(event):
         )
         print(f"ddb pending documents query response: {response}")
 
-        # Extract pendingDocuments attribute from the DynamoDB response
-        pending_documents_attr = response.get('Item', {}).get('pendingDocuments', {})
-        
-        if 'S' in pending_documents_attr:
-            # pendingDocuments is a string, so we parse it as a Python list literal
-            pending_documents_response = ast.literal_eval(pending_documents_attr['S'])
-        else:
-            # pendingDocuments is a list
-            pending_documents_response = pending_documents_attr.get('L', [])
+        # Extract pendingDocuments attribute from the DynamoDB response (a list, or a string set)
+        pending_documents_attr = response.get('Item', {}).get('pendingDocuments')
+        pending_documents = from_attribute(pending_documents_attr) if pending_documents_attr else []
 
-        print(f"ddb pending documents extract: {pending_documents_response}")
+        if isinstance(pending_documents, str):
+            # Items written by older loaders hold the list as a Python list literal string
+            pending_documents = ast.literal_eval(pending_documents)
 
-        # Transform the list of dictionaries to a list of strings if it's in 'L' format
-        pending_documents = [doc['S'] for doc in pending_documents_response if isinstance(doc, dict) and 'S' in doc]
-        if not pending_documents:  # if pending_documents_response was a string, use it directly
-            pending_documents = pending_documents_response
+        pending_documents = sorted(pending_documents) if isinstance(pending_documents, set) else list(pending_documents)
+        print(f"ddb pending documents extract: {pending_documents}")
 
         # Join the list of strings into a single string, separated by ", "
         formatted_pending_documents = ", ".join(pending_documents)
 
     except Exception as e:
         print(f"Error returning DynamoDB table query results: {e}")
-        return []
+        raise ActionError(f"Could not read the pending documents of claim {claim_id}", status_code=500)
 
     # Generate a random string of length 7 (to match the format '12a3456')
     reminder_tracking_id = send_reminder(claim_id, formatted_pending_documents)
@@ -140,33 +168,4 @@ def notify_pending_documents(event):
     }
  
 def lambda_handler(event, context):
-    response_code = 200
-    action_group = event['actionGroup']
-    api_path = event['apiPath']
-
-    if api_path == '/open-claims':
-        body = open_claims() 
-    elif api_path == '/claims/{claimId}/notify-pending-documents':
-        body = notify_pending_documents(event)
-    else:
-        response_code = 400
-        body = {"{}::{} is not a valid api, try another one.".format(action_group, api_path)}
-    
-    response_body = {
-        'application/json': {
-            'body': str(body)
-        }
-    }
-    
-    action_response = {
-        "messageVersion": "1.0",
-        "response": {
-            'actionGroup': action_group,
-            'apiPath': api_path,
-            'httpMethod': event['httpMethod'],
-            'httpStatusCode': response_code,
-            'responseBody': response_body
-        }
-    }
- 
-    return action_response
\ No newline at end of file
+    return router.handle(event)
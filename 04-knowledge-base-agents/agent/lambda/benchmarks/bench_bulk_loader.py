@@ -0,0 +1,101 @@
+"""
+Throughput of the data loader's bulk writes, on a moto-mocked DynamoDB table.
+
+Generates an NDJSON seed file from claims.json and loads it with BulkLoader at
+different concurrency levels. (The previous loader sent every item in a single
+batch_write_item call, which DynamoDB rejects above 25 items; moto does not
+enforce that limit, so it is not timed here.)
+Network round trips and partially processed batches are simulated, since moto
+answers instantly and always processes every item.
+
+    pip install boto3 moto
+    python bench_bulk_loader.py --claims 20000 --latency-ms 20 --unprocessed 0.1
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import boto3
+from moto import mock_aws
+
+DATA_LOADER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data-loader')
+TABLE_NAME = 'claims'
+
+
+def write_seed_file(path, num_claims):
+    with open(os.path.join(DATA_LOADER_DIR, 'claims.json')) as f:
+        templates = json.load(f)
+    with open(path, 'w') as f:
+        for i in range(num_claims):
+            claim = dict(templates[i % len(templates)], claimId=f'claim-{i:07d}')
+            f.write(json.dumps(claim) + '\n')
+
+
+def simulate_network(client, latency_ms, unprocessed_ratio, rng):
+    def before_call(**kwargs):
+        time.sleep(latency_ms / 1000)
+
+    def after_call(parsed, **kwargs):
+        # Hand part of the batch back as unprocessed, as DynamoDB does under load (puts are idempotent)
+        request_items = kwargs['context'].get('request_items')
+        if request_items and rng.random() < unprocessed_ratio:
+            parsed['UnprocessedItems'] = {TABLE_NAME: request_items[:rng.randint(1, len(request_items))]}
+
+    def remember_request(params, context, **kwargs):
+        context['request_items'] = params['RequestItems'][TABLE_NAME]
+
+    client.meta.events.register('before-parameter-build.dynamodb.BatchWriteItem', remember_request)
+    client.meta.events.register('before-send.dynamodb.BatchWriteItem', before_call)
+    client.meta.events.register('after-call.dynamodb.BatchWriteItem', after_call)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--claims', type=int, default=20000, help='Claims in the seed file')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Simulated round trip per call')
+    parser.add_argument('--unprocessed', type=float, default=0.1, help='Share of calls returning UnprocessedItems')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8, 16], help='Concurrency levels to compare')
+    args = parser.parse_args()
+
+    os.environ.update({
+        'AWS_REGION': 'us-east-1', 'AWS_DEFAULT_REGION': 'us-east-1',
+        'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing',
+    })
+    sys.path.insert(0, DATA_LOADER_DIR)
+    from bulk_loader import BulkLoader, iter_records
+
+    seed_path = os.path.join(tempfile.mkdtemp(), 'claims.ndjson')
+    write_seed_file(seed_path, args.claims)
+
+    with mock_aws():
+        client = boto3.client('dynamodb', config=boto3.session.Config(max_pool_connections=max(args.workers)))
+        client.create_table(
+            TableName=TABLE_NAME,
+            AttributeDefinitions=[{'AttributeName': 'claimId', 'AttributeType': 'S'}],
+            KeySchema=[{'AttributeName': 'claimId', 'KeyType': 'HASH'}],
+            BillingMode='PAY_PER_REQUEST',
+        )
+        simulate_network(client, args.latency_ms, args.unprocessed, random.Random(0))
+
+        def put_requests():
+            for claim in iter_records(seed_path):
+                yield {'PutRequest': {'Item': {key: {'S': str(value)} for key, value in claim.items()}}}
+
+        print(f"{args.claims} claims, {args.latency_ms:.0f} ms per call, "
+              f"{args.unprocessed:.0%} of calls partially unprocessed")
+
+        print(f"{'workers':>8}{'items':>10}{'batches':>10}{'retries':>10}{'seconds':>10}{'items/s':>10}")
+        for workers in args.workers:
+            stats = BulkLoader(client, TABLE_NAME, max_workers=workers, base_delay=0.01).load(put_requests())
+            pages = client.get_paginator('scan').paginate(TableName=TABLE_NAME, Select='COUNT')
+            assert sum(page['Count'] for page in pages) == args.claims
+            print(f"{workers:>8}{stats['items']:>10}{stats['batches']:>10}{stats['retries']:>10}"
+                  f"{stats['seconds']:>10.2f}{stats['items_per_second']:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Local cold-start harness for the action-group Lambdas.
+
+Every run starts a fresh interpreter (like a new Lambda container) and measures:
+  init     importing the handler module (Lambda's "Init Duration")
+  ready    init plus creating every AWS client the function uses
+  rss      peak memory of the process afterwards
+
+Point --source-dir at another checkout of action-groups/ to compare versions.
+
+    pip install boto3 requests
+    python bench_cold_start.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ACTION_GROUPS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'action-groups')
+
+FUNCTIONS = {
+    'create_claim': ['dynamodb', 'sns'],
+    'gather_evidence': ['sns'],
+    'send_reminder': ['dynamodb', 'sns'],
+}
+
+ENVIRONMENT = {
+    'AWS_REGION': 'us-east-1',
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+    'EXISTING_CLAIMS_TABLE_NAME': 'claims',
+    'SNS_TOPIC_ARN': 'arn:aws:sns:us-east-1:123456789012:reminders',
+    'CUSTOMER_WEBSITE_URL': 'https://example.com/upload',
+}
+
+# Runs inside the fresh interpreter
+DRIVER = '''
+import importlib, json, resource, sys, time
+module_name, services = sys.argv[1], sys.argv[2].split(',')
+start = time.perf_counter()
+module = importlib.import_module(module_name)
+init = time.perf_counter() - start
+if hasattr(module, 'client'):
+    for service in services:
+        module.client(service)
+ready = time.perf_counter() - start
+print(json.dumps({'init': init, 'ready': ready, 'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+'''
+
+
+def measure(module_name, services, source_dir):
+    env = dict(os.environ, **ENVIRONMENT, PYTHONDONTWRITEBYTECODE='1')
+    output = subprocess.run([sys.executable, '-c', DRIVER, module_name, ','.join(services)],
+                            cwd=source_dir, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10, help='Fresh interpreters per function')
+    parser.add_argument('--source-dir', default=ACTION_GROUPS_DIR, help='Folder with the handler modules')
+    args = parser.parse_args()
+
+    source_dir = os.path.abspath(args.source_dir)
+    print(f"{source_dir}, median of {args.runs} runs")
+    print(f"{'function':<18}{'init ms':>10}{'ready ms':>10}{'rss MB':>10}")
+    for module_name, services in FUNCTIONS.items():
+        # One warm-up run, so the OS file cache is the same for every version
+        measure(module_name, services, source_dir)
+        runs = [measure(module_name, services, source_dir) for _ in range(args.runs)]
+        print(f"{module_name:<18}{statistics.median(r['init'] for r in runs) * 1000:>10.0f}"
+              f"{statistics.median(r['ready'] for r in runs) * 1000:>10.0f}"
+              f"{statistics.median(r['rss'] for r in runs) / 1024:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
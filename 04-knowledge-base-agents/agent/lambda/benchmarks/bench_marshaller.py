@@ -0,0 +1,130 @@
+"""
+Microbenchmark of the DynamoDB marshalling used by the Lambdas.
+
+Compares the data loader's previous hand-written conversion, boto3's TypeSerializer
+(with the JSON/Decimal round trip create_claim used) and dynamodb_marshaller, on the
+seed claims: time per item, estimated stored item size and attributes lost.
+
+    pip install boto3
+    python bench_marshaller.py --repeat 2000
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import timeit
+from collections import Counter
+from decimal import Decimal
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(LAMBDA_DIR, 'action-groups'))
+
+from dynamodb_marshaller import CLAIM_SCHEMA, Marshaller  # noqa: E402
+
+
+def previous_to_item(claim):
+    # The data loader's conversion before dynamodb_marshaller
+    item = {}
+    for key, value in claim.items():
+        if value:
+            if isinstance(value, dict):
+                nested_attributes = {}
+                for nested_key, nested_value in value.items():
+                    if isinstance(nested_value, str):
+                        nested_attributes[nested_key] = {'S': nested_value}
+                    elif isinstance(nested_value, int):
+                        nested_attributes[nested_key] = {'N': str(nested_value)}
+                    elif isinstance(nested_value, dict):
+                        nested_attributes[nested_key] = {'M': {k: str(v) if isinstance(v, int) else v for k, v in nested_value.items()}}
+                item[key] = {'M': nested_attributes}
+            else:
+                item[key] = {'S': str(value)}
+    return item
+
+
+def type_serializer_to_item():
+    from boto3.dynamodb.types import TypeSerializer
+    serializer = TypeSerializer()
+
+    def to_item(claim):
+        claim = json.loads(json.dumps(claim), parse_float=Decimal)
+        return {key: serializer.serialize(value) for key, value in claim.items()}
+    return to_item
+
+
+def attribute_size(attribute):
+    # Approximation of DynamoDB's item size rules (names are counted by the caller)
+    (kind, value), = attribute.items()
+    if kind == 'S':
+        return len(value.encode('utf-8'))
+    if kind == 'N':
+        digits = len(value.lstrip('-').replace('.', '').strip('0')) or 1
+        return math.ceil(digits / 2) + 1
+    if kind in ('BOOL', 'NULL'):
+        return 1
+    if kind == 'L':
+        return 3 + sum(1 + attribute_size(element) for element in value)
+    if kind == 'M':
+        return 3 + sum(1 + len(name) + attribute_size(element) for name, element in value.items())
+    return sum(len(str(element)) for element in value)
+
+
+def item_size(item):
+    return sum(len(name) + attribute_size(value) for name, value in item.items())
+
+
+def leaf_count(value):
+    if isinstance(value, dict):
+        return sum(leaf_count(element) for element in value.values())
+    if isinstance(value, list):
+        return sum(leaf_count(element) for element in value) or 1
+    return 1
+
+
+def attribute_types(attributes, counts):
+    # Counts the leaf attribute types of an item (M and L are walked, empty L counts as one)
+    for attribute in attributes:
+        if not isinstance(attribute, dict):
+            counts['raw'] += 1  # the previous loader left some nested values unconverted
+            continue
+        (kind, value), = attribute.items()
+        if kind == 'M':
+            attribute_types(value.values(), counts)
+        elif kind == 'L' and value:
+            attribute_types(value, counts)
+        else:
+            counts[kind] += 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=2000, help='Passes over the seed claims')
+    args = parser.parse_args()
+
+    with open(os.path.join(LAMBDA_DIR, 'data-loader', 'claims.json')) as f:
+        claims = json.load(f)
+    expected_leaves = sum(leaf_count(claim) for claim in claims)
+
+    converters = {
+        'previous loader': previous_to_item,
+        'boto3 TypeSerializer': type_serializer_to_item(),
+        'Marshaller(CLAIM_SCHEMA)': Marshaller(CLAIM_SCHEMA).marshal,
+    }
+
+    print(f"{len(claims)} claims x {args.repeat}, {expected_leaves} values in the seed")
+    print(f"{'':<26}{'us/item':>10}{'bytes/item':>12}{'values kept':>13}  types")
+    for name, to_item in converters.items():
+        seconds = min(timeit.repeat(lambda: [to_item(claim) for claim in claims], number=args.repeat, repeat=3))
+        items = [to_item(claim) for claim in claims]
+        counts = Counter()
+        for item in items:
+            attribute_types(item.values(), counts)
+        print(f"{name:<26}{seconds / (args.repeat * len(claims)) * 1e6:>10.2f}"
+              f"{sum(item_size(item) for item in items) / len(items):>12.0f}"
+              f"{sum(counts.values()):>13}  {dict(sorted(counts.items()))}")
+
+
+if __name__ == '__main__':
+    main()
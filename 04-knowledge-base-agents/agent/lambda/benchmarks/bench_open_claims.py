@@ -0,0 +1,144 @@
+"""
+Items read per open-claims lookup, on a moto-mocked DynamoDB table.
+
+Compares the old single Scan call, the sparse open-claims index and the parallel
+segmented Scan fallback of send_reminder.open_claims(), then closes a claim and checks
+that it leaves the index.
+
+    pip install boto3 moto
+    python bench_open_claims.py --claims 20000 --open-ratio 0.05
+"""
+import argparse
+import importlib
+import os
+import sys
+import time
+
+import boto3
+from moto import mock_aws
+
+ACTION_GROUPS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'action-groups')
+sys.path.insert(0, ACTION_GROUPS_DIR)
+
+from dynamodb_marshaller import CLAIM_SCHEMA, OPEN_CLAIM_ATTRIBUTE, Marshaller, claim_item, status_update  # noqa: E402
+INDEX_NAME = 'open-claims-index'
+
+
+def create_table(client, name, with_index):
+    kwargs = {}
+    attributes = [{'AttributeName': 'claimId', 'AttributeType': 'S'}]
+    if with_index:
+        attributes.append({'AttributeName': OPEN_CLAIM_ATTRIBUTE, 'AttributeType': 'S'})
+        kwargs['GlobalSecondaryIndexes'] = [{
+            'IndexName': INDEX_NAME,
+            'KeySchema': [{'AttributeName': OPEN_CLAIM_ATTRIBUTE, 'KeyType': 'HASH'}],
+            'Projection': {'ProjectionType': 'KEYS_ONLY'},
+        }]
+    client.create_table(
+        TableName=name,
+        AttributeDefinitions=attributes,
+        KeySchema=[{'AttributeName': 'claimId', 'KeyType': 'HASH'}],
+        BillingMode='PAY_PER_REQUEST',
+        **kwargs
+    )
+
+
+def seed(client, name, num_claims, open_ratio, padding):
+    # Every 1/open_ratio-th claim is open; padding makes the items about as large as real claims
+    open_every = max(1, round(1 / open_ratio))
+    marshaller = Marshaller(CLAIM_SCHEMA)
+    requests = []
+    for i in range(num_claims):
+        requests.append(marshaller.put_request(claim_item({
+            'claimId': f'claim-{i:07d}',
+            'status': 'Open' if i % open_every == 0 else 'Closed',
+            'notes': 'x' * padding,
+        })))
+        if len(requests) == 25:
+            client.batch_write_item(RequestItems={name: requests})
+            requests = []
+    if requests:
+        client.batch_write_item(RequestItems={name: requests})
+    return len(range(0, num_claims, open_every))
+
+
+class CallCounter:
+    """Counts DynamoDB calls and the items each one read, from botocore's after-call events."""
+
+    def __init__(self, client):
+        self.calls = 0
+        self.items_read = 0
+        client.meta.events.register('after-call.dynamodb.Query', self._count)
+        client.meta.events.register('after-call.dynamodb.Scan', self._count)
+
+    def _count(self, parsed, **kwargs):
+        self.calls += 1
+        self.items_read += parsed.get('ScannedCount', 0)
+
+    def reset(self):
+        self.calls = 0
+        self.items_read = 0
+
+
+def legacy_open_claims(module):
+    # The previous implementation: one Scan call, LastEvaluatedKey ignored
+    response = module.client('dynamodb').scan(
+        TableName=module.existing_claims_table_name,
+        FilterExpression='#s = :s',
+        ExpressionAttributeNames={'#s': 'status'},
+        ExpressionAttributeValues={':s': {'S': 'Open'}}
+    )
+    return [item['claimId']['S'] for item in response.get('Items', []) if 'claimId' in item]
+
+
+def measure(label, fn, counter, expected):
+    counter.reset()
+    start_time = time.perf_counter()
+    claim_ids = fn()
+    elapsed = time.perf_counter() - start_time
+    print(f"{label:<28}{len(claim_ids):>8}/{expected:<8}{counter.calls:>8}{counter.items_read:>12}{elapsed * 1000:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--claims', type=int, default=20000, help='Claims in the table')
+    parser.add_argument('--open-ratio', type=float, default=0.05, help='Fraction of open claims')
+    parser.add_argument('--padding', type=int, default=1000, help='Bytes of filler per claim')
+    parser.add_argument('--segments', type=int, default=4, help='Parallel scan segments')
+    args = parser.parse_args()
+
+    os.environ.update({
+        'AWS_REGION': 'us-east-1', 'AWS_DEFAULT_REGION': 'us-east-1',
+        'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing',
+        'EXISTING_CLAIMS_TABLE_NAME': 'claims-indexed',
+        'SNS_TOPIC_ARN': 'arn:aws:sns:us-east-1:123456789012:reminders',
+        'OPEN_CLAIMS_INDEX_NAME': INDEX_NAME,
+        'OPEN_CLAIMS_SCAN_SEGMENTS': str(args.segments),
+    })
+
+    with mock_aws():
+        client = boto3.client('dynamodb')
+        create_table(client, 'claims-indexed', with_index=True)
+        create_table(client, 'claims-no-index', with_index=False)
+        expected = seed(client, 'claims-indexed', args.claims, args.open_ratio, args.padding)
+        seed(client, 'claims-no-index', args.claims, args.open_ratio, args.padding)
+
+        send_reminder = importlib.import_module('send_reminder')
+        counter = CallCounter(send_reminder.client('dynamodb'))
+
+        print(f"{args.claims} claims, {expected} open, ~{args.padding} bytes each")
+        print(f"{'':<28}{'found':>8}{'':<9}{'calls':>8}{'items read':>12}{'ms':>10}")
+        measure('single scan (previous)', lambda: legacy_open_claims(send_reminder), counter, expected)
+        measure('open-claims index', send_reminder.open_claims, counter, expected)
+
+        # Closing a claim removes its index key, so it drops out of the index
+        client.update_item(TableName='claims-indexed', Key={'claimId': {'S': 'claim-0000000'}},
+                           **status_update('claim-0000000', 'Closed'))
+        measure('after closing one claim', send_reminder.open_claims, counter, expected - 1)
+
+        send_reminder.existing_claims_table_name = 'claims-no-index'
+        measure(f'segmented scan ({args.segments} seg.)', send_reminder.open_claims, counter, expected)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Microbenchmark of the action group dispatch and response encoding.
+
+Compares the previous lambda_handler (if/elif on apiPath, a linear search per parameter,
+str(body)) with action_router, on agent events carrying a claimId and a growing number of
+other parameters: time per event, response body size and whether json.loads reads it back.
+
+    python bench_router.py --repeat 20000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(LAMBDA_DIR, 'action-groups'))
+
+from action_router import ActionRouter  # noqa: E402
+
+API_PATHS = ['/open-claims', '/claims/{claimId}/notify-pending-documents', '/claims/{claimId}/gather-evidence']
+
+
+def response_body(claim_id):
+    # Shape of notify_pending_documents' answer
+    return {
+        'response': {
+            'claimId': claim_id,
+            'sendReminderTrackingId': 'a1B2c3D',
+            'sendReminderStatus': 'InProgress',
+            'pendingDocuments': 'Drivers License, Registration, Evidence'
+        }
+    }
+
+
+def make_event(api_path, extra_parameters):
+    parameters = [{'name': f'param{i}', 'type': 'string', 'value': str(i)} for i in range(extra_parameters)]
+    parameters.append({'name': 'claimId', 'type': 'string', 'value': 'claim-042'})
+    return {
+        'messageVersion': '1.0',
+        'actionGroup': 'send-reminder',
+        'apiPath': api_path,
+        'httpMethod': 'POST',
+        'parameters': parameters,
+    }
+
+
+def get_named_parameter(event, name):
+    return next(item for item in event['parameters'] if item['name'] == name)['value']
+
+
+def previous_handler(event, context):
+    # lambda_handler before action_router
+    response_code = 200
+    action_group = event['actionGroup']
+    api_path = event['apiPath']
+
+    if api_path == API_PATHS[0]:
+        body = []
+    elif api_path == API_PATHS[1]:
+        body = response_body(get_named_parameter(event, 'claimId'))
+    elif api_path == API_PATHS[2]:
+        body = response_body(get_named_parameter(event, 'claimId'))
+    else:
+        response_code = 400
+        body = {"{}::{} is not a valid api, try another one.".format(action_group, api_path)}
+
+    return {
+        "messageVersion": "1.0",
+        "response": {
+            'actionGroup': action_group,
+            'apiPath': api_path,
+            'httpMethod': event['httpMethod'],
+            'httpStatusCode': response_code,
+            'responseBody': {'application/json': {'body': str(body)}}
+        }
+    }
+
+
+def build_router():
+    router = ActionRouter()
+    router.route(API_PATHS[0], 'get')(lambda request: [])
+    for api_path in API_PATHS[1:]:
+        router.route(api_path, 'post')(lambda request: response_body(request.parameter('claimId')))
+    return lambda event, context: router.handle(event)
+
+
+def parses_as_json(body):
+    try:
+        json.loads(body)
+        return True
+    except ValueError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20000, help='Events per measurement')
+    args = parser.parse_args()
+
+    router_handler = build_router()
+    print(f"{'parameters':>10}  {'method':<10}{'us/event':>10}{'body bytes':>12}  json")
+    for extra_parameters in (0, 10, 50):
+        event = make_event(API_PATHS[1], extra_parameters)
+        for name, handler in (('previous', previous_handler), ('router', router_handler)):
+            # Best of five runs, the least disturbed by other processes
+            seconds = min(timeit.repeat(lambda: handler(event, None), number=args.repeat, repeat=5))
+            body = handler(event, None)['response']['responseBody']['application/json']['body']
+            print(f"{extra_parameters + 1:>10}  {name:<10}{seconds / args.repeat * 1e6:>10.2f}"
+                  f"{len(body.encode('utf-8')):>12}  {parses_as_json(body)}")
+
+
+if __name__ == '__main__':
+    main()
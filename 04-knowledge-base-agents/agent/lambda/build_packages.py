@@ -0,0 +1,42 @@
+"""
+Rebuild the Lambda deployment packages from the sources next to them.
+
+    python build_packages.py
+
+Run it after editing any of the functions, before uploading the agent/ folder to S3.
+"""
+import os
+import zipfile
+
+LAMBDA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules shared by the functions, kept in action-groups/ and copied into the packages
+SHARED_MODULES = ['../action-groups/dynamodb_marshaller.py']
+ACTION_GROUP_MODULES = SHARED_MODULES + ['lambda_runtime.py', 'action_router.py']
+
+# Deployment package -> files it contains (relative to the package's folder, stored flat)
+PACKAGES = {
+    'action-groups/create_claim.zip': ['create_claim.py'] + ACTION_GROUP_MODULES,
+    'action-groups/gather_evidence.zip': ['gather_evidence.py'] + ACTION_GROUP_MODULES,
+    'action-groups/send_reminder.zip': ['send_reminder.py'] + ACTION_GROUP_MODULES,
+    'data-loader/loader_deployment_package.zip': ['index.py', 'bulk_loader.py', 'claims.json'] + SHARED_MODULES,
+}
+
+
+def build(package, files):
+    package_path = os.path.join(LAMBDA_DIR, package)
+    source_dir = os.path.dirname(package_path)
+    with zipfile.ZipFile(package_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name in files:
+            path = os.path.normpath(os.path.join(source_dir, name))
+            info = zipfile.ZipInfo.from_file(path, arcname=os.path.basename(path))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o100644 << 16
+            with open(path, 'rb') as f:
+                archive.writestr(info, f.read())
+    return package_path
+
+
+if __name__ == '__main__':
+    for package, files in PACKAGES.items():
+        print(f"{build(package, files)}: {', '.join(files)}")
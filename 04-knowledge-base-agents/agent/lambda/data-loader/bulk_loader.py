@@ -0,0 +1,194 @@
+import json
+import random
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger()
+
+# BatchWriteItem accepts at most 25 put/delete requests per call
+MAX_BATCH_SIZE = 25
+
+THROTTLING_ERRORS = ('ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded')
+
+
+def iter_records(path, chunk_size=1 << 16):
+    """
+    Stream the records of a JSON array file or an NDJSON file (one JSON object per line),
+    without loading the whole file.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r') as file:
+        buffer = file.read(chunk_size)
+        position = len(buffer) - len(buffer.lstrip())
+        if buffer[position:position + 1] == '[':
+            position += 1
+        eof = not buffer
+
+        while True:
+            # Skip separators between records
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            if position == len(buffer) and eof:
+                return
+
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # The record continues past the buffer: read more and try again
+                chunk = file.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+
+            yield record
+            position = end
+
+
+def iter_batches(requests, key_names, batch_size=MAX_BATCH_SIZE):
+    """
+    Group PutRequests into batches of at most `batch_size`.
+
+    DynamoDB rejects a batch that writes the same key twice, so a repeated key replaces
+    the earlier request of the same batch (the last write wins, as with single puts).
+    """
+    batch = {}
+    for request in requests:
+        item = request['PutRequest']['Item']
+        key = tuple(json.dumps(item[name], sort_keys=True) for name in key_names)
+        batch.pop(key, None)
+        batch[key] = request
+        if len(batch) == batch_size:
+            yield list(batch.values())
+            batch = {}
+    if batch:
+        yield list(batch.values())
+
+
+class BulkLoader:
+    """
+    Write items into a DynamoDB table with concurrent BatchWriteItem calls.
+
+    Requests are sent in batches of 25, with up to `max_workers` batches in flight.
+    UnprocessedItems and throttled calls are retried with full-jitter exponential backoff,
+    until `max_attempts` or the deadline given to load() is reached.
+
+    Args:
+        client: boto3 DynamoDB client
+        table_name: Table to write to
+        key_names: Names of the table's key attributes (default: ('claimId',))
+        max_workers: Concurrent BatchWriteItem calls (default: 8)
+        max_attempts: Attempts per batch before giving up (default: 8)
+        base_delay: First backoff delay in seconds (default: 0.05)
+        max_delay: Longest backoff delay in seconds (default: 5)
+    """
+
+    def __init__(self, client, table_name, key_names=('claimId',), max_workers=8, max_attempts=8,
+                 base_delay=0.05, max_delay=5.0):
+        self.client = client
+        self.table_name = table_name
+        self.key_names = key_names
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def _backoff(self, attempt, pending, deadline=None):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if deadline is not None:
+            # Sleep at most until the deadline, and do not retry past it
+            delay = max(0.0, min(delay, deadline - time.monotonic()))
+        time.sleep(delay)
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TimeoutError(f"{len(pending)} items still unprocessed when the deadline was reached")
+
+    def write_batch(self, requests, deadline=None):
+        """
+        Write one batch until every request is processed.
+
+        Args:
+            requests: At most 25 PutRequests
+            deadline: Optional time.monotonic() value; no retry is started (or slept towards) past it
+
+        Returns:
+            The number of retries
+        """
+        pending = requests
+        for attempt in range(self.max_attempts):
+            try:
+                response = self.client.batch_write_item(RequestItems={self.table_name: pending})
+            except ClientError as e:
+                if e.response['Error']['Code'] not in THROTTLING_ERRORS:
+                    raise
+                self._backoff(attempt, pending, deadline)
+                continue
+
+            pending = response.get('UnprocessedItems', {}).get(self.table_name, [])
+            if not pending:
+                return attempt
+            self._backoff(attempt, pending, deadline)
+
+        raise RuntimeError(f"{len(pending)} items still unprocessed after {self.max_attempts} attempts")
+
+    def load(self, requests, deadline=None):
+        """
+        Write a stream of PutRequests.
+
+        Args:
+            requests: Iterable of {'PutRequest': {'Item': ...}} in DynamoDB JSON
+            deadline: Optional time.monotonic() value after which loading stops with a TimeoutError
+
+        Returns:
+            Dict with items, batches, retries, seconds and items_per_second
+        """
+        stats = {'items': 0, 'batches': 0, 'retries': 0}
+        start_time = time.perf_counter()
+
+        def remaining():
+            if deadline is None:
+                return None
+            seconds = deadline - time.monotonic()
+            if seconds <= 0:
+                raise TimeoutError(f"Stopped after {stats['items']} items, the deadline was reached")
+            return seconds
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        in_flight = {}
+
+        def collect(futures):
+            for future in futures:
+                batch_size = in_flight.pop(future)
+                stats['retries'] += future.result()
+                stats['items'] += batch_size
+                stats['batches'] += 1
+
+        try:
+            for batch in iter_batches(requests, self.key_names):
+                remaining()
+                # Keep at most two batches per worker queued, so large files stream through
+                while len(in_flight) >= 2 * self.max_workers:
+                    done, _ = wait(in_flight, timeout=remaining(), return_when=FIRST_COMPLETED)
+                    collect(done)
+                in_flight[executor.submit(self.write_batch, batch, deadline)] = len(batch)
+
+            while in_flight:
+                done, _ = wait(in_flight, timeout=remaining(), return_when=FIRST_COMPLETED)
+                collect(done)
+        except BaseException:
+            # Drop the queued batches instead of waiting for them; the running ones stop
+            # retrying at the deadline on their own
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
+
+        stats['seconds'] = time.perf_counter() - start_time
+        stats['items_per_second'] = stats['items'] / stats['seconds'] if stats['seconds'] else 0.0
+        logger.info("Loaded %d items in %d batches (%d retries) in %.2fs: %.0f items/s",
+                    stats['items'], stats['batches'], stats['retries'], stats['seconds'], stats['items_per_second'])
+        return stats
@@ -1,8 +1,12 @@
 import json
 import os
+import time
 import boto3
 import logging
 import cfnresponse
+from botocore.config import Config
+from bulk_loader import BulkLoader, iter_records
+from dynamodb_marshaller import CLAIM_SCHEMA, Marshaller, claim_item
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -10,7 +14,24 @@ logger.setLevel(logging.INFO)
 EXISTING_CLAIMS_TABLE_NAME = os.environ.get('EXISTING_CLAIMS_TABLE_NAME')
 REGION = os.environ.get('AWS_REGION')
 
-dynamodb = boto3.client('dynamodb', region_name=REGION)
+# Seed file: a JSON array or NDJSON (one claim per line)
+CLAIMS_FILE = os.environ.get('CLAIMS_FILE', 'claims.json')
+LOADER_MAX_WORKERS = int(os.environ.get('LOADER_MAX_WORKERS', '8'))
+
+# Time kept back to report to CloudFormation before the function times out
+RESPONSE_MARGIN_SECONDS = 5
+
+# One pooled connection per concurrent batch
+dynamodb = boto3.client('dynamodb', region_name=REGION,
+                        config=Config(max_pool_connections=LOADER_MAX_WORKERS, retries={'mode': 'standard'}))
+
+# Numbers are stored as N, booleans as BOOL and lists as L; the keys and status stay strings
+marshaller = Marshaller(CLAIM_SCHEMA)
+
+def put_requests(path):
+    # Open claims get the key of the sparse open-claims index, the others are left out of it
+    for claim in iter_records(path):
+        yield marshaller.put_request(claim_item(claim))
 
 def lambda_handler(event, context):
     logger.info("Received event: %s", json.dumps(event))
@@ -18,35 +39,15 @@ def lambda_handler(event, context):
     request_type = event.get('RequestType')
     if request_type == 'Create' or request_type == 'Update':
         try:
-            with open('claims.json', 'r') as file:
-                claims_data = json.load(file)
-            
-            items = []
-            for claim in claims_data:
-                item = {}
-                for key, value in claim.items():
-                    if value:
-                        if isinstance(value, dict):
-                            nested_attributes = {}
-                            for nested_key, nested_value in value.items():
-                                if isinstance(nested_value, str):
-                                    nested_attributes[nested_key] = {'S': nested_value}
-                                elif isinstance(nested_value, int):
-                                    nested_attributes[nested_key] = {'N': str(nested_value)}
-                                elif isinstance(nested_value, dict):
-                                    nested_attributes[nested_key] = {'M': {k: str(v) if isinstance(v, int) else v for k, v in nested_value.items()}}
-                            item[key] = {'M': nested_attributes}
-                        else:
-                            item[key] = {'S': str(value)}
-                items.append({'PutRequest': {'Item': item}})
-            
-            response = dynamodb.batch_write_item(
-                RequestItems={
-                    EXISTING_CLAIMS_TABLE_NAME: items
-                }
-            )
-            logger.info("Batch write response: %s", json.dumps(response))
-            cfnresponse.send(event, context, cfnresponse.SUCCESS, responseData={})
+            # Stop early enough to still send the response, instead of leaving the stack waiting
+            deadline = time.monotonic() + context.get_remaining_time_in_millis() / 1000 - RESPONSE_MARGIN_SECONDS
+
+            loader = BulkLoader(dynamodb, EXISTING_CLAIMS_TABLE_NAME, max_workers=LOADER_MAX_WORKERS)
+            stats = loader.load(put_requests(CLAIMS_FILE), deadline=deadline)
+
+            logger.info("Bulk load stats: %s", json.dumps(stats))
+            cfnresponse.send(event, context, cfnresponse.SUCCESS,
+                             responseData={'ItemsLoaded': stats['items'], 'ItemsPerSecond': round(stats['items_per_second'])})
         except Exception as e:
             logger.error("Failed to load data into DynamoDB table: %s", str(e))
             cfnresponse.send(event, context, cfnresponse.FAILED, responseData={"Error": str(e)})
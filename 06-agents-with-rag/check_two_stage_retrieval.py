@@ -0,0 +1,105 @@
+import shutil
+import tempfile
+
+import numpy as np
+
+from local_multivector_store import LocalMultiVectorStore
+from multivector_compression import synthetic_corpus
+from two_stage_retrieval import TwoStageRetriever, two_stage_point_vectors, two_stage_query
+
+
+def main(num_pages=600, k=5):
+    """
+    Check TwoStageRetriever.from_store against LocalMultiVectorStore.query_points on a
+    collection with deleted and replaced points:
+
+    1. Exact two-stage search (every live page a candidate) returns the store's ids and scores.
+    2. With few candidates, flat and HNSW, no deleted or replaced page is ever returned,
+       even for queries that copy a dead page's own tokens.
+    3. two_stage_query, as the notebooks call it, rebuilds its retriever after a delete
+       and matches query_points with num_candidates=None.
+    4. two_stage_query on an in-memory Qdrant collection with two-stage vectors.
+    """
+    root = tempfile.mkdtemp()
+    try:
+        docs, queries = synthetic_corpus(num_pages, 64, num_queries=20)
+        store = LocalMultiVectorStore(root)
+        store.create_collection("check", vector_size=128)
+        store.upsert("check", [{"id": i, "vector": doc, "payload": {"page": i}} for i, doc in enumerate(docs)])
+
+        # Delete every third page and replace every fifth one with a noisy copy of another page
+        rng = np.random.default_rng(1)
+        deleted = list(range(0, num_pages, 3))
+        replaced = [i for i in range(1, num_pages, 5) if i % 3]
+        store.delete("check", deleted)
+        store.upsert("check", [{"id": i, "payload": {"page": i},
+                                "vector": docs[(i + 7) % num_pages] + 0.05 * rng.normal(size=docs[0].shape)}
+                               for i in replaced])
+
+        # Queries copying dead segments, scaled like raw model output so normalization matters
+        dead_queries = [docs[i][:20] for i in deleted[:10]] + [docs[i][:20] for i in replaced[:10]]
+        queries = [q * rng.uniform(0.5, 3.0, size=(len(q), 1)).astype(np.float32) for q in queries + dead_queries]
+        live_ids = set(range(num_pages)) - set(deleted)
+
+        for index_type in ["flat", "hnsw"]:
+            retriever = TwoStageRetriever.from_store(store, "check", index_type=index_type)
+            assert retriever.num_live_pages == len(live_ids), (retriever.num_live_pages, len(live_ids))
+
+            # 1. Exact search matches the store
+            for query in queries:
+                expected = store.query_points("check", query, limit=k).points
+                found = retriever.query_points(query, limit=k, num_candidates=retriever.num_pages).points
+                assert [p.id for p in found] == [p.id for p in expected], (index_type, found, expected)
+                assert np.allclose([p.score for p in found], [p.score for p in expected], atol=1e-4)
+
+            # 2. The prefilter only hands out live pages
+            for query in queries:
+                candidates = retriever.candidates(retriever.prepare_query(query), num_candidates=20)
+                assert all(retriever.ids[i] is not None for i in candidates), (index_type, candidates)
+                found = retriever.query_points(query, limit=k, num_candidates=20).points
+                assert {p.id for p in found} <= live_ids, (index_type, found)
+            print(f"{index_type}: {len(queries)} queries, {retriever.num_live_pages} live of {retriever.num_pages} pages")
+
+        # 3. The notebook entry point on the local store
+        for query in queries[:5]:
+            exact = two_stage_query(store, "check", query, limit=k, num_candidates=None).points
+            found = two_stage_query(store, "check", query, limit=k, num_candidates=num_pages).points
+            assert [p.id for p in found] == [p.id for p in exact], (found, exact)
+        store.delete("check", [found[0].id])
+        found_after = two_stage_query(store, "check", queries[4], limit=k, num_candidates=num_pages).points
+        assert found[0].id not in {p.id for p in found_after}, found_after
+        print("two_stage_query on LocalMultiVectorStore: OK")
+
+        # 4. The notebook entry point on Qdrant
+        check_qdrant(docs[:200], queries[:5], k)
+
+        print("OK")
+    finally:
+        store.close()
+        shutil.rmtree(root)
+
+
+def check_qdrant(docs, queries, k):
+    try:
+        from qdrant_client import QdrantClient
+        from qdrant_client.http import models
+    except ImportError:
+        print("two_stage_query on Qdrant: skipped, qdrant_client is not installed")
+        return
+
+    from two_stage_retrieval import qdrant_two_stage_vectors_config
+
+    client = QdrantClient(":memory:")
+    client.create_collection("check", vectors_config=qdrant_two_stage_vectors_config(128))
+    client.upsert("check", [models.PointStruct(id=i, vector=two_stage_point_vectors(doc), payload={"page": i})
+                            for i, doc in enumerate(docs)])
+    for query in queries:
+        exact = two_stage_query(client, "check", query, limit=k, num_candidates=None).points
+        found = two_stage_query(client, "check", query, limit=k, num_candidates=len(docs)).points
+        assert [p.id for p in found] == [p.id for p in exact], (found, exact)
+        assert len(two_stage_query(client, "check", query, limit=k, num_candidates=20).points) == k
+    print("two_stage_query on Qdrant: OK")
+
+
+if __name__ == "__main__":
+    main()
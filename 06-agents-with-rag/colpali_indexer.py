@@ -0,0 +1,407 @@
+import itertools
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections import defaultdict
+
+import torch
+
+from multivector_compression import pool_tokens
+from two_stage_retrieval import two_stage_point_vectors
+from utils import DEFAULT_DPI, iter_pdf_pages, list_pdfs, page_point_id, pdf_file_hash
+
+_DONE = object()
+
+
+def _prefetch(iterable, maxsize):
+    """
+    Run a generator in a background thread and hand its items over through a bounded queue.
+
+    The bounded queue is what keeps memory flat: a fast stage blocks as soon as it is
+    `maxsize` items ahead of the stage consuming it. Closing the consumer early (e.g.
+    after max_pages) stops the thread.
+    """
+    q = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                while not stop.is_set():
+                    try:
+                        q.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            q.put(_DONE)
+        except BaseException as e:
+            q.put(e)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+def _batched(iterable, batch_size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        yield batch
+
+
+class IndexCheckpoint:
+    """
+    JSON record of the pages already upserted, so a restarted job continues where it stopped.
+
+    Pages are keyed by the hash of their PDF, so renaming a file keeps its progress and
+    editing it starts that document over. The tuned batch size is stored as well.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.batch_size = None
+        self.documents = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.batch_size = data.get("batch_size")
+            self.documents = {
+                file_hash: {"file_name": doc["file_name"], "pages": set(doc["pages"])}
+                for file_hash, doc in data.get("documents", {}).items()
+            }
+
+    def done_pages(self):
+        """Dict of file hash -> set of upserted page numbers (see iter_pdf_pages)."""
+        return {file_hash: doc["pages"] for file_hash, doc in self.documents.items()}
+
+    def mark(self, items):
+        for item in items:
+            doc = self.documents.setdefault(item["file_hash"], {"file_name": item["file_name"], "pages": set()})
+            doc["pages"].add(item["page_num"])
+
+    def forget(self, file_hashes):
+        for file_hash in file_hashes:
+            self.documents.pop(file_hash, None)
+
+    def save(self):
+        if not self.path:
+            return
+        data = {
+            "batch_size": self.batch_size,
+            "documents": {
+                file_hash: {"file_name": doc["file_name"], "pages": sorted(doc["pages"])}
+                for file_hash, doc in self.documents.items()
+            },
+        }
+        # Write to a temporary file first so a crash never leaves a truncated checkpoint
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+
+def autotune_batch_size(model, processor, images, max_batch_size=32, min_gain=1.1):
+    """
+    Pick the ColPali batch size with the best pages/second on this machine.
+
+    Doubles the batch size from 1 while throughput improves by at least `min_gain`,
+    and stops at the first out-of-memory error. On CPU throughput usually flattens
+    out after a few pages per batch, and larger batches only cost memory.
+
+    Args:
+        model: ColPali model
+        processor: ColPaliProcessor
+        images: Sample page images (PIL); at most max_batch_size are used
+        max_batch_size: Largest batch size tried (default: 32)
+        min_gain: Required throughput ratio to keep doubling (default: 1.1)
+
+    Returns:
+        Tuple of (batch size, {batch size: pages per second})
+    """
+    images = list(images)[:max_batch_size]
+    if not images:
+        raise ValueError("autotune_batch_size needs at least one sample image")
+    results = {}
+    best = 1
+    batch_size = 1
+
+    while batch_size <= len(images):
+        batch = images[:batch_size]
+        try:
+            with torch.no_grad():
+                inputs = processor.process_images(batch).to(model.device)
+                model(**inputs)  # Warm-up for this shape
+                start_time = time.perf_counter()
+                model(**inputs)
+                elapsed = time.perf_counter() - start_time
+        except RuntimeError as e:
+            if "out of memory" not in str(e).lower():
+                raise
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            break
+
+        results[batch_size] = batch_size / elapsed
+        if batch_size > 1 and results[batch_size] < results[best] * min_gain:
+            break
+        best = batch_size
+        batch_size *= 2
+
+    return best, results
+
+
+class ColPaliIndexer:
+    """
+    Index a folder of PDFs into a Qdrant multivector collection with ColPali.
+
+    Rendering, `process_images`, the model forward pass and the Qdrant upsert run as
+    overlapping stages connected by bounded queues, so the model does not wait for
+    poppler and the upload does not wait for the model.
+
+    Args:
+        model: ColPali model
+        processor: ColPaliProcessor
+        client: Qdrant client
+        collection_name: Collection created with a MAX_SIM multivector config
+        checkpoint_path: JSON file recording upserted pages (default: no checkpoint)
+        batch_size: Pages per forward pass (default: auto-tuned, then kept in the checkpoint)
+        queue_size: Batches buffered between stages (default: 4)
+        cache_dir: Optional page image cache passed to iter_pdf_pages
+        dpi: Render resolution (default: 200)
+        size: Optional pdf2image size cap
+        render_workers: Render processes (default: number of CPUs)
+        upsert_retries: Attempts per upsert before giving up (default: 5)
+        checkpoint_every: Save the checkpoint after this many upserted batches (default: 1)
+        pool_factor: Pool each page's patch embeddings by this factor before upserting,
+            e.g. 3 to store a third of the vectors (default: no pooling)
+        pooling: "hierarchical" or "kmeans" (default: "hierarchical")
+        two_stage: Also store a mean-pooled vector per page, for a collection created with
+            two_stage_retrieval.qdrant_two_stage_vectors_config (default: False)
+
+    Combine pooling with a quantized collection (see multivector_compression.qdrant_vectors_config)
+    to shrink the index further.
+    """
+
+    def __init__(self, model, processor, client, collection_name, checkpoint_path=None, batch_size=None,
+                 queue_size=4, cache_dir=None, dpi=DEFAULT_DPI, size=None, render_workers=None,
+                 upsert_retries=5, checkpoint_every=1, pool_factor=None, pooling="hierarchical",
+                 two_stage=False):
+        self.model = model
+        self.processor = processor
+        self.client = client
+        self.collection_name = collection_name
+        self.checkpoint = IndexCheckpoint(checkpoint_path)
+        self.batch_size = batch_size or self.checkpoint.batch_size
+        self.queue_size = queue_size
+        self.cache_dir = cache_dir
+        self.dpi = dpi
+        self.size = size
+        self.render_workers = render_workers
+        self.upsert_retries = upsert_retries
+        self.checkpoint_every = checkpoint_every
+        self.pool_factor = pool_factor
+        self.pooling = pooling
+        self.two_stage = two_stage
+        # Busy seconds and pages per stage; every stage runs in a single thread, so no lock is needed
+        self.seconds = defaultdict(float)
+        self.pages = defaultdict(int)
+        self.wall_seconds = 0.0
+
+    def _time(self, stage, start_time, pages=1):
+        self.seconds[stage] += time.perf_counter() - start_time
+        self.pages[stage] += pages
+
+    def _preprocess(self, batch):
+        start_time = time.perf_counter()
+        inputs = self.processor.process_images([item["image"] for item in batch])
+        self._time("process", start_time, len(batch))
+        # The images are not needed after this point, drop them to keep the queues small
+        return [{k: v for k, v in item.items() if k != "image"} for item in batch], inputs
+
+    def _forward(self, batch, inputs):
+        start_time = time.perf_counter()
+        with torch.no_grad():
+            embeddings = self.model(**inputs.to(self.model.device))
+        embeddings = embeddings.cpu().float().numpy()
+        self._time("forward", start_time, len(batch))
+
+        if self.pool_factor:
+            start_time = time.perf_counter()
+            embeddings = [pool_tokens(embedding, self.pool_factor, self.pooling) for embedding in embeddings]
+            self._time("pool", start_time, len(batch))
+        return batch, embeddings
+
+    def _upsert(self, batch, embeddings):
+        from qdrant_client.http import models
+
+        points = [
+            models.PointStruct(
+                id=page_point_id(item["file_hash"], item["page_num"]),
+                vector=two_stage_point_vectors(embedding) if self.two_stage else embedding.tolist(),
+                payload={
+                    "doc_id": item["doc_id"],
+                    "page_num": item["page_num"],
+                    "file_name": item["file_name"],
+                    "source": "pdf archive",
+                },
+            )
+            for item, embedding in zip(batch, embeddings)
+        ]
+
+        start_time = time.perf_counter()
+        for attempt in range(self.upsert_retries):
+            try:
+                self.client.upsert(collection_name=self.collection_name, points=points)
+                break
+            except Exception as e:
+                if attempt == self.upsert_retries - 1:
+                    raise
+                delay = min(30, 2 ** attempt) * random.uniform(0.5, 1.0)
+                print(f"Upsert failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+        self._time("upsert", start_time, len(batch))
+
+    def _timed_pages(self, pages):
+        # Render time is the wait for the next page, since rendering runs in a process pool
+        while True:
+            start_time = time.perf_counter()
+            item = next(pages, None)
+            if item is None:
+                return
+            self._time("render", start_time)
+            yield item
+
+    def remove_deleted_documents(self, pdf_folder):
+        """Delete points of PDFs that are no longer in the folder (or were edited) and forget them."""
+        from qdrant_client.http import models
+
+        current = {pdf_file_hash(os.path.join(pdf_folder, f)) for f in list_pdfs(pdf_folder)}
+        stale = [file_hash for file_hash in self.checkpoint.documents if file_hash not in current]
+        for file_hash in stale:
+            pages = self.checkpoint.documents[file_hash]["pages"]
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=models.PointIdsList(points=[page_point_id(file_hash, p) for p in sorted(pages)]),
+            )
+        self.checkpoint.forget(stale)
+        self.checkpoint.save()
+        return stale
+
+    def _autotune(self, pages, sample_size=32):
+        """Tune the batch size on the first pages; returns the pages with the sample put back."""
+        sample = list(itertools.islice(pages, sample_size))
+        if not sample:
+            # Nothing to index, so nothing to measure: keep the batch size unset
+            return pages
+
+        batch_size, throughput = autotune_batch_size(self.model, self.processor,
+                                                     [item["image"] for item in sample], max_batch_size=sample_size)
+        print("Batch size auto-tuned to", batch_size,
+              "(" + ", ".join(f"{b}: {pps:.2f} pages/s" for b, pps in throughput.items()) + ")")
+        self.batch_size = batch_size
+        # A short sample cannot try the larger sizes, so only a full one is kept for later runs
+        if len(sample) == sample_size:
+            self.checkpoint.batch_size = batch_size
+        return itertools.chain(sample, pages)
+
+    def run(self, pdf_folder, max_pages=None, pages=None):
+        """
+        Index every page of the PDFs in `pdf_folder` that the checkpoint does not list yet.
+
+        Args:
+            pdf_folder: Folder containing the PDF files
+            max_pages: Stop after this many pages (default: all)
+            pages: Optional iterator of page items to index instead of rendering `pdf_folder`
+                here, e.g. iter_pdf_pages(..., done_pages=indexer.checkpoint.done_pages());
+                pages the checkpoint lists are skipped
+
+        Returns:
+            Number of pages upserted in this run
+        """
+        start_time = time.perf_counter()
+        done_pages = self.checkpoint.done_pages()
+        if pages is None:
+            pages = iter_pdf_pages(pdf_folder, dpi=self.dpi, size=self.size, cache_dir=self.cache_dir,
+                                   max_workers=self.render_workers, done_pages=done_pages)
+        else:
+            pages = (item for item in pages if item["page_num"] not in done_pages.get(item["file_hash"], ()))
+        pages = _prefetch(self._timed_pages(pages), maxsize=self.queue_size * 8)
+        if max_pages is not None:
+            pages = itertools.islice(pages, max_pages)
+
+        if self.batch_size is None:
+            pages = self._autotune(pages)
+
+        # render -> process_images -> forward run in their own threads, upserts run here
+        preprocessed = _prefetch((self._preprocess(batch) for batch in _batched(pages, self.batch_size or 1)),
+                                 maxsize=self.queue_size)
+        embedded = _prefetch((self._forward(batch, inputs) for batch, inputs in preprocessed),
+                             maxsize=self.queue_size)
+
+        upserted = 0
+        for num_batches, (batch, embeddings) in enumerate(embedded, start=1):
+            self._upsert(batch, embeddings)
+            self.checkpoint.mark(batch)
+            upserted += len(batch)
+            if num_batches % self.checkpoint_every == 0:
+                self.checkpoint.save()
+
+        self.checkpoint.save()
+        self.wall_seconds = time.perf_counter() - start_time
+        return upserted
+
+    def report(self):
+        lines = [f"{'stage':<10}{'seconds':>10}{'pages':>10}"]
+        lines += [f"{stage:<10}{seconds:>10.2f}{self.pages[stage]:>10}" for stage, seconds in self.seconds.items()]
+        lines.append(f"{'wall':<10}{self.wall_seconds:>10.2f}")
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Index a folder of PDFs into Qdrant with ColPali.")
+    parser.add_argument("pdf_folder")
+    parser.add_argument("--collection", default="class_XII_science_book")
+    parser.add_argument("--model-name", default="vidore/colpali-v1.3")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6333)
+    parser.add_argument("--checkpoint", default="colpali_index.checkpoint.json")
+    parser.add_argument("--cache-dir", default="page_cache", help="Rendered page cache")
+    parser.add_argument("--batch-size", type=int, default=None, help="Pages per forward pass (default: auto-tune)")
+    parser.add_argument("--dpi", type=int, default=DEFAULT_DPI)
+    parser.add_argument("--max-pages", type=int, default=None)
+    parser.add_argument("--pool-factor", type=int, default=None, help="Token pooling factor, e.g. 3")
+    args = parser.parse_args()
+
+    import qdrant_client
+    from colpali_engine.models import ColPali, ColPaliProcessor
+
+    device = "cuda" if torch.cuda.is_available() else "mps" if torch.backends.mps.is_available() else "cpu"
+    colpali_model = ColPali.from_pretrained(args.model_name, torch_dtype=torch.bfloat16, device_map=device,
+                                            cache_dir="./model_cache")
+    colpali_processor = ColPaliProcessor.from_pretrained(args.model_name, cache_dir="./model_cache")
+    client = qdrant_client.QdrantClient(host=args.host, port=args.port)
+
+    indexer = ColPaliIndexer(colpali_model, colpali_processor, client, args.collection,
+                             checkpoint_path=args.checkpoint, batch_size=args.batch_size,
+                             cache_dir=args.cache_dir, dpi=args.dpi, pool_factor=args.pool_factor)
+    removed = indexer.remove_deleted_documents(args.pdf_folder)
+    upserted = indexer.run(args.pdf_folder, max_pages=args.max_pages)
+
+    print(f"Upserted {upserted} pages, removed {len(removed)} deleted or changed documents")
+    print(indexer.report())
@@ -0,0 +1,355 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from multivector_compression import maxsim_scores
+
+
+def _get(obj, name, default=None):
+    # Accept Qdrant model objects as well as plain dicts
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def _matches(payload, query_filter):
+    """Subset of Qdrant filters: `must` conditions with match.value / match.any on payload keys."""
+    if query_filter is None:
+        return True
+    for condition in _get(query_filter, "must") or []:
+        value = payload.get(_get(condition, "key"))
+        match = _get(condition, "match")
+        if _get(match, "any") is not None:
+            if value not in _get(match, "any"):
+                return False
+        elif value != _get(match, "value"):
+            return False
+    return True
+
+
+class _Collection:
+    """
+    One collection: token rows in an append-only file, point metadata in SQLite.
+
+    Every upsert appends a segment of token rows. Replacing or deleting a point
+    only marks its old segment dead, so scoring still walks one contiguous
+    memory-mapped matrix; compact() reclaims the space.
+    """
+
+    def __init__(self, path, vector_size=None, dtype="float32"):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(path, "points.sqlite"), check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS segments (
+                seg INTEGER PRIMARY KEY,
+                start INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                point_id TEXT UNIQUE,
+                payload TEXT
+            );
+        """)
+        meta = dict(self._db.execute("SELECT key, value FROM meta").fetchall())
+        if meta:
+            vector_size, dtype = int(meta["vector_size"]), meta["dtype"]
+        elif vector_size is None:
+            raise ValueError(f"Collection at {path} does not exist and no vector_size was given")
+        else:
+            with self._db:
+                self._db.executemany("INSERT INTO meta VALUES (?, ?)",
+                                     [("vector_size", str(vector_size)), ("dtype", dtype)])
+
+        self.vector_size = vector_size
+        self.dtype = np.dtype(dtype)
+        self.tokens_path = os.path.join(path, f"tokens.{self.dtype.name}")
+        self._tokens = None
+        self._layout = None
+
+    # Memory-mapped tokens and segment layout, rebuilt after writes
+
+    def tokens(self):
+        if self._tokens is None:
+            rows = os.path.getsize(self.tokens_path) // (self.vector_size * self.dtype.itemsize) \
+                if os.path.exists(self.tokens_path) else 0
+            self._tokens = np.memmap(self.tokens_path, dtype=self.dtype, mode="r",
+                                     shape=(rows, self.vector_size)) if rows else np.empty((0, self.vector_size), self.dtype)
+        return self._tokens
+
+    def layout(self):
+        """(offsets, live mask, ids, payloads) of every segment in file order."""
+        if self._layout is None:
+            rows = self._db.execute("SELECT start, length, point_id, payload FROM segments ORDER BY seg").fetchall()
+            offsets = np.array([start for start, _, _, _ in rows] + [sum(rows[-1][:2]) if rows else 0], dtype=np.int64)
+            live = np.array([point_id is not None for _, _, point_id, _ in rows], dtype=bool)
+            ids = [json.loads(point_id) if point_id is not None else None for _, _, point_id, _ in rows]
+            payloads = [json.loads(payload) if payload else {} for _, _, _, payload in rows]
+            self._layout = offsets, live, ids, payloads
+        return self._layout
+
+    def _invalidate(self):
+        self._tokens = None
+        self._layout = None
+
+    def upsert(self, points, normalize=True):
+        with self._lock:
+            start = self.tokens().shape[0]
+            self._tokens = None  # Release the read-only map before appending
+            rows = []
+            with open(self.tokens_path, "ab") as f:
+                for point in points:
+                    vectors = np.asarray(_get(point, "vector"), dtype=np.float32).reshape(-1, self.vector_size)
+                    if normalize:
+                        # Same as Qdrant's cosine distance, which normalizes vectors on insert
+                        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+                    f.write(vectors.astype(self.dtype).tobytes())
+                    rows.append((start, len(vectors), json.dumps(_get(point, "id")),
+                                 json.dumps(_get(point, "payload") or {})))
+                    start += len(vectors)
+
+            with self._db:
+                # Row by row, so a point repeated within one batch keeps its last version
+                for row in rows:
+                    self._db.execute("UPDATE segments SET point_id = NULL WHERE point_id = ?", (row[2],))
+                    self._db.execute("INSERT INTO segments (start, length, point_id, payload) VALUES (?, ?, ?, ?)", row)
+            self._invalidate()
+
+    def delete(self, point_ids=None, query_filter=None):
+        with self._lock:
+            if query_filter is not None:
+                _, live, ids, payloads = self.layout()
+                point_ids = [ids[i] for i in np.flatnonzero(live) if _matches(payloads[i], query_filter)]
+            with self._db:
+                self._db.executemany("UPDATE segments SET point_id = NULL WHERE point_id = ?",
+                                     [(json.dumps(point_id),) for point_id in point_ids or ()])
+            self._layout = None
+
+    def compact(self):
+        """Rewrite the token file without the rows of deleted or replaced points."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seg, start, length FROM segments WHERE point_id IS NOT NULL ORDER BY seg").fetchall()
+            tokens = self.tokens()
+            tmp_path = self.tokens_path + ".tmp"
+            new_start = 0
+            updates = []
+            with open(tmp_path, "wb") as f:
+                for seg, start, length in rows:
+                    f.write(np.ascontiguousarray(tokens[start:start + length]).tobytes())
+                    updates.append((new_start, seg))
+                    new_start += length
+            self._tokens = None
+            del tokens
+            os.replace(tmp_path, self.tokens_path)
+            with self._db:
+                self._db.execute("DELETE FROM segments WHERE point_id IS NULL")
+                self._db.executemany("UPDATE segments SET start = ? WHERE seg = ?", updates)
+            self._invalidate()
+
+    def count(self):
+        return self._db.execute("SELECT COUNT(*) FROM segments WHERE point_id IS NOT NULL").fetchone()[0]
+
+    def close(self):
+        self._tokens = None
+        self._db.close()
+
+
+class LocalMultiVectorStore:
+    """
+    In-process, memory-mapped stand-in for the Qdrant client used by the ColPali notebooks.
+
+    Each collection keeps its page multivectors in one memory-mapped token file, and
+    query_points scores every page with the chunked, vectorized MaxSim from
+    multivector_compression, so retrieval runs without a Qdrant server. The methods
+    mirror the subset of the Qdrant client the notebooks use (create_collection,
+    upsert, query_points, scroll, count, delete), so the store can be passed
+    wherever `client` is expected.
+
+    Args:
+        path: Folder holding one sub-folder per collection (default: "local_qdrant")
+        dtype: Storage type for new collections, "float32" or "float16" (half the size)
+        chunk_tokens: Page tokens scored per matrix product (default: 8192)
+    """
+
+    def __init__(self, path="local_qdrant", dtype="float32", chunk_tokens=8192):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.dtype = dtype
+        self.chunk_tokens = chunk_tokens
+        self._collections = {}
+
+    def _collection(self, collection_name):
+        if collection_name not in self._collections:
+            self._collections[collection_name] = _Collection(os.path.join(self.path, collection_name))
+        return self._collections[collection_name]
+
+    def info(self):
+        return SimpleNamespace(title="local multivector store", path=os.path.abspath(self.path))
+
+    def collection_exists(self, collection_name):
+        return os.path.exists(os.path.join(self.path, collection_name, "points.sqlite"))
+
+    def create_collection(self, collection_name, vectors_config=None, vector_size=None, **kwargs):
+        """Create a collection; the vector size comes from `vectors_config.size` or `vector_size`."""
+        if self.collection_exists(collection_name):
+            raise ValueError(f"Collection {collection_name} already exists")
+        vector_size = vector_size or _get(vectors_config, "size", 128)
+        self._collections[collection_name] = _Collection(os.path.join(self.path, collection_name),
+                                                         vector_size, self.dtype)
+        return True
+
+    def delete_collection(self, collection_name):
+        collection = self._collections.pop(collection_name, None)
+        if collection is not None:
+            collection.close()
+        shutil.rmtree(os.path.join(self.path, collection_name), ignore_errors=True)
+        return True
+
+    def upsert(self, collection_name, points, **kwargs):
+        """Insert or replace points given as Qdrant PointStructs or dicts with id, vector and payload."""
+        self._collection(collection_name).upsert(points)
+        return SimpleNamespace(status="completed")
+
+    def delete(self, collection_name, points_selector, **kwargs):
+        """Delete by a list of ids, a PointIdsList or a FilterSelector."""
+        collection = self._collection(collection_name)
+        if isinstance(points_selector, (list, tuple)):
+            collection.delete(point_ids=points_selector)
+        elif _get(points_selector, "filter") is not None:
+            collection.delete(query_filter=_get(points_selector, "filter"))
+        else:
+            collection.delete(point_ids=_get(points_selector, "points"))
+        return SimpleNamespace(status="completed")
+
+    def count(self, collection_name, **kwargs):
+        return SimpleNamespace(count=self._collection(collection_name).count())
+
+    def scroll(self, collection_name, limit=10, offset=None, with_payload=True, with_vectors=False, **kwargs):
+        """Page through the points; returns (points, next offset) like the Qdrant client."""
+        collection = self._collection(collection_name)
+        offsets, live, ids, payloads = collection.layout()
+        positions = np.flatnonzero(live)
+        positions = positions[positions >= (offset or 0)]
+        page, rest = positions[:limit], positions[limit:]
+
+        points = []
+        for i in page:
+            vector = np.asarray(collection.tokens()[offsets[i]:offsets[i + 1]], dtype=np.float32).tolist() \
+                if with_vectors else None
+            points.append(SimpleNamespace(id=ids[i], payload=payloads[i] if with_payload else None, vector=vector))
+        return points, (int(rest[0]) if len(rest) else None)
+
+    def query_points(self, collection_name, query, limit=10, query_filter=None, with_payload=True, **kwargs):
+        """
+        Top pages by MaxSim for one multivector query.
+
+        Args:
+            collection_name: Collection to search
+            query: (q, d) query token embeddings, as a list or array
+            limit: Number of points to return (default: 10)
+            query_filter: Optional Qdrant-style filter (`must` with match.value / match.any)
+            with_payload: Include payloads in the results (default: True)
+            **kwargs: Accepted for compatibility (e.g. search_params) and ignored
+
+        Returns:
+            Object with `.points`, a list of results with id, score and payload, best first
+        """
+        collection = self._collection(collection_name)
+        offsets, live, ids, payloads = collection.layout()
+        if not live.any():
+            return SimpleNamespace(points=[])
+
+        query = np.asarray(query, dtype=np.float32).reshape(-1, collection.vector_size)
+        query = query / np.maximum(np.linalg.norm(query, axis=1, keepdims=True), 1e-12)
+
+        scores = maxsim_scores(query, collection.tokens(), offsets, chunk_tokens=self.chunk_tokens)
+        keep = live.copy()
+        if query_filter is not None:
+            keep &= np.array([_matches(payload, query_filter) for payload in payloads], dtype=bool)
+        scores[~keep] = -np.inf
+
+        limit = min(limit, int(keep.sum()))
+        if limit == 0:
+            return SimpleNamespace(points=[])
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+
+        return SimpleNamespace(points=[
+            SimpleNamespace(id=ids[i], score=float(scores[i]), payload=payloads[i] if with_payload else None,
+                            version=0)
+            for i in top
+        ])
+
+    def compact(self, collection_name):
+        self._collection(collection_name).compact()
+
+    def close(self):
+        for collection in self._collections.values():
+            collection.close()
+        self._collections = {}
+
+
+def benchmark(num_pages=10000, tokens_per_page=256, num_queries=50, dtype="float32", path=None, k=5):
+    """
+    Build a store of synthetic pages and time query_points.
+
+    Returns:
+        Dict with build seconds, store size and p50/p95 query latency in milliseconds
+    """
+    import tempfile
+
+    from multivector_compression import synthetic_corpus
+
+    path = path or tempfile.mkdtemp(prefix="local_multivector_store_")
+    store = LocalMultiVectorStore(path, dtype=dtype)
+    if store.collection_exists("bench"):
+        store.delete_collection("bench")
+    store.create_collection("bench", vector_size=128)
+
+    docs, queries = synthetic_corpus(num_pages, tokens_per_page, num_queries=num_queries)
+    start_time = time.perf_counter()
+    for first in range(0, num_pages, 256):
+        store.upsert("bench", [{"id": i, "vector": docs[i], "payload": {"doc_id": i // 20, "page_num": i % 20}}
+                               for i in range(first, min(first + 256, num_pages))])
+    build_seconds = time.perf_counter() - start_time
+    del docs
+
+    store.query_points("bench", queries[0], limit=k)  # Warm the page cache
+    latencies = []
+    for query in queries:
+        start_time = time.perf_counter()
+        store.query_points("bench", query, limit=k)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+
+    return {
+        "pages": num_pages,
+        "tokens": num_pages * tokens_per_page,
+        "store_mb": os.path.getsize(store._collection("bench").tokens_path) / 1e6,
+        "build_seconds": build_seconds,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the local memory-mapped MaxSim store.")
+    parser.add_argument("--pages", type=int, default=10000)
+    parser.add_argument("--tokens-per-page", type=int, default=256,
+                        help="ColPali produces ~1030 per page; pool them (multivector_compression) to get fewer")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--path", default=None, help="Store folder (default: a temporary folder)")
+    args = parser.parse_args()
+
+    result = benchmark(args.pages, args.tokens_per_page, args.queries, args.dtype, args.path)
+    print(f"{result['pages']} pages, {result['tokens']:,} tokens, {result['store_mb']:.0f} MB ({args.dtype})")
+    print(f"build {result['build_seconds']:.1f}s, query p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms")
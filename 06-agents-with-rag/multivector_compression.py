@@ -0,0 +1,404 @@
+import math
+import time
+
+import numpy as np
+
+QUANTIZATION_METHODS = (None, "int8", "binary")
+POOLING_METHODS = ("hierarchical", "kmeans")
+
+
+def hierarchical_pool(tokens, pool_factor=3):
+    """
+    Merge similar patch embeddings of one page with hierarchical (Ward) clustering.
+
+    Same idea as the token pooling in colpali-engine: about n / pool_factor clusters,
+    each replaced by the mean of its tokens. Pool factor 3 keeps retrieval quality
+    close to the original while storing a third of the vectors.
+
+    Args:
+        tokens: (n, d) patch embeddings of one page
+        pool_factor: Average number of tokens merged into one (default: 3)
+
+    Returns:
+        (m, d) pooled embeddings, m = ceil(n / pool_factor)
+    """
+    from scipy.cluster.hierarchy import fcluster, linkage
+    from scipy.spatial.distance import squareform
+
+    tokens = np.asarray(tokens, dtype=np.float32)
+    num_clusters = max(1, math.ceil(len(tokens) / pool_factor))
+    if num_clusters >= len(tokens):
+        return tokens
+
+    distances = np.clip(1 - tokens @ tokens.T, 0, None)
+    np.fill_diagonal(distances, 0)
+    labels = fcluster(linkage(squareform(distances, checks=False), method="ward"),
+                      t=num_clusters, criterion="maxclust")
+    return _cluster_means(tokens, labels - 1)
+
+
+def kmeans_pool(tokens, pool_factor=3, iterations=10):
+    """
+    Merge patch embeddings of one page with spherical k-means.
+
+    Much faster than hierarchical_pool on long pages, at a small cost in quality.
+    Initialized from evenly spaced tokens, so the result is deterministic.
+    """
+    tokens = np.asarray(tokens, dtype=np.float32)
+    num_clusters = max(1, math.ceil(len(tokens) / pool_factor))
+    if num_clusters >= len(tokens):
+        return tokens
+
+    centroids = tokens[np.linspace(0, len(tokens) - 1, num_clusters).astype(int)]
+    for _ in range(iterations):
+        labels = np.argmax(tokens @ centroids.T, axis=1)
+        centroids = _cluster_means(tokens, labels, empty=centroids)
+    return _cluster_means(tokens, labels)
+
+
+def _cluster_means(tokens, labels, empty=None):
+    # Sort tokens by cluster and sum each run with one reduceat call
+    order = np.argsort(labels, kind="stable")
+    present, starts, counts = np.unique(labels[order], return_index=True, return_counts=True)
+    means = np.add.reduceat(tokens[order], starts, axis=0) / counts[:, None]
+    if empty is None:
+        return means
+    # Keep the previous centroid for clusters that lost all their tokens
+    centroids = empty.copy()
+    centroids[present] = means
+    return centroids
+
+
+def pool_tokens(tokens, pool_factor=3, method="hierarchical"):
+    """Pool one page's patch embeddings with the given method ("hierarchical" or "kmeans")."""
+    if method not in POOLING_METHODS:
+        raise ValueError(f"Unknown pooling method {method!r}, expected one of {POOLING_METHODS}")
+    if not pool_factor or pool_factor <= 1:
+        return np.asarray(tokens, dtype=np.float32)
+    return hierarchical_pool(tokens, pool_factor) if method == "hierarchical" else kmeans_pool(tokens, pool_factor)
+
+
+def flatten_multivectors(docs):
+    """
+    Stack a list of (n_i, d) multivectors into one (sum n_i, d) matrix plus offsets.
+
+    Document i owns rows offsets[i]:offsets[i + 1]; this is the layout maxsim_scores uses.
+    """
+    lengths = [len(doc) for doc in docs]
+    offsets = np.zeros(len(docs) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return np.concatenate([np.asarray(doc, dtype=np.float32) for doc in docs]), offsets
+
+
+def quantize(tokens, method="int8"):
+    """
+    Compress a (n, d) float matrix of token embeddings.
+
+    Args:
+        tokens: (n, d) float embeddings
+        method: "int8" (symmetric, one float scale per token, 4x smaller),
+            "binary" (sign bits, 32x smaller) or None (float32)
+
+    Returns:
+        Dict with "method", "codes" and, for int8, "scales"; pass it to dequantize or maxsim_scores
+    """
+    if method not in QUANTIZATION_METHODS:
+        raise ValueError(f"Unknown quantization {method!r}, expected one of {QUANTIZATION_METHODS}")
+
+    tokens = np.asarray(tokens, dtype=np.float32)
+    if method is None:
+        return {"method": None, "codes": tokens, "dim": tokens.shape[1]}
+    if method == "int8":
+        scales = np.abs(tokens).max(axis=1) / 127
+        scales[scales == 0] = 1
+        codes = np.round(tokens / scales[:, None]).astype(np.int8)
+        return {"method": "int8", "codes": codes, "scales": scales.astype(np.float32), "dim": tokens.shape[1]}
+    return {"method": "binary", "codes": np.packbits(tokens > 0, axis=1), "dim": tokens.shape[1]}
+
+
+def dequantize(quantized, start=0, stop=None):
+    """Float32 approximation of rows start:stop of a quantize() result."""
+    codes = quantized["codes"][start:stop]
+    if quantized["method"] is None:
+        return np.asarray(codes, dtype=np.float32)
+    if quantized["method"] == "int8":
+        return codes.astype(np.float32) * quantized["scales"][start:stop, None]
+    # Sign bits become +-1/sqrt(d), i.e. unit vectors pointing at the right orthant
+    signs = np.unpackbits(codes, axis=1, count=quantized["dim"]).astype(np.float32)
+    return (2 * signs - 1) / math.sqrt(quantized["dim"])
+
+
+def quantized_nbytes(quantized):
+    return sum(v.nbytes for k, v in quantized.items() if k in ("codes", "scales"))
+
+
+def maxsim_scores(query, tokens, offsets, chunk_tokens=8192):
+    """
+    Late-interaction (MaxSim) score of one query against every document.
+
+    For every query token the best matching token of each document is taken and the
+    maxima are summed. Similarities are computed for a chunk of whole documents at
+    a time with one matrix product, and the per-document maxima come from
+    np.maximum.reduceat over the document offsets, so memory stays bounded by
+    chunk_tokens x query tokens.
+
+    Args:
+        query: (q, d) query token embeddings
+        tokens: (n, d) float matrix or a quantize() result for all documents
+        offsets: (num_docs + 1,) row offsets from flatten_multivectors
+        chunk_tokens: Document tokens scored per matrix product (default: 8192)
+
+    Returns:
+        (num_docs,) float32 scores
+    """
+    query = np.asarray(query, dtype=np.float32)
+    if not isinstance(tokens, dict):
+        tokens = {"method": None, "codes": tokens}
+
+    num_docs = len(offsets) - 1
+    scores = np.empty(num_docs, dtype=np.float32)
+    doc = 0
+    while doc < num_docs:
+        # Whole documents only, at least one per chunk
+        end_doc = int(np.searchsorted(offsets, offsets[doc] + chunk_tokens, side="right")) - 1
+        end_doc = min(max(end_doc, doc + 1), num_docs)
+        start, stop = offsets[doc], offsets[end_doc]
+
+        similarities = dequantize(tokens, start, stop) @ query.T
+        per_doc = np.maximum.reduceat(similarities, offsets[doc:end_doc] - start, axis=0)
+        scores[doc:end_doc] = per_doc.sum(axis=1)
+        doc = end_doc
+    return scores
+
+
+class CompressedMultiVectorIndex:
+    """
+    In-memory multivector index with token pooling, quantization and float rescoring.
+
+    The first stage scores every page with MaxSim over the pooled, quantized tokens;
+    the top `k * oversampling` candidates are then rescored with their original
+    float tokens. This mirrors Qdrant's quantization with rescore/oversampling.
+
+    Args:
+        docs: List of (n_i, d) float multivectors, one per page
+        pool_factor: Token pooling factor, None or 1 to keep every token (default: 3)
+        pooling: "hierarchical" or "kmeans" (default: "hierarchical")
+        quantization: None, "int8" or "binary" (default: "binary")
+        keep_float: Keep the original float tokens for rescoring (default: True)
+    """
+
+    def __init__(self, docs, pool_factor=3, pooling="hierarchical", quantization="binary", keep_float=True):
+        self.pool_factor = pool_factor
+        self.pooling = pooling
+        self.quantization = quantization
+
+        pooled = [pool_tokens(doc, pool_factor, pooling) for doc in docs]
+        pooled_tokens, self.offsets = flatten_multivectors(pooled)
+        self.tokens = quantize(pooled_tokens, quantization)
+
+        self.float_tokens, self.float_offsets = flatten_multivectors(docs) if keep_float else (None, None)
+
+    @property
+    def num_docs(self):
+        return len(self.offsets) - 1
+
+    def nbytes(self):
+        """Bytes used by the first-stage index (pooled and quantized tokens plus offsets)."""
+        return quantized_nbytes(self.tokens) + self.offsets.nbytes
+
+    def rescore_nbytes(self):
+        """Bytes of the float tokens kept for rescoring (0 with keep_float=False)."""
+        if self.float_tokens is None:
+            return 0
+        return self.float_tokens.nbytes + self.float_offsets.nbytes
+
+    def total_nbytes(self):
+        """Everything the index holds: first stage plus the float rescoring store."""
+        return self.nbytes() + self.rescore_nbytes()
+
+    def rescore(self, query, candidates):
+        """Exact float MaxSim of the query against the candidate pages."""
+        query = np.asarray(query, dtype=np.float32)
+        scores = np.empty(len(candidates), dtype=np.float32)
+        for i, doc in enumerate(candidates):
+            start, stop = self.float_offsets[doc], self.float_offsets[doc + 1]
+            scores[i] = (self.float_tokens[start:stop] @ query.T).max(axis=0).sum()
+        return scores
+
+    def search(self, query, k=5, rescore=True, oversampling=4.0):
+        """
+        Top-k pages for one query.
+
+        Args:
+            query: (q, d) query token embeddings
+            k: Number of pages to return (default: 5)
+            rescore: Rescore candidates with the float tokens (default: True)
+            oversampling: Candidates kept for rescoring, as a multiple of k (default: 4)
+
+        Returns:
+            Tuple of (page indices, scores), best first
+        """
+        scores = maxsim_scores(query, self.tokens, self.offsets)
+        if not rescore or self.float_tokens is None:
+            top = _top_k(scores, k)
+            return top, scores[top]
+
+        candidates = _top_k(scores, max(k, int(math.ceil(k * oversampling))))
+        exact = self.rescore(query, candidates)
+        order = np.argsort(-exact)[:k]
+        return candidates[order], exact[order]
+
+
+def _top_k(scores, k):
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def qdrant_vectors_config(vector_size=128, quantization="binary", on_disk=True, always_ram=True):
+    """
+    Qdrant VectorParams for a MaxSim multivector collection with optional quantization.
+
+    With quantization the compressed vectors are kept in RAM and the original float
+    vectors on disk, which Qdrant uses for rescoring (see qdrant_search_params).
+    Pool the page embeddings with pool_tokens() before upserting to shrink the
+    collection further.
+    """
+    from qdrant_client.http import models
+
+    if quantization == "int8":
+        quantization_config = models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=always_ram)
+        )
+    elif quantization == "binary":
+        quantization_config = models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=always_ram)
+        )
+    else:
+        quantization_config = None
+
+    return models.VectorParams(
+        size=vector_size,
+        distance=models.Distance.COSINE,
+        on_disk=on_disk,
+        multivector_config=models.MultiVectorConfig(comparator=models.MultiVectorComparator.MAX_SIM),
+        quantization_config=quantization_config,
+    )
+
+
+def qdrant_search_params(rescore=True, oversampling=2.0):
+    """SearchParams that use the quantized vectors and rescore the top candidates with the originals."""
+    from qdrant_client.http import models
+
+    return models.SearchParams(
+        quantization=models.QuantizationSearchParams(ignore=False, rescore=rescore, oversampling=oversampling)
+    )
+
+
+def synthetic_corpus(num_pages=2000, tokens_per_page=256, dim=128, query_tokens=20, num_queries=100, seed=0):
+    """
+    ColPali-like multivectors: each page mixes a few topics, each query paraphrases one page.
+
+    Returns:
+        Tuple of (list of page multivectors, list of query multivectors)
+    """
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(512, dim)).astype(np.float32)
+    topics /= np.linalg.norm(topics, axis=1, keepdims=True)
+
+    def unit(x):
+        return (x / np.linalg.norm(x, axis=-1, keepdims=True)).astype(np.float32)
+
+    page_topics = rng.integers(0, len(topics), size=(num_pages, 8))
+    docs = []
+    for topic_ids in page_topics:
+        picked = topics[rng.choice(topic_ids, tokens_per_page)]
+        docs.append(unit(picked + 0.08 * rng.normal(size=picked.shape)))
+
+    queries = []
+    for page in rng.choice(num_pages, num_queries, replace=num_queries > num_pages):
+        picked = topics[rng.choice(page_topics[page], query_tokens)]
+        queries.append(unit(picked + 0.1 * rng.normal(size=picked.shape)))
+    return docs, queries
+
+
+def benchmark(docs, queries, k=5, configs=None, oversampling=4.0):
+    """
+    Index size, latency and recall@k of compressed indexes against exact float MaxSim.
+
+    "index_mb" is the first-stage index and "rescore_mb" the float tokens a rescoring
+    search also reads (in Qdrant those stay on disk while the quantized vectors sit in
+    RAM). "compression" compares the float baseline with everything a search needs, so
+    rows with rescoring include the float store.
+
+    Returns:
+        List of dicts, one per configuration
+    """
+    configs = configs or [
+        {"pool_factor": None, "quantization": None},
+        {"pool_factor": None, "quantization": "int8"},
+        {"pool_factor": None, "quantization": "binary"},
+        {"pool_factor": 3, "pooling": "kmeans", "quantization": None},
+        {"pool_factor": 3, "pooling": "hierarchical", "quantization": None},
+        {"pool_factor": 3, "pooling": "hierarchical", "quantization": "int8"},
+        {"pool_factor": 3, "pooling": "hierarchical", "quantization": "binary"},
+    ]
+
+    float_tokens, offsets = flatten_multivectors(docs)
+    truth = [set(_top_k(maxsim_scores(query, float_tokens, offsets), k)) for query in queries]
+    float_bytes = float_tokens.nbytes + offsets.nbytes
+
+    rows = []
+    for config in configs:
+        start_time = time.perf_counter()
+        index = CompressedMultiVectorIndex(docs, **config)
+        build_seconds = time.perf_counter() - start_time
+
+        for rescore in (False, True):
+            if rescore and config.get("pool_factor") is None and config.get("quantization") is None:
+                continue
+            latencies, recalls = [], []
+            for query, expected in zip(queries, truth):
+                start_time = time.perf_counter()
+                found, _ = index.search(query, k=k, rescore=rescore, oversampling=oversampling)
+                latencies.append((time.perf_counter() - start_time) * 1000)
+                recalls.append(len(expected & set(found)) / k)
+            needed_bytes = index.total_nbytes() if rescore else index.nbytes()
+            rows.append({
+                "pooling": f"{config.get('pooling', 'hierarchical')} x{config['pool_factor']}" if config.get("pool_factor") else "-",
+                "quantization": config.get("quantization") or "float32",
+                "rescore": rescore,
+                "index_mb": index.nbytes() / 1e6,
+                "rescore_mb": index.rescore_nbytes() / 1e6 if rescore else 0.0,
+                "compression": float_bytes / needed_bytes,
+                "build_seconds": build_seconds,
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "recall": float(np.mean(recalls)),
+            })
+    return rows
+
+
+def format_report(rows, k=5):
+    lines = [f"{'pooling':<18}{'quant':<10}{'rescore':<9}{'index MB':>10}{'rescore MB':>12}{'ratio':>8}{'build s':>9}"
+             f"{'p50 ms':>9}{f'recall@{k}':>11}"]
+    for row in rows:
+        lines.append(f"{row['pooling']:<18}{row['quantization']:<10}{str(row['rescore']):<9}{row['index_mb']:>10.1f}"
+                     f"{row['rescore_mb']:>12.1f}{row['compression']:>7.1f}x{row['build_seconds']:>9.2f}"
+                     f"{row['p50_ms']:>9.2f}{row['recall']:>11.3f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Size, latency and recall of compressed ColPali multivectors.")
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--tokens-per-page", type=int, default=256,
+                        help="Patch tokens per page (ColPali uses ~1030; lower keeps the benchmark quick)")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--oversampling", type=float, default=4.0)
+    args = parser.parse_args()
+
+    docs, queries = synthetic_corpus(args.pages, args.tokens_per_page, num_queries=args.queries)
+    print(format_report(benchmark(docs, queries, k=args.k, oversampling=args.oversampling), k=args.k))
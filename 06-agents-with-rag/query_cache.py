@@ -0,0 +1,213 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize_query(text):
+    """Cache key for a query: NFKC-normalized, case-folded, with whitespace collapsed."""
+    return _SPACES_RE.sub(" ", unicodedata.normalize("NFKC", text)).strip().casefold()
+
+
+def colpali_query_encoder(model, processor):
+    """Function that turns a text query into its (q, d) float32 ColPali multivector."""
+    import torch
+
+    def encode(query):
+        with torch.no_grad():
+            batch_query = processor.process_queries([query]).to(model.device)
+            embeddings = model(**batch_query)
+        return embeddings[0].cpu().float().numpy()
+
+    return encode
+
+
+class QueryEmbeddingCache:
+    """
+    LRU cache of query multivectors in front of a query encoder.
+
+    Repeated or trivially different queries (case, spacing) skip processing and the
+    model forward pass. Entries expire after `ttl_seconds`, and the least recently
+    used ones are evicted once the cache holds more than `max_entries` queries or
+    `max_bytes` of embeddings. With a `path`, entries are also written to a small
+    SQLite file and reloaded on start, so the cache survives kernel restarts.
+
+    Args:
+        encode_fn: Function mapping a query string to a (q, d) array, e.g. colpali_query_encoder()
+        max_entries: Maximum number of cached queries (default: 1024)
+        max_bytes: Maximum size of the cached embeddings (default: 64 MB)
+        ttl_seconds: Seconds an entry stays valid, None for no expiry (default: 24 hours)
+        path: Optional SQLite file for persistence
+        namespace: Stored with every key, e.g. the model name, so models never share entries
+    """
+
+    def __init__(self, encode_fn, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl_seconds=24 * 3600,
+                 path=None, namespace=""):
+        self.encode_fn = encode_fn
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_ms = 0.0
+
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()  # key -> (embedding, created, encode_ms), oldest use first
+        self._bytes = 0
+
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS queries (
+                    key TEXT PRIMARY KEY,
+                    embedding BLOB NOT NULL,
+                    rows INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    encode_ms REAL NOT NULL
+                )
+            """)
+            self._load()
+
+    def _key(self, query):
+        return f"{self.namespace}\x00{normalize_query(query)}"
+
+    def _load(self):
+        now = time.time()
+        for key, blob, rows, created, encode_ms in self._db.execute(
+                "SELECT key, embedding, rows, created, encode_ms FROM queries ORDER BY created"):
+            if self._expired(created, now):
+                continue
+            embedding = np.frombuffer(blob, dtype=np.float32).reshape(rows, -1)
+            self._insert(key, embedding, created, encode_ms, persist=False)
+        self._evict()
+
+    def _expired(self, created, now):
+        return self.ttl_seconds is not None and now - created > self.ttl_seconds
+
+    def _insert(self, key, embedding, created, encode_ms, persist=True):
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[0].nbytes
+        self._entries[key] = (embedding, created, encode_ms)
+        self._bytes += embedding.nbytes
+        if persist and self._db is not None:
+            with self._db:
+                self._db.execute("INSERT OR REPLACE INTO queries VALUES (?, ?, ?, ?, ?)",
+                                 (key, embedding.tobytes(), len(embedding), created, encode_ms))
+
+    def _remove(self, key):
+        embedding = self._entries.pop(key)[0]
+        self._bytes -= embedding.nbytes
+        if self._db is not None:
+            with self._db:
+                self._db.execute("DELETE FROM queries WHERE key = ?", (key,))
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def get(self, query):
+        """Cached embedding for a query, or None (counts as a miss)."""
+        key = self._key(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[1], time.time()):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_ms += entry[2]
+            return entry[0]
+
+    def encode(self, query):
+        """
+        Query multivector from the cache, encoding and caching it on a miss.
+
+        Returns:
+            (q, d) float32 array; treat it as read-only, it is shared with the cache
+        """
+        embedding = self.get(query)
+        if embedding is not None:
+            return embedding
+
+        start_time = time.perf_counter()
+        embedding = np.ascontiguousarray(self.encode_fn(query), dtype=np.float32)
+        encode_ms = (time.perf_counter() - start_time) * 1000
+        embedding.flags.writeable = False
+
+        with self._lock:
+            self._insert(self._key(query), embedding, time.time(), encode_ms)
+            self._evict()
+        return embedding
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "saved_ms": self.saved_ms,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("DELETE FROM queries")
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+
+    parser = argparse.ArgumentParser(description="Hit rate and time saved by the query cache on a simulated agent loop.")
+    parser.add_argument("--queries", type=int, default=500, help="Queries issued by the simulated agents")
+    parser.add_argument("--distinct", type=int, default=60, help="Distinct questions they are drawn from")
+    parser.add_argument("--encode-ms", type=float, default=20.0, help="Simulated encoder latency")
+    args = parser.parse_args()
+
+    def slow_encoder(query):
+        time.sleep(args.encode_ms / 1000)
+        rng = np.random.default_rng(abs(hash(normalize_query(query))) % (1 << 32))
+        return rng.normal(size=(20, 128))
+
+    rng = random.Random(0)
+    questions = [f"What does chapter {i} say about chemical reactions?" for i in range(args.distinct)]
+    cache = QueryEmbeddingCache(slow_encoder, max_entries=args.distinct // 2)
+
+    start_time = time.perf_counter()
+    for _ in range(args.queries):
+        # Agents repeat popular questions, with varying case and spacing
+        question = questions[min(int(rng.expovariate(1 / 8)), args.distinct - 1)]
+        if rng.random() < 0.3:
+            question = "  " + question.upper()
+        cache.encode(question)
+    elapsed = time.perf_counter() - start_time
+
+    print(f"{args.queries} queries in {elapsed:.2f}s (uncached: {args.queries * args.encode_ms / 1000:.2f}s)")
+    print(cache.stats())
@@ -0,0 +1,373 @@
+import time
+import weakref
+from types import SimpleNamespace
+
+import numpy as np
+
+from multivector_compression import flatten_multivectors, maxsim_scores
+
+# Vector names used for a Qdrant collection with both representations of every page
+MULTIVECTOR_NAME = "colpali"
+MEAN_VECTOR_NAME = "mean_pooling"
+
+
+def mean_vector(tokens):
+    """Unit-length mean of a page's (or query's) token embeddings."""
+    mean = np.asarray(tokens, dtype=np.float32).mean(axis=0)
+    return mean / max(float(np.linalg.norm(mean)), 1e-12)
+
+
+def segment_means(tokens, offsets, chunk_tokens=1 << 16):
+    """
+    Unit-length mean vector of every document in a flat token matrix (see flatten_multivectors).
+
+    Reads the tokens once, a chunk of whole documents at a time, so it also works on a
+    memory-mapped matrix larger than RAM.
+    """
+    num_docs = len(offsets) - 1
+    means = np.zeros((num_docs, tokens.shape[1]), dtype=np.float32)
+    doc = 0
+    while doc < num_docs:
+        end_doc = int(np.searchsorted(offsets, offsets[doc] + chunk_tokens, side="right")) - 1
+        end_doc = min(max(end_doc, doc + 1), num_docs)
+        start, stop = offsets[doc], offsets[end_doc]
+        # Empty segments would break reduceat, they keep a zero vector
+        lengths = np.diff(offsets[doc:end_doc + 1])
+        nonempty = lengths > 0
+        if nonempty.any():
+            chunk = np.asarray(tokens[start:stop], dtype=np.float32)
+            sums = np.add.reduceat(chunk, offsets[doc:end_doc][nonempty] - start, axis=0)
+            means[doc:end_doc][nonempty] = sums / lengths[nonempty, None]
+        doc = end_doc
+    norms = np.linalg.norm(means, axis=1, keepdims=True)
+    return means / np.maximum(norms, 1e-12)
+
+
+class TwoStageRetriever:
+    """
+    Late-interaction search with a cheap single-vector prefilter.
+
+    Stage one ranks every page by the cosine similarity of its mean-pooled token
+    vector to the mean of the query tokens (a flat NumPy scan, or a FAISS HNSW index
+    for very large corpora). Stage two runs exact MaxSim over the multivectors of
+    the top `num_candidates` pages only, so the expensive scoring no longer grows
+    with the corpus. Pages outside the `live` mask (deleted or replaced points of a
+    LocalMultiVectorStore) are left out of both stages.
+
+    Args:
+        tokens: (n, d) token matrix of all pages (may be memory-mapped)
+        offsets: (num_pages + 1,) row offsets, page i owns rows offsets[i]:offsets[i + 1]
+        ids: Optional id per page (default: the page index)
+        payloads: Optional payload dict per page
+        live: Optional boolean mask of pages that can be returned
+        index_type: "flat" (NumPy) or "hnsw" (requires faiss) (default: "flat")
+        normalize_query: Scale every query token to unit length before scoring, as
+            LocalMultiVectorStore and Qdrant's cosine distance do (default: False)
+    """
+
+    def __init__(self, tokens, offsets, ids=None, payloads=None, live=None, index_type="flat",
+                 normalize_query=False):
+        self.tokens = tokens
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.ids = list(ids) if ids is not None else list(range(len(self.offsets) - 1))
+        self.payloads = payloads
+        self.normalize_query = normalize_query
+        # Stage one only ever sees the live pages; its results map back through live_positions
+        self.live_positions = np.flatnonzero(live) if live is not None else np.arange(len(self.offsets) - 1)
+        self.means = segment_means(tokens, self.offsets)[self.live_positions]
+        self.index_type = index_type
+        self.index = None
+        if index_type == "hnsw":
+            import faiss
+
+            self.index = faiss.IndexHNSWFlat(self.means.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+            self.index.hnsw.efConstruction = 200
+            self.index.add(self.means)
+        elif index_type != "flat":
+            raise ValueError(f"Unknown index type {index_type!r}, expected 'flat' or 'hnsw'")
+
+    @classmethod
+    def from_multivectors(cls, docs, **kwargs):
+        """Build from a list of (n_i, d) page multivectors."""
+        tokens, offsets = flatten_multivectors(docs)
+        return cls(tokens, offsets, **kwargs)
+
+    @classmethod
+    def from_store(cls, store, collection_name, **kwargs):
+        """Build over a LocalMultiVectorStore collection without copying its token file."""
+        collection = store._collection(collection_name)
+        offsets, live, ids, payloads = collection.layout()
+        kwargs.setdefault("normalize_query", True)
+        return cls(collection.tokens(), offsets, ids=ids, payloads=payloads, live=live, **kwargs)
+
+    @classmethod
+    def from_byaldi(cls, rag, **kwargs):
+        """
+        Build over the page embeddings of a byaldi RAGMultiModalModel (rag.model.indexed_embeddings).
+
+        Payloads carry byaldi's doc_id and page_num, see byaldi_search.
+        """
+        model = rag.model
+        docs = [embedding.float().cpu().numpy() for embedding in model.indexed_embeddings]
+        payloads = [
+            {"doc_id": model.embed_id_to_doc_id[i]["doc_id"], "page_num": int(model.embed_id_to_doc_id[i]["page_id"])}
+            for i in range(len(docs))
+        ]
+        return cls.from_multivectors(docs, payloads=payloads, **kwargs)
+
+    @property
+    def num_pages(self):
+        return len(self.offsets) - 1
+
+    @property
+    def num_live_pages(self):
+        return len(self.live_positions)
+
+    def prepare_query(self, query):
+        query = np.asarray(query, dtype=np.float32)
+        if self.normalize_query:
+            query = query / np.maximum(np.linalg.norm(query, axis=1, keepdims=True), 1e-12)
+        return query
+
+    def candidates(self, query, num_candidates=100, ef_search=None):
+        """Stage one: indices of the live pages whose mean vector is closest to the query's."""
+        num_candidates = min(num_candidates, self.num_live_pages)
+        if num_candidates == 0:
+            return np.empty(0, dtype=np.int64)
+        query_mean = mean_vector(query)
+        if self.index is not None:
+            self.index.hnsw.efSearch = max(ef_search or 0, num_candidates)
+            _, found = self.index.search(query_mean[None, :], num_candidates)
+            return self.live_positions[found[0][found[0] >= 0]]
+        similarities = self.means @ query_mean
+        return self.live_positions[np.argpartition(-similarities, num_candidates - 1)[:num_candidates]]
+
+    def rerank(self, query, candidates):
+        """Stage two: exact MaxSim of the query against the candidate pages."""
+        # Read the candidates in file order, which is kinder to a memory-mapped matrix
+        candidates = np.sort(np.asarray(candidates, dtype=np.int64))
+        if len(candidates) == 0:
+            return candidates, np.empty(0, dtype=np.float32)
+        lengths = self.offsets[candidates + 1] - self.offsets[candidates]
+        tokens = np.concatenate([np.asarray(self.tokens[self.offsets[i]:self.offsets[i + 1]], dtype=np.float32)
+                                 for i in candidates])
+        local_offsets = np.zeros(len(candidates) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=local_offsets[1:])
+        return candidates, maxsim_scores(query, tokens, local_offsets)
+
+    def search(self, query, k=5, num_candidates=100):
+        """
+        Top-k pages for one (q, d) query multivector.
+
+        Args:
+            query: (q, d) query token embeddings
+            k: Number of pages to return (default: 5)
+            num_candidates: Pages kept by the prefilter and rescored with MaxSim (default: 100);
+                set it to the number of pages for exact search
+
+        Returns:
+            Tuple of (page indices, MaxSim scores), best first
+        """
+        query = self.prepare_query(query)
+        candidates, scores = self.rerank(query, self.candidates(query, max(k, num_candidates)))
+        order = np.argsort(-scores)[:k]
+        return candidates[order], scores[order]
+
+    def query_points(self, query, limit=10, num_candidates=100, **kwargs):
+        """Same result shape as LocalMultiVectorStore.query_points / the Qdrant client."""
+        found, scores = self.search(query, k=limit, num_candidates=num_candidates)
+        return SimpleNamespace(points=[
+            SimpleNamespace(id=self.ids[i], score=float(score),
+                            payload=self.payloads[i] if self.payloads is not None else None)
+            for i, score in zip(found, scores)
+        ])
+
+
+def encode_byaldi_query(rag, query):
+    """Encode a text query with the model inside a byaldi RAGMultiModalModel, as byaldi's search does."""
+    import torch
+
+    model = rag.model
+    with torch.inference_mode():
+        batch_query = model.processor.process_queries([query])
+        batch_query = {
+            key: value.to(model.device).to(model.model.dtype if value.is_floating_point() else value.dtype)
+            for key, value in batch_query.items()
+        }
+        embeddings = model.model(**batch_query)
+    return embeddings[0].float().cpu().numpy()
+
+
+def byaldi_search(rag, retriever, query, k=3, num_candidates=100):
+    """
+    Drop-in for `rag.search(query, k)` that uses a TwoStageRetriever built with from_byaldi.
+
+    Args:
+        rag: byaldi RAGMultiModalModel with an index
+        retriever: TwoStageRetriever.from_byaldi(rag), rebuilt after documents are added
+        query: Text query
+        k: Number of pages to return (default: 3)
+        num_candidates: Pages rescored with MaxSim (default: 100); None falls back to
+            byaldi's own search over every page
+
+    Returns:
+        List of byaldi Result objects (doc_id, page_num, score, metadata)
+    """
+    if num_candidates is None:
+        return rag.search(query, k=k)
+
+    from byaldi.objects import Result
+
+    found, scores = retriever.search(encode_byaldi_query(rag, query), k=k, num_candidates=num_candidates)
+    results = []
+    for i, score in zip(found, scores):
+        payload = retriever.payloads[i]
+        results.append(Result(doc_id=payload["doc_id"], page_num=payload["page_num"], score=float(score),
+                              metadata=rag.model.doc_id_to_metadata.get(int(payload["doc_id"]), {})))
+    return results
+
+
+def qdrant_two_stage_vectors_config(vector_size=128, on_disk=True):
+    """
+    Named vectors for a Qdrant collection that stores both representations of each page.
+
+    The mean-pooled vector gets the HNSW index. The multivector is only used for
+    rescoring, so its HNSW graph is disabled (m=0), which also makes upserts cheaper.
+    """
+    from qdrant_client.http import models
+
+    return {
+        MULTIVECTOR_NAME: models.VectorParams(
+            size=vector_size,
+            distance=models.Distance.COSINE,
+            on_disk=on_disk,
+            multivector_config=models.MultiVectorConfig(comparator=models.MultiVectorComparator.MAX_SIM),
+            hnsw_config=models.HnswConfigDiff(m=0),
+        ),
+        MEAN_VECTOR_NAME: models.VectorParams(size=vector_size, distance=models.Distance.COSINE),
+    }
+
+
+def two_stage_point_vectors(embedding):
+    """Named vector dict for one page's (n, d) embedding, matching qdrant_two_stage_vectors_config."""
+    embedding = np.asarray(embedding, dtype=np.float32)
+    return {MULTIVECTOR_NAME: embedding.tolist(), MEAN_VECTOR_NAME: mean_vector(embedding).tolist()}
+
+
+def qdrant_two_stage_query(client, collection_name, query, limit=5, num_candidates=100, **kwargs):
+    """Prefetch `num_candidates` pages by mean vector, then rerank them by MaxSim inside Qdrant."""
+    from qdrant_client.http import models
+
+    query = np.asarray(query, dtype=np.float32)
+    return client.query_points(
+        collection_name=collection_name,
+        prefetch=models.Prefetch(query=mean_vector(query).tolist(), using=MEAN_VECTOR_NAME, limit=num_candidates),
+        query=query.tolist(),
+        using=MULTIVECTOR_NAME,
+        limit=limit,
+        **kwargs,
+    )
+
+
+# Retrievers over LocalMultiVectorStore collections, rebuilt after the collection is written to
+_store_retrievers = weakref.WeakKeyDictionary()
+
+
+def store_retriever(store, collection_name, **kwargs):
+    """TwoStageRetriever over a LocalMultiVectorStore collection, reused until its points change."""
+    collection = store._collection(collection_name)
+    layout = collection.layout()
+    cached = _store_retrievers.get(collection)
+    if cached is None or cached[0] is not layout:
+        cached = (layout, TwoStageRetriever.from_store(store, collection_name, **kwargs))
+        _store_retrievers[collection] = cached
+    return cached[1]
+
+
+def two_stage_query(client, collection_name, query, limit=5, num_candidates=100, **kwargs):
+    """
+    Top pages for one multivector query, on a Qdrant client or a LocalMultiVectorStore.
+
+    A Qdrant collection must be created with qdrant_two_stage_vectors_config (and filled
+    by a ColPaliIndexer with two_stage=True); a LocalMultiVectorStore computes the page
+    means itself.
+
+    Args:
+        client: qdrant_client.QdrantClient or LocalMultiVectorStore
+        collection_name: Collection to search
+        query: (q, d) query token embeddings, as a list or array
+        limit: Number of pages to return (default: 5)
+        num_candidates: Pages picked by the mean-vector prefilter and rescored with MaxSim
+            (default: 100); None runs MaxSim over every page
+        **kwargs: Passed on to the client's query_points (e.g. search_params)
+
+    Returns:
+        Object with `.points`, a list of results with id, score and payload, best first
+    """
+    from local_multivector_store import LocalMultiVectorStore
+
+    query = np.asarray(query, dtype=np.float32)
+    if isinstance(client, LocalMultiVectorStore):
+        if num_candidates is None:
+            return client.query_points(collection_name, query, limit=limit, **kwargs)
+        return store_retriever(client, collection_name).query_points(query, limit=limit,
+                                                                     num_candidates=num_candidates)
+    if num_candidates is None:
+        return client.query_points(collection_name=collection_name, query=query.tolist(),
+                                   using=MULTIVECTOR_NAME, limit=limit, **kwargs)
+    return qdrant_two_stage_query(client, collection_name, query, limit=limit,
+                                  num_candidates=num_candidates, **kwargs)
+
+
+def recall_benchmark(docs, queries, k=5, candidate_counts=(10, 25, 50, 100, 200, 500), index_type="flat"):
+    """
+    Recall@k and latency of two-stage search for several candidate counts, against exact MaxSim.
+
+    Returns:
+        List of dicts; the first row is the exact full scan
+    """
+    retriever = TwoStageRetriever.from_multivectors(docs, index_type=index_type)
+
+    def timed(fn):
+        latencies, results = [], []
+        for query in queries:
+            start_time = time.perf_counter()
+            results.append(fn(query))
+            latencies.append((time.perf_counter() - start_time) * 1000)
+        return results, float(np.percentile(latencies, 50)), float(np.percentile(latencies, 95))
+
+    def exact(query):
+        scores = maxsim_scores(query, retriever.tokens, retriever.offsets)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return set(top)
+
+    truth, p50, p95 = timed(exact)
+    rows = [{"candidates": "all", "recall": 1.0, "p50_ms": p50, "p95_ms": p95}]
+    for num_candidates in candidate_counts:
+        if num_candidates >= retriever.num_pages:
+            continue
+        found, p50, p95 = timed(lambda query: set(retriever.search(query, k, num_candidates)[0]))
+        recall = np.mean([len(f & t) / k for f, t in zip(found, truth)])
+        rows.append({"candidates": num_candidates, "recall": float(recall), "p50_ms": p50, "p95_ms": p95})
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from multivector_compression import synthetic_corpus
+
+    parser = argparse.ArgumentParser(description="Recall loss and speedup of the mean-vector prefilter.")
+    parser.add_argument("--pages", type=int, default=10000)
+    parser.add_argument("--tokens-per-page", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--index-type", choices=["flat", "hnsw"], default="flat")
+    args = parser.parse_args()
+
+    docs, queries = synthetic_corpus(args.pages, args.tokens_per_page, num_queries=args.queries)
+    rows = recall_benchmark(docs, queries, k=args.k, index_type=args.index_type)
+
+    print(f"{'candidates':<12}{f'recall@{args.k}':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for row in rows:
+        print(f"{row['candidates']!s:<12}{row['recall']:>10.3f}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}")
@@ -1,57 +1,403 @@
 import os
-from pdf2image import convert_from_path
+import functools
+import hashlib
+import json
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from pdf2image import convert_from_path, pdfinfo_from_path
+from PIL import Image
 import matplotlib.pyplot as plt
 import numpy as np
 
 
 os.environ["TOKENIZERS_PARALLELISM"] = "false" 
 
+# Same default resolution as pdf2image
+DEFAULT_DPI = 200
+
+# Namespace for Qdrant point ids, so the same page of the same file always gets the same id
+PAGE_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "fcc-ai-engineering-aws/colpali-pages")
+
+
+def _resolve_poppler_path(poppler_path=None):
+    # None falls back to $POPPLER_PATH, and then to whatever poppler is on the PATH
+    return poppler_path or os.environ.get("POPPLER_PATH") or None
+
+
+@functools.lru_cache(maxsize=4096)
+def _cached_file_hash(path, size, mtime_ns):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def pdf_file_hash(path):
+    """SHA-256 of a file's content; re-hashed only when its size or modification time changes."""
+    stat = os.stat(path)
+    return _cached_file_hash(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+def stable_doc_id(file_hash):
+    """
+    Integer document id derived from the file content.
+
+    Unlike the enumerate() order of os.listdir, it does not change when files
+    are added or removed, so it can be used as the byaldi doc_id and the
+    "doc_id" payload in Qdrant. 60 bits keep it a positive int64.
+    """
+    return int(file_hash[:15], 16)
+
+
+def page_point_id(file_hash, page_num):
+    """Stable Qdrant point id (a UUID string) for one page of one file."""
+    return str(uuid.uuid5(PAGE_ID_NAMESPACE, f"{file_hash}:{page_num}"))
+
+
+def list_pdfs(pdf_folder):
+    """Sorted PDF file names in a folder."""
+    return sorted(f for f in os.listdir(pdf_folder) if f.lower().endswith(".pdf"))
+
+
+def _size_tag(size):
+    if size is None:
+        return ""
+    return "_" + "x".join(str(s) for s in (size if isinstance(size, tuple) else (size,)))
+
+
+def _page_cache_path(cache_dir, file_hash, page_num, dpi, size):
+    # Keyed by content, page and resolution: renamed files hit the cache, edited files miss it
+    return os.path.join(cache_dir, file_hash[:32], f"p{page_num:05d}_{dpi}dpi{_size_tag(size)}.png")
+
+
+def _page_count(pdf_path, file_hash, poppler_path, cache_dir):
+    info_path = os.path.join(cache_dir, file_hash[:32], "info.json") if cache_dir else None
+    if info_path and os.path.exists(info_path):
+        with open(info_path) as f:
+            return json.load(f)["pages"]
+
+    num_pages = pdfinfo_from_path(pdf_path, poppler_path=poppler_path)["Pages"]
+    if info_path:
+        os.makedirs(os.path.dirname(info_path), exist_ok=True)
+        with open(info_path, "w") as f:
+            json.dump({"pages": num_pages}, f)
+    return num_pages
+
+
+def _render_pages(pdf_path, file_hash, first_page, last_page, dpi, size, poppler_path, cache_dir):
+    """
+    Render pages first_page..last_page (1-based, inclusive) of one PDF in a worker process.
+
+    Returns a list of (page_num, image) with 0-based page numbers. When a cache
+    folder is given the pages are written there as PNG and their paths are returned
+    instead, so only file names travel back to the parent process.
+    """
+    if cache_dir:
+        paths = [_page_cache_path(cache_dir, file_hash, page - 1, dpi, size) for page in range(first_page, last_page + 1)]
+        if all(os.path.exists(path) for path in paths):
+            return list(enumerate(paths, start=first_page - 1))
+
+    images = convert_from_path(pdf_path, dpi=dpi, size=size, first_page=first_page, last_page=last_page,
+                               poppler_path=poppler_path)
+    pages = []
+    for page_num, image in enumerate(images, start=first_page - 1):
+        image = image.convert("RGB")
+        if cache_dir:
+            path = _page_cache_path(cache_dir, file_hash, page_num, dpi, size)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            image.save(path, "PNG")
+            image = path
+        pages.append((page_num, image))
+    return pages
+
+
+def iter_pdf_pages(pdf_folder, dpi=DEFAULT_DPI, size=None, poppler_path=None, cache_dir=None,
+                   max_workers=None, pages_per_task=8, skip_doc_ids=None, done_pages=None):
+    """
+    Lazily rasterize every PDF in a folder, rendering across a process pool.
+
+    Pages are yielded in document and page order as soon as they are ready, and
+    at most `2 * max_workers` page ranges are in flight, so memory stays bounded
+    no matter how large the corpus is.
+
+    Args:
+        pdf_folder: Folder containing the PDF files
+        dpi: Render resolution (default: 200)
+        size: Optional cap passed to pdf2image, e.g. (None, 1024) for a fixed height
+        poppler_path: Folder with the poppler binaries (default: $POPPLER_PATH or the PATH)
+        cache_dir: Optional folder where rendered pages are kept as PNG and reused,
+            keyed by (file hash, page, DPI)
+        max_workers: Number of render processes (default: number of CPUs)
+        pages_per_task: Pages rendered per task (default: 8)
+        skip_doc_ids: Document ids that are already indexed; those PDFs are not rendered at all
+        done_pages: Optional dict of file hash -> page numbers already processed (e.g. from a
+            checkpoint); those pages are neither rendered nor yielded
+
+    Yields:
+        Dicts with "doc_id" (see stable_doc_id), "page_num", "image" (an RGB PIL image),
+        "file_name" and "file_hash"
+    """
+    poppler_path = _resolve_poppler_path(poppler_path)
+    max_workers = max_workers or os.cpu_count() or 1
+    skip_doc_ids = set(skip_doc_ids or ())
+    done_pages = done_pages or {}
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def tasks():
+        for pdf_file in list_pdfs(pdf_folder):
+            pdf_path = os.path.join(pdf_folder, pdf_file)
+            file_hash = pdf_file_hash(pdf_path)
+            if stable_doc_id(file_hash) in skip_doc_ids:
+                continue
+            num_pages = _page_count(pdf_path, file_hash, poppler_path, cache_dir)
+            done = frozenset(done_pages.get(file_hash, ()))
+            for first_page in range(1, num_pages + 1, pages_per_task):
+                last_page = min(first_page + pages_per_task - 1, num_pages)
+                if all(page - 1 in done for page in range(first_page, last_page + 1)):
+                    continue
+                yield (pdf_file, file_hash, done), (pdf_path, file_hash, first_page, last_page, dpi, size,
+                                                    poppler_path, cache_dir)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for source, args in tasks():
+            pending.append((source, executor.submit(_render_pages, *args)))
+            # Keep the pool busy without rendering the whole corpus ahead of the consumer
+            while len(pending) >= 2 * max_workers:
+                yield from _page_items(*pending.popleft())
+
+        while pending:
+            yield from _page_items(*pending.popleft())
+
+
+def _page_items(source, future):
+    file_name, file_hash, done = source
+    doc_id = stable_doc_id(file_hash)
+    for page_num, image in future.result():
+        if page_num in done:
+            continue
+        if isinstance(image, str):
+            image = Image.open(image)
+            image.load()
+        yield {"doc_id": doc_id, "page_num": page_num, "image": image,
+               "file_name": file_name, "file_hash": file_hash}
+
+
+def page_image(pdf_folder, doc_id, page_num, dpi=DEFAULT_DPI, size=None, poppler_path=None, cache_dir=None):
+    """
+    Image of one page, read from the page cache or rendered on its own.
+
+    Lets a notebook show the pages a search returned without keeping every
+    rendered page in memory.
+
+    Args:
+        pdf_folder: Folder containing the PDF files
+        doc_id: "doc_id" of the PDF (see stable_doc_id)
+        page_num: 0-based page number, as in the Qdrant payload
+        dpi, size, poppler_path, cache_dir: As for iter_pdf_pages
+
+    Returns:
+        RGB PIL image, or None if no PDF in the folder has this doc_id
+    """
+    poppler_path = _resolve_poppler_path(poppler_path)
+    for pdf_file in list_pdfs(pdf_folder):
+        pdf_path = os.path.join(pdf_folder, pdf_file)
+        file_hash = pdf_file_hash(pdf_path)
+        if stable_doc_id(file_hash) != doc_id:
+            continue
+        (_, image), = _render_pages(pdf_path, file_hash, page_num + 1, page_num + 1, dpi, size,
+                                    poppler_path, cache_dir)
+        if isinstance(image, str):
+            image = Image.open(image)
+            image.load()
+        return image
+    return None
+
+
 # Wrapper function to convert PDFs into a dictionary of PIL images which will be used to create embeddings
-def convert_pdfs_to_images(pdf_folder, poppler_path="/opt/homebrew/bin"):
-    """Convert PDFs into a dictionary of PIL images."""
-    pdf_files = [f for f in os.listdir(pdf_folder) if f.endswith(".pdf")]
-    all_images = []
+def convert_pdfs_to_images(pdf_folder, poppler_path=None, **kwargs):
+    """
+    Convert PDFs into a list of {"doc_id", "page_num", "image"} dicts.
+    
+    Kept for existing notebooks; holds every page in memory, so prefer
+    iter_pdf_pages() for large folders. Extra keyword arguments are passed on to it.
+    """
+    return list(iter_pdf_pages(pdf_folder, poppler_path=poppler_path, **kwargs))
+
+def indexed_doc_ids(client, collection_name):
+    """Set of "doc_id" payload values already stored in a Qdrant collection."""
+    doc_ids = set()
+    offset = None
+    while True:
+        points, offset = client.scroll(collection_name=collection_name, limit=1000, offset=offset,
+                                       with_payload=["doc_id"], with_vectors=False)
+        doc_ids.update(point.payload["doc_id"] for point in points)
+        if offset is None:
+            return doc_ids
+
+
+def delete_stale_documents(client, collection_name, pdf_folder, doc_ids=None):
+    """
+    Remove the points of documents that were deleted from, or changed in, the PDF folder.
 
-    for doc_id, pdf_file in enumerate(pdf_files):
+    Args:
+        client: Qdrant client
+        collection_name: Collection holding the page embeddings
+        pdf_folder: Folder containing the current PDF files
+        doc_ids: Ids already in the collection (default: read with indexed_doc_ids)
+
+    Returns:
+        Set of document ids that were removed
+    """
+    from qdrant_client.http import models
+
+    doc_ids = indexed_doc_ids(client, collection_name) if doc_ids is None else set(doc_ids)
+    current = {stable_doc_id(pdf_file_hash(os.path.join(pdf_folder, f))) for f in list_pdfs(pdf_folder)}
+    stale = doc_ids - current
+    if stale:
+        client.delete(
+            collection_name=collection_name,
+            points_selector=models.FilterSelector(filter=models.Filter(must=[
+                models.FieldCondition(key="doc_id", match=models.MatchAny(any=sorted(stale)))
+            ])),
+        )
+    return stale
+
+
+def index_pdfs_with_byaldi(rag, pdf_folder, index_name, store_collection_with_index=False):
+    """
+    Add only new or changed PDFs to a byaldi index, using stable_doc_id() as the doc_id.
+
+    Load an existing index first with `RAGMultiModalModel.from_index(index_name)`;
+    if no index with this name is loaded a new one is created. byaldi cannot remove
+    documents, so PDFs that were deleted or changed are only reported; rebuild the
+    index with overwrite=True to drop them.
+
+    Returns:
+        List of the document ids that were added
+    """
+    model = rag.model
+    indexed = set(model.doc_ids_to_file_names) if model.index_name == index_name else set()
+
+    current = {}
+    for pdf_file in list_pdfs(pdf_folder):
         pdf_path = os.path.join(pdf_folder, pdf_file)
-        images = convert_from_path(pdf_path, poppler_path=poppler_path)
+        current[stable_doc_id(pdf_file_hash(pdf_path))] = pdf_path
+
+    stale = indexed - set(current)
+    if stale:
+        print(f"Warning: {len(stale)} indexed documents no longer match a PDF in {pdf_folder}; "
+              "rebuild the index to remove them.")
+
+    added = []
+    for doc_id, pdf_path in current.items():
+        if doc_id in indexed:
+            continue
+        if model.index_name != index_name:
+            rag.index(input_path=pdf_path, index_name=index_name, doc_ids=[doc_id],
+                      store_collection_with_index=store_collection_with_index, overwrite=True)
+        else:
+            rag.add_to_index(pdf_path, store_collection_with_index=store_collection_with_index, doc_id=doc_id)
+        added.append(doc_id)
+
+    print(f"Indexed {len(added)} new or changed PDFs, skipped {len(current) - len(added)} unchanged.")
+    return added
+
+def _open_image(image, cell_size):
+    # Paths are opened lazily; draft() lets JPEGs decode straight at a reduced scale
+    if isinstance(image, (str, os.PathLike)):
+        image = Image.open(image)
+        image.draft("RGB", cell_size)
+    elif isinstance(image, np.ndarray):
+        image = Image.fromarray(image)
+    return image
+
+
+def _thumbnail(image, cell_size):
+    # Downsample to fit the cell (keeping the aspect ratio) without copying the full-size page first
+    scale = min(cell_size[0] / image.width, cell_size[1] / image.height, 1.0)
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    if size != image.size:
+        image = image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+    return image if image.mode == "RGB" else image.convert("RGB")
+
+
+def render_image_grid(images, num_cols=5, cell_size=(300, 400), padding=8, background=(255, 255, 255),
+                      output_path=None):
+    """
+    Composite images into a single thumbnail grid.
+    
+    Each image is downsampled to the cell size before it is pasted into one canvas, so
+    the full-resolution pages are never converted to arrays.
+    
+    Args:
+        images: List of images (PIL Images, numpy arrays or image file paths)
+        num_cols: Number of columns in the grid (default: 5)
+        cell_size: (width, height) in pixels that each image is fitted into (default: (300, 400))
+        padding: Pixels between cells (default: 8)
+        background: RGB color of the canvas (default: white)
+        output_path: If given, the grid is saved to this file instead of returned as an array
         
-        for page_num, image in enumerate(images):
-            all_images.append({"doc_id": doc_id, 
-                               "page_num": page_num, 
-                               "image": image.convert("RGB")})
+    Returns:
+        (height, width, 3) uint8 array of the grid, or output_path if it was saved;
+        with no images, the grid is a single empty cell
+    """
+    cell_width, cell_height = cell_size
+    num_cols = max(1, min(num_cols, len(images)))
+    num_rows = max(1, (len(images) + num_cols - 1) // num_cols)
+    
+    canvas = Image.new("RGB", (num_cols * cell_width + (num_cols - 1) * padding,
+                               num_rows * cell_height + max(num_rows - 1, 0) * padding), background)
+    
+    for i, image in enumerate(images):
+        thumbnail = _thumbnail(_open_image(image, cell_size), cell_size)
+        row, col = divmod(i, num_cols)
+        # Center the thumbnail in its cell
+        x = col * (cell_width + padding) + (cell_width - thumbnail.width) // 2
+        y = row * (cell_height + padding) + (cell_height - thumbnail.height) // 2
+        canvas.paste(thumbnail, (x, y))
+    
+    if output_path:
+        canvas.save(output_path)
+        return output_path
+    return np.asarray(canvas)
 
-    return all_images
 
-def display_image_grid(images, num_cols=5, figsize=(15, 10)):
+def display_image_grid(images, num_cols=5, figsize=(15, 10), output_path=None):
     """
     Display a grid of images using matplotlib.
     
     Args:
-        images: List of images to display (PIL Images or numpy arrays)
+        images: List of images to display (PIL Images, numpy arrays or image file paths)
         num_cols: Number of columns in the grid (default: 5)
         figsize: Figure size as tuple (width, height) (default: (15, 10))
-    """
-    # Convert PIL Images to numpy arrays if needed
-    if isinstance(images[0], np.ndarray):
-        image_arrays = images
-    else:
-        image_arrays = [np.array(img) for img in images]
-    
-    num_images = len(image_arrays)
-    num_rows = (num_images + num_cols - 1) // num_cols  # Calculate needed rows
-    
-    fig, axes = plt.subplots(num_rows, num_cols, figsize=figsize)
-    if num_rows == 1:
-        axes = [axes]  # Handle single row case
-    axes = np.array(axes).flat  # Flatten axes array for easier iteration
-    
-    # Display images
-    for i in range(num_cols * num_rows):
-        ax = axes[i]
-        if i < num_images:
-            ax.imshow(image_arrays[i])
-        ax.axis("off")
+        output_path: If given, the grid is saved to this file instead of shown
         
+    Returns:
+        output_path if the grid was saved, otherwise None
+    """
+    if not images:
+        # e.g. a search that matched no pages
+        print("No images to display.")
+        return None
+    
+    num_cols = max(1, min(num_cols, len(images)))
+    num_rows = (len(images) + num_cols - 1) // num_cols  # Calculate needed rows
+    
+    # Render each cell at the resolution it gets on screen
+    dpi = plt.rcParams["figure.dpi"]
+    cell_size = (int(figsize[0] * dpi / num_cols), int(figsize[1] * dpi / num_rows))
+    
+    if output_path:
+        return render_image_grid(images, num_cols=num_cols, cell_size=cell_size, output_path=output_path)
+    
+    grid = render_image_grid(images, num_cols=num_cols, cell_size=cell_size)
+    
+    plt.figure(figsize=figsize)
+    plt.imshow(grid)
+    plt.axis("off")
     plt.tight_layout()
-    plt.show()
\ No newline at end of file
+    plt.show()
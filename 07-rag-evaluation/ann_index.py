@@ -0,0 +1,238 @@
+import math
+import time
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+# Search-time settings swept by the recall/latency report
+DEFAULT_SWEEPS = {
+    "flat": [{}],
+    "ivf_flat": [{"nprobe": n} for n in (1, 4, 16, 64)],
+    "ivf_pq": [{"nprobe": n} for n in (1, 4, 16, 64)],
+    "hnsw": [{"ef_search": ef} for ef in (16, 32, 64, 128, 256)],
+}
+
+
+def _default_nlist(num_vectors):
+    # ~4 * sqrt(n) lists, but keep at least 39 training points per list as FAISS recommends
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+
+
+def _default_pq_m(dimensions):
+    # Largest number of sub-quantizers <= 64 that divides the vector size
+    return max(m for m in range(1, min(64, dimensions) + 1) if dimensions % m == 0)
+
+
+def build_index(vectors, index_type="flat", metric="l2", nlist=None, pq_m=None, pq_bits=8,
+                hnsw_m=32, ef_construction=200, train_size=50000, seed=0):
+    """
+    Build a FAISS index of the requested type over a matrix of vectors.
+
+    Works for the LangChain store in this folder as well as raw arrays, e.g. the
+    384-d Titan multimodal embeddings indexed with `faiss.IndexFlatL2(384)` in
+    03-multimodal-rag.
+
+    Args:
+        vectors: (n, d) array of embeddings
+        index_type: One of "flat", "ivf_flat", "hnsw" or "ivf_pq" (default: "flat")
+        metric: "l2" or "ip" (inner product) (default: "l2")
+        nlist: Number of IVF lists (default: ~4 * sqrt(n))
+        pq_m: Number of PQ sub-quantizers, must divide d (default: largest divisor <= 64)
+        pq_bits: Bits per PQ code (default: 8)
+        hnsw_m: Neighbours per HNSW node (default: 32)
+        ef_construction: HNSW build-time search depth (default: 200)
+        train_size: Number of vectors sampled to train IVF/PQ (default: 50000)
+        seed: Seed for the training sample (default: 0)
+
+    Returns:
+        A trained FAISS index containing all vectors
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    num_vectors, dimensions = vectors.shape
+    metric_type = faiss.METRIC_INNER_PRODUCT if metric == "ip" else faiss.METRIC_L2
+
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dimensions) if metric == "ip" else faiss.IndexFlatL2(dimensions)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimensions, hnsw_m, metric_type)
+        index.hnsw.efConstruction = ef_construction
+    else:
+        nlist = nlist or _default_nlist(num_vectors)
+        quantizer = faiss.IndexFlatIP(dimensions) if metric == "ip" else faiss.IndexFlatL2(dimensions)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dimensions, nlist, metric_type)
+        else:
+            # PQ needs at least 2**bits training points per codebook
+            pq_bits = min(pq_bits, max(1, int(math.log2(num_vectors))))
+            index = faiss.IndexIVFPQ(quantizer, dimensions, nlist, pq_m or _default_pq_m(dimensions),
+                                     pq_bits, metric_type)
+
+    if not index.is_trained:
+        rng = np.random.default_rng(seed)
+        sample = vectors
+        if num_vectors > train_size:
+            sample = vectors[rng.choice(num_vectors, train_size, replace=False)]
+        index.train(sample)
+
+    index.add(vectors)
+    return index
+
+
+def set_search_params(index, nprobe=None, ef_search=None):
+    """
+    Set the query-time accuracy knobs (IVF nprobe, HNSW efSearch) on an index.
+
+    Raises:
+        ValueError: If a knob is given for an index that does not have it (e.g. ef_search
+            on an IVF index or nprobe on an HNSW index)
+    """
+    if nprobe is not None:
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is None:
+            raise ValueError(f"nprobe only applies to IVF indexes, not {type(index).__name__}")
+        ivf.nprobe = nprobe
+    if ef_search is not None:
+        hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+        if hnsw is None:
+            raise ValueError(f"ef_search only applies to HNSW indexes, not {type(index).__name__}")
+        hnsw.efSearch = ef_search
+    return index
+
+
+def convert_store(db, index_type, nprobe=None, ef_search=None, **build_kwargs):
+    """
+    Copy a LangChain FAISS store onto an approximate index of another type.
+
+    The vectors are reconstructed from the (flat) index and added to the new index in
+    the same order, so the docstore and id mapping can be shared unchanged.
+    HNSW indexes do not support removing vectors, so keep the flat store as the one
+    that is updated incrementally and rebuild the approximate copy from it.
+
+    Args:
+        db: LangChain FAISS store backed by a flat index
+        index_type: One of INDEX_TYPES
+        nprobe: IVF lists to probe at query time
+        ef_search: HNSW search depth at query time
+        **build_kwargs: Passed on to build_index
+
+    Returns:
+        New LangChain FAISS store using the approximate index
+    """
+    # Reject knobs that do not apply before spending time on the build
+    if nprobe is not None and not index_type.startswith("ivf"):
+        raise ValueError(f"nprobe only applies to IVF indexes, not {index_type!r}")
+    if ef_search is not None and index_type != "hnsw":
+        raise ValueError(f"ef_search only applies to HNSW indexes, not {index_type!r}")
+
+    vectors = db.index.reconstruct_n(0, db.index.ntotal)
+    metric = "ip" if db.index.metric_type == faiss.METRIC_INNER_PRODUCT else "l2"
+    index = build_index(vectors, index_type, metric=metric, **build_kwargs)
+    set_search_params(index, nprobe=nprobe, ef_search=ef_search)
+
+    return FAISS(
+        embedding_function=db.embedding_function,
+        index=index,
+        docstore=db.docstore,
+        index_to_docstore_id=dict(db.index_to_docstore_id),
+        distance_strategy=db.distance_strategy,
+    )
+
+
+def recall_latency_report(vectors, queries, k=10, index_types=("ivf_flat", "hnsw", "ivf_pq"),
+                          sweeps=None, metric="l2", **build_kwargs):
+    """
+    Measure recall@k and per-query latency of each index type against the flat baseline.
+
+    Args:
+        vectors: (n, d) array of indexed embeddings
+        queries: (q, d) array of query embeddings
+        k: Number of neighbours to compare (default: 10)
+        index_types: Approximate index types to evaluate
+        sweeps: Dict of index type -> list of search params (default: DEFAULT_SWEEPS)
+        metric: "l2" or "ip" (default: "l2")
+        **build_kwargs: Passed on to build_index
+
+    Returns:
+        List of dicts with index type, search params, build time, recall and latency
+    """
+    sweeps = sweeps or DEFAULT_SWEEPS
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+
+    def run(index, params, build_seconds):
+        set_search_params(index, **params)
+        latencies = []
+        results = []
+        # One query at a time, as in the RAG loop
+        for query in queries:
+            start_time = time.perf_counter()
+            _, ids = index.search(query.reshape(1, -1), k)
+            latencies.append((time.perf_counter() - start_time) * 1000)
+            results.append(ids[0])
+        return np.array(results), {
+            "build_seconds": build_seconds,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "qps": len(queries) / (sum(latencies) / 1000),
+        }
+
+    start_time = time.perf_counter()
+    flat = build_index(vectors, "flat", metric=metric)
+    truth, baseline = run(flat, {}, time.perf_counter() - start_time)
+    rows = [{"index_type": "flat", "params": {}, "recall": 1.0, **baseline}]
+
+    for index_type in index_types:
+        start_time = time.perf_counter()
+        index = build_index(vectors, index_type, metric=metric, **build_kwargs)
+        build_seconds = time.perf_counter() - start_time
+
+        for params in sweeps[index_type]:
+            found, timing = run(index, params, build_seconds)
+            recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+            rows.append({"index_type": index_type, "params": params, "recall": float(recall), **timing})
+
+    return rows
+
+
+def format_report(rows):
+    lines = [f"{'index':<10}{'params':<20}{'recall':>8}{'p50 ms':>10}{'p95 ms':>10}{'qps':>10}{'build s':>10}"]
+    for row in rows:
+        params = ",".join(f"{k}={v}" for k, v in row["params"].items()) or "-"
+        lines.append(f"{row['index_type']:<10}{params:<20}{row['recall']:>8.3f}{row['p50_ms']:>10.3f}"
+                     f"{row['p95_ms']:>10.3f}{row['qps']:>10.0f}{row['build_seconds']:>10.2f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Recall vs latency of approximate FAISS indexes.")
+    parser.add_argument("--index", default=None,
+                        help="Saved flat .faiss file to evaluate (default: synthetic vectors)")
+    parser.add_argument("--num-vectors", type=int, default=100000, help="Synthetic corpus size")
+    parser.add_argument("--dimensions", type=int, default=1024, help="Synthetic vector size")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.index and os.path.exists(args.index):
+        flat_index = faiss.read_index(args.index)
+        corpus = flat_index.reconstruct_n(0, flat_index.ntotal)
+    else:
+        # Clustered vectors look more like real embeddings than uniform noise
+        centers = rng.normal(size=(256, args.dimensions))
+        corpus = centers[rng.integers(0, 256, args.num_vectors)] + 0.3 * rng.normal(size=(args.num_vectors, args.dimensions))
+        corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+
+    # Queries are perturbed copies of indexed vectors
+    picked = corpus[rng.choice(len(corpus), args.queries, replace=len(corpus) < args.queries)]
+    query_vectors = picked + 0.05 * rng.normal(size=picked.shape)
+
+    print(format_report(recall_latency_report(corpus, query_vectors, k=args.k)))
@@ -0,0 +1,65 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Imports utils in a fresh interpreter and reports which heavy libraries it pulled in
+IMPORT_SNIPPET = """
+import sys, time
+start_time = time.perf_counter()
+import utils
+cleaner = utils.TextCleaner()
+elapsed = time.perf_counter() - start_time
+loaded = [name for name in ("nltk", "spacy", "bs4") if name in sys.modules]
+print(elapsed, ",".join(loaded))
+"""
+
+# Time to the first cleaned text for each method, paid once per process
+FIRST_USE_SNIPPET = """
+import time
+import utils
+cleaner = utils.TextCleaner()
+start_time = time.perf_counter()
+cleaner.clean_text_{method}("<p>The 2023 Cricket World Cup [1] final</p>")
+print(time.perf_counter() - start_time)
+"""
+
+
+def run_snippet(snippet):
+    result = subprocess.run([sys.executable, "-c", snippet], cwd=HERE, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return result.stdout.strip().splitlines()[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how long `import utils` takes in a fresh process.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--first-use", action="store_true",
+                        help="Also time the first clean per method (needs prepare() to have been run)")
+    args = parser.parse_args()
+
+    timings = []
+    for _ in range(args.runs):
+        elapsed, loaded = run_snippet(IMPORT_SNIPPET).partition(" ")[::2]
+        timings.append(float(elapsed) * 1000)
+
+    print(f"import utils + TextCleaner(): median {statistics.median(timings):.1f} ms "
+          f"over {args.runs} runs (min {min(timings):.1f} ms)")
+    print(f"heavy modules loaded at import: {loaded or 'none'}")
+    assert not loaded, f"importing utils should not load {loaded}"
+
+    if args.first_use:
+        for method in ("bs4", "nltk", "spacy"):
+            try:
+                seconds = float(run_snippet(FIRST_USE_SNIPPET.format(method=method)))
+                print(f"first clean_text_{method}: {seconds * 1000:.1f} ms")
+            except RuntimeError as e:
+                print(f"first clean_text_{method}: failed ({e})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import os
+import random
+import time
+
+from utils import TextCleaner
+
+WORDS = ["cricket", "world", "cup", "india", "australia", "final", "runs", "wicket", "the", "and",
+         "of", "in", "a", "to", "Kohli", "century", "match", "team", "won", "innings"]
+
+
+def make_corpus(num_texts, html_ratio=0.3, seed=0):
+    """Synthetic chunks: mostly plain text with citations and URLs, some with HTML markup (and '>' in attributes)."""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(num_texts):
+        words = [rng.choice(WORDS) for _ in range(150)]
+        words.insert(rng.randrange(len(words)), f"[{rng.randint(1, 99)}]")
+        words.insert(rng.randrange(len(words)), "https://en.wikipedia.org/wiki/Cricket")
+        text = " ".join(words)
+        if rng.random() < html_ratio:
+            text = f"<p>{text[:300]} <b>{text[300:600]}</b></p>\n<div>{text[600:]} &amp; more</div>"
+            if rng.random() < 0.5:
+                # Quoted attribute values may contain '>', which must not end the tag
+                text = f"<a title=\"runs > wickets\" data-x='a>b'>{text}</a>"
+        texts.append(text)
+    return texts
+
+
+def timed(fn):
+    start_time = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare TextCleaner per-string methods with clean_batch.")
+    parser.add_argument("--texts", type=int, default=20000)
+    parser.add_argument("--html-ratio", type=float, default=0.3, help="Fraction of texts containing markup")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Worker processes for the pooled run")
+    parser.add_argument("--method", choices=["bs4", "nltk", "spacy"], default="bs4")
+    args = parser.parse_args()
+
+    cleaner = TextCleaner()
+    texts = make_corpus(args.texts, args.html_ratio)
+    per_string = getattr(cleaner, f"clean_text_{args.method}")
+
+    baseline, baseline_seconds = timed(lambda: [per_string(text) for text in texts])
+    batch, batch_seconds = timed(lambda: cleaner.clean_batch(texts, method=args.method))
+    pooled, pooled_seconds = timed(lambda: cleaner.clean_batch(texts, method=args.method, n_jobs=args.jobs))
+
+    mismatches = sum(a != b for a, b in zip(baseline, batch))
+    print(f"{len(texts)} texts, {args.html_ratio:.0%} with markup, method={args.method}")
+    print(f"per-string clean_text_{args.method}: {baseline_seconds:.2f}s ({len(texts) / baseline_seconds:,.0f} texts/s)")
+    print(f"clean_batch:                 {batch_seconds:.2f}s ({len(texts) / batch_seconds:,.0f} texts/s, "
+          f"{baseline_seconds / batch_seconds:.1f}x)")
+    print(f"clean_batch n_jobs={args.jobs}:       {pooled_seconds:.2f}s ({len(texts) / pooled_seconds:,.0f} texts/s, "
+          f"{baseline_seconds / pooled_seconds:.1f}x)")
+    print(f"outputs differing from the per-string method: {mismatches}")
+    assert pooled == batch
+    assert mismatches == 0
+
+
+if __name__ == "__main__":
+    main()
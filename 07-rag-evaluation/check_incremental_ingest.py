@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+
+from embedding_engine import StubEmbeddings
+from ingest_pipeline import IngestPipeline
+
+
+def write_doc(path, topic, paragraphs=6):
+    with open(path, "w") as f:
+        f.write("\n\n".join(f"{topic} paragraph {i}: " + "some words about it " * 20 for i in range(paragraphs)))
+
+
+def chunk_sources(db):
+    return sorted({doc.metadata["source"] for doc in db.docstore._dict.values()})
+
+
+def main():
+    """
+    Run the incremental ingestion scenarios against a multi-file index, without AWS:
+
+    1. Update a single file: the other files keep their chunks.
+    2. Delete a file, then update another one: only the deleted file's chunks go.
+    """
+    root = tempfile.mkdtemp()
+    try:
+        docs_dir = os.path.join(root, "docs")
+        index_dir = os.path.join(root, "index")
+        os.makedirs(docs_dir)
+        paths = [os.path.join(docs_dir, f"d{i}.txt") for i in range(3)]
+        for i, path in enumerate(paths):
+            write_doc(path, f"doc{i}")
+
+        embeddings = StubEmbeddings(dimensions=32)
+        db = IngestPipeline(embeddings, index_dir, "check").run([docs_dir])
+        total = db.index.ntotal
+        assert chunk_sources(db) == paths, chunk_sources(db)
+
+        # 1. Change d0 and ingest only that file
+        write_doc(paths[0], "doc0 edited")
+        pipeline = IngestPipeline(embeddings, index_dir, "check", incremental=True)
+        db = pipeline.run([paths[0]])
+        assert chunk_sources(db) == paths, chunk_sources(db)
+        assert set(pipeline.manifest.sources) == set(paths)
+        assert db.index.ntotal == total, (db.index.ntotal, total)
+        print(f"single file update: {pipeline.report().splitlines()[0]}")
+
+        # 2. Delete d2, then ingest only d1: d2's chunks are removed, d0's are kept
+        os.remove(paths[2])
+        write_doc(paths[1], "doc1 edited")
+        pipeline = IngestPipeline(embeddings, index_dir, "check", incremental=True)
+        db = pipeline.run([paths[1]])
+        assert chunk_sources(db) == paths[:2], chunk_sources(db)
+        assert set(pipeline.manifest.sources) == set(paths[:2])
+        assert pipeline.counts["removed"] > 0
+        print(f"deleted file:       {pipeline.report().splitlines()[0]}")
+
+        print("OK")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,85 @@
-from langchain_community.document_loaders import BSHTMLLoader
-from langchain_text_splitters import CharacterTextSplitter
 from langchain_aws import BedrockEmbeddings
-from langchain_community.vectorstores import FAISS
-import os
-
-def create_vector_store():
-    # Create output directory if it doesn't exist
-    os.makedirs("07-rag-evaluation/vector_store", exist_ok=True)
-    
-    # Load the HTML file
-    loader = BSHTMLLoader("07-rag-evaluation/data/2023WC.html")
-    data = loader.load()
-    
-    # Split the text into chunks
-    text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = text_splitter.split_documents(data)
-    
+from embedding_engine import EmbeddingEngine, StubEmbeddings
+from embedding_cache import EmbeddingCache, CachedEmbeddings
+from ingest_pipeline import IngestPipeline
+from ann_index import INDEX_TYPES, convert_store
+import argparse
+
+DEFAULT_INPUTS = ["07-rag-evaluation/data/2023WC.html"]
+INDEX_DIR = "07-rag-evaluation/vector_store"
+INDEX_NAME = "CWC_index"
+
+def create_vector_store(inputs=DEFAULT_INPUTS, embeddings=None, max_workers=8, batch_size=16,
+                        cache_dir="07-rag-evaluation/embedding_cache", incremental=False,
+                        index_dir=INDEX_DIR, index_name=INDEX_NAME, index_type="flat",
+                        nprobe=None, ef_search=None):
     # Initialize embeddings
-    embeddings = BedrockEmbeddings(model_id='amazon.titan-embed-text-v2:0')
-    
-    # Create FAISS vector store
-    db = FAISS.from_documents(chunks, embeddings)
-    
-    # Save the vector store
-    db.save_local("07-rag-evaluation/vector_store", "CWC_index")
+    if embeddings is None:
+        embeddings = BedrockEmbeddings(model_id='amazon.titan-embed-text-v2:0')
+
+    # Embed the chunks in concurrent batches
+    engine = EmbeddingEngine(embeddings, max_workers=max_workers, batch_size=batch_size)
+
+    # Only embed chunks that are not already in the on-disk cache
+    embedder = engine
+    cache = EmbeddingCache(cache_dir) if cache_dir else None
+    if cache is not None:
+        embedder = CachedEmbeddings(
+            engine,
+            cache,
+            model_id=embeddings.model_id,
+            dimensions=(embeddings.model_kwargs or {}).get("dimensions"),
+            normalize=getattr(embeddings, "normalize", None),
+        )
+
+    # Stream the files through load -> clean -> split -> embed -> index
+    pipeline = IngestPipeline(embedder, index_dir, index_name, incremental=incremental)
+    db = pipeline.run(inputs)
+
+    # The flat index stays the source of truth for incremental updates,
+    # approximate indexes are rebuilt from it and saved next to it
+    if index_type != "flat":
+        db = convert_store(db, index_type, nprobe=nprobe, ef_search=ef_search)
+        db.save_local(index_dir, f"{index_name}_{index_type}")
+        print(f"Saved {index_type} index as {index_name}_{index_type}")
+
+    print(pipeline.report())
+    print(engine.throughput_report())
+    if cache is not None:
+        print(f"Embedding cache: {cache.stats()}")
+        cache.close()
     print("Vector store created successfully!")
 
+    return db
+
 if __name__ == "__main__":
-    create_vector_store() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create the FAISS vector store for RAG evaluation.")
+    parser.add_argument("inputs", nargs="*", default=DEFAULT_INPUTS,
+                        help="HTML, PDF or text files, directories or glob patterns to index")
+    parser.add_argument("--index-dir", default=INDEX_DIR, help="Folder the FAISS index is saved to")
+    parser.add_argument("--index-name", default=INDEX_NAME, help="Name of the FAISS index")
+    parser.add_argument("--workers", type=int, default=8, help="Number of concurrent embedding workers")
+    parser.add_argument("--batch-size", type=int, default=16, help="Number of chunks per embedding batch")
+    parser.add_argument("--stub", action="store_true", help="Use the offline stub embedder instead of Bedrock")
+    parser.add_argument("--no-cache", action="store_true", help="Re-embed every chunk instead of using the embedding cache")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Update the saved index with changed chunks instead of rebuilding it")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat",
+                        help="Also save an approximate index of this type for faster search")
+    parser.add_argument("--nprobe", type=int, default=None, help="IVF lists probed per query")
+    parser.add_argument("--ef-search", type=int, default=None, help="HNSW search depth per query")
+    args = parser.parse_args()
+
+    create_vector_store(
+        inputs=args.inputs,
+        embeddings=StubEmbeddings() if args.stub else None,
+        max_workers=args.workers,
+        batch_size=args.batch_size,
+        cache_dir=None if args.no_cache else "07-rag-evaluation/embedding_cache",
+        incremental=args.incremental,
+        index_dir=args.index_dir,
+        index_name=args.index_name,
+        index_type=args.index_type,
+        nprobe=args.nprobe,
+        ef_search=args.ef_search,
+    )
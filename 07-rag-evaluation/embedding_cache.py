@@ -0,0 +1,339 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def content_hash(content):
+    """SHA-256 hex digest of a text or bytes payload."""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed cache of embedding vectors.
+
+    Entries are keyed by (model id, dimensions, normalize flag, content hash), so the
+    same text embedded with a different model or configuration is cached separately.
+    Vectors are stored as float32 rows in one memory-mapped file per vector size and
+    indexed by a small SQLite table that also tracks when each entry was last used.
+    When the cache grows past `max_entries` or `max_bytes`, the least recently used
+    entries are evicted and their rows are reused.
+
+    Several processes can share a cache directory: rows are allocated and written inside
+    an IMMEDIATE SQLite transaction, which holds the database write lock, so two writers
+    never get the same row.
+
+    Args:
+        cache_dir: Directory holding the index and vector files (default: "embedding_cache")
+        max_entries: Maximum number of cached vectors (default: unbounded)
+        max_bytes: Maximum size of the cached vectors in bytes (default: unbounded)
+    """
+
+    def __init__(self, cache_dir="embedding_cache", max_entries=None, max_bytes=None):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.RLock()
+        self._stores = {}  # dimension -> np.memmap
+        # Autocommit mode, so transactions are only the explicit BEGIN IMMEDIATE ones below
+        self._db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), timeout=60,
+                                   isolation_level=None, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                dim INTEGER NOT NULL,
+                slot INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS free_slots (
+                dim INTEGER NOT NULL,
+                slot INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+            CREATE TABLE IF NOT EXISTS next_slots (
+                dim INTEGER PRIMARY KEY,
+                slot INTEGER NOT NULL
+            );
+        """)
+
+        # Next unused row for each vector size, kept in the database so every process
+        # sharing the cache sees it (caches created before it existed are backfilled)
+        with self._transaction():
+            self._db.execute("""
+                INSERT OR IGNORE INTO next_slots (dim, slot)
+                SELECT dim, MAX(slot) + 1 FROM (SELECT dim, slot FROM entries UNION ALL
+                                                SELECT dim, slot FROM free_slots)
+                GROUP BY dim
+            """)
+
+    @contextmanager
+    def _transaction(self):
+        """Hold the database write lock, shared with other processes, until commit or rollback."""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    @staticmethod
+    def make_key(model_id, content, dimensions=None, normalize=None):
+        """Build the cache key for one piece of content."""
+        return json.dumps([model_id, dimensions, normalize, content_hash(content)])
+
+    def _store(self, dim, min_rows=0):
+        """Return the memory-mapped vector file for `dim`, growing it to hold `min_rows`."""
+        store = self._stores.get(dim)
+        if store is not None and store.shape[0] >= min_rows:
+            return store
+
+        path = os.path.join(self.cache_dir, f"vectors_{dim}.f32")
+        row_bytes = dim * 4
+        rows = os.path.getsize(path) // row_bytes if os.path.exists(path) else 0
+
+        if rows < max(min_rows, 1):
+            # Double the file so growth is amortized
+            rows = max(min_rows, 2 * rows, 1024)
+            if store is not None:
+                store.flush()
+            with open(path, "ab") as f:
+                f.truncate(rows * row_bytes)
+
+        store = np.memmap(path, dtype=np.float32, mode="r+", shape=(rows, dim))
+        self._stores[dim] = store
+        return store
+
+    def get_many(self, model_id, contents, dimensions=None, normalize=None):
+        """
+        Look up cached vectors.
+
+        Returns:
+            List with a float32 array for every hit and None for every miss
+        """
+        keys = [self.make_key(model_id, c, dimensions, normalize) for c in contents]
+        results = [None] * len(keys)
+
+        with self._lock, self._transaction():
+            now = time.time()
+            for i, key in enumerate(keys):
+                row = self._db.execute("SELECT dim, slot FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    continue
+                dim, slot = row
+                # Another process may have grown the file since it was mapped
+                results[i] = np.array(self._store(dim, slot + 1)[slot])
+                self._db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+                self.hits += 1
+
+        return results
+
+    def put_many(self, model_id, contents, vectors, dimensions=None, normalize=None):
+        """Store vectors for the given contents and evict old entries if over budget."""
+        with self._lock, self._transaction():
+            now = time.time()
+            for content, vector in zip(contents, vectors):
+                vector = np.asarray(vector, dtype=np.float32)
+                dim = vector.shape[0]
+                key = self.make_key(model_id, content, dimensions, normalize)
+
+                row = self._db.execute("SELECT slot FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    slot = row[0]
+                else:
+                    slot = self._allocate_slot(dim)
+
+                self._store(dim, slot + 1)[slot] = vector
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries (key, dim, slot, last_used) VALUES (?, ?, ?, ?)",
+                    (key, dim, slot, now),
+                )
+
+            # Vectors reach the file before their entries are committed
+            for store in self._stores.values():
+                store.flush()
+            self._evict()
+
+    def _allocate_slot(self, dim):
+        # Called inside put_many's transaction, so no other process allocates at the same time
+        row = self._db.execute("SELECT rowid, slot FROM free_slots WHERE dim = ? LIMIT 1", (dim,)).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM free_slots WHERE rowid = ?", (row[0],))
+            return row[1]
+        row = self._db.execute("SELECT slot FROM next_slots WHERE dim = ?", (dim,)).fetchone()
+        slot = row[0] if row is not None else 0
+        self._db.execute("INSERT OR REPLACE INTO next_slots (dim, slot) VALUES (?, ?)", (dim, slot + 1))
+        return slot
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is within its limits."""
+        entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(dim) * 4, 0) FROM entries").fetchone()
+
+        while ((self.max_entries is not None and entries > self.max_entries)
+               or (self.max_bytes is not None and size > self.max_bytes)):
+            key, dim, slot = self._db.execute(
+                "SELECT key, dim, slot FROM entries ORDER BY last_used LIMIT 1"
+            ).fetchone()
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._db.execute("INSERT INTO free_slots (dim, slot) VALUES (?, ?)", (dim, slot))
+            entries -= 1
+            size -= dim * 4
+            self.evictions += 1
+
+    def get_or_compute(self, model_id, contents, compute_fn, dimensions=None, normalize=None):
+        """
+        Return vectors for all contents, calling `compute_fn` only for the misses.
+
+        Args:
+            model_id: Embedding model id, part of the cache key
+            contents: List of texts (or base64 images) to embed
+            compute_fn: Function mapping a list of missing contents to their vectors
+            dimensions: Requested embedding size, part of the cache key
+            normalize: Normalize flag sent to the model, part of the cache key
+
+        Returns:
+            List of embedding vectors (as Python lists) in input order
+        """
+        contents = list(contents)
+        cached = self.get_many(model_id, contents, dimensions, normalize)
+
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            # Embed each distinct missing content only once
+            unique = list(dict.fromkeys(contents[i] for i in missing))
+            computed = dict(zip(unique, compute_fn(unique)))
+            self.put_many(model_id, unique, [computed[c] for c in unique], dimensions, normalize)
+            for i in missing:
+                cached[i] = computed[contents[i]]
+
+        return [np.asarray(vector, dtype=np.float32).tolist() for vector in cached]
+
+    def stats(self):
+        """Return hit/miss counters and the current size of the cache."""
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(dim) * 4, 0) FROM entries"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        with self._lock:
+            for store in self._stores.values():
+                store.flush()
+            self._stores.clear()
+            self._db.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain embeddings wrapper that serves repeated texts from an EmbeddingCache.
+
+    Args:
+        embeddings: Embeddings model (or EmbeddingEngine) used for cache misses
+        cache: EmbeddingCache instance
+        model_id: Model id used in the cache key
+        dimensions: Embedding size used in the cache key
+        normalize: Normalize flag used in the cache key
+    """
+
+    def __init__(self, embeddings, cache, model_id, dimensions=None, normalize=None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_id = model_id
+        self.dimensions = dimensions
+        self.normalize = normalize
+
+    def embed_documents(self, texts):
+        return self.cache.get_or_compute(
+            self.model_id, texts, self.embeddings.embed_documents, self.dimensions, self.normalize
+        )
+
+    def embed_query(self, text):
+        return self.cache.get_or_compute(
+            self.model_id, [text], lambda texts: [self.embeddings.embed_query(texts[0])],
+            self.dimensions, self.normalize,
+        )[0]
+
+
+def titan_text_embedding(prompt, bedrock_runtime_client, cache, model_id="amazon.titan-embed-text-v2:0",
+                         dimensions=1024, normalize=True):
+    """
+    Cached version of the `get_embedding` helper from 01-embeddings.
+
+    Args:
+        prompt: Text to embed
+        bedrock_runtime_client: boto3 "bedrock-runtime" client
+        cache: EmbeddingCache instance
+        model_id: Titan text embeddings model id
+        dimensions: Output embedding size (256, 512 or 1024)
+        normalize: Whether Titan should return a unit-length vector
+
+    Returns:
+        The embedding as a list of floats
+    """
+    def compute(prompts):
+        body = json.dumps({"inputText": prompts[0], "dimensions": dimensions, "normalize": normalize})
+        model = bedrock_runtime_client.invoke_model(modelId=model_id, body=body,
+                                                    accept="application/json", contentType="application/json")
+        return [json.loads(model.get("body").read()).get("embedding")]
+
+    return cache.get_or_compute(model_id, [prompt], compute, dimensions, normalize)[0]
+
+
+def titan_multimodal_embedding(bedrock_runtime_client, cache, prompt=None, image=None,
+                               output_embedding_length=384, model_id="amazon.titan-embed-image-v1"):
+    """
+    Cached version of the `generate_multimodal_embeddings` helper from 03-multimodal-rag.
+
+    Args:
+        bedrock_runtime_client: boto3 "bedrock-runtime" client
+        cache: EmbeddingCache instance
+        prompt: Text prompt to embed
+        image: Base64-encoded image to embed
+        output_embedding_length: Output embedding size (256, 384 or 1024)
+        model_id: Titan multimodal embeddings model id
+
+    Returns:
+        The embedding as a list of floats
+    """
+    if not prompt and not image:
+        raise ValueError("Please provide either a text prompt, base64 image, or both as input")
+
+    # Text and image are hashed together, so each combination gets its own entry
+    content = json.dumps({"inputText": prompt, "inputImage": image})
+
+    def compute(_):
+        body = {"embeddingConfig": {"outputEmbeddingLength": output_embedding_length}}
+        if prompt:
+            body["inputText"] = prompt
+        if image:
+            body["inputImage"] = image
+        response = bedrock_runtime_client.invoke_model(modelId=model_id, body=json.dumps(body),
+                                                       accept="application/json", contentType="application/json")
+        return [json.loads(response.get("body").read()).get("embedding")]
+
+    return cache.get_or_compute(model_id, [content], compute, output_embedding_length)[0]
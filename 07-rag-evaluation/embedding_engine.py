@@ -0,0 +1,277 @@
+import hashlib
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.embeddings import Embeddings
+
+# Error codes Bedrock (and botocore) use when a caller is being rate limited
+THROTTLING_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+}
+
+
+class ThrottlingError(Exception):
+    """Raised by StubEmbeddings to simulate a throttled Bedrock request."""
+
+
+def is_throttling_error(error):
+    """Return True if an exception looks like a rate limit from Bedrock."""
+    if isinstance(error, ThrottlingError):
+        return True
+
+    # botocore ClientError carries the error code in its response; other exceptions may
+    # have a response attribute that is None or not a dict
+    response = getattr(error, "response", None)
+    code = ((response if isinstance(response, dict) else {}).get("Error") or {}).get("Code")
+    if code in THROTTLING_ERROR_CODES:
+        return True
+
+    # langchain_aws wraps the ClientError in a ValueError, so fall back to the message
+    message = str(error)
+    return any(code in message for code in THROTTLING_ERROR_CODES) or "Too many requests" in message
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that grows additively on success and halves on throttling (AIMD).
+
+    Args:
+        max_limit: Upper bound on the number of requests in flight
+        initial_limit: Starting limit (default: max_limit)
+        increase_every: Number of consecutive successes before the limit grows by one
+    """
+
+    def __init__(self, max_limit, initial_limit=None, increase_every=4):
+        self.max_limit = max_limit
+        self.limit = initial_limit or max_limit
+        self.increase_every = increase_every
+        self.in_flight = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, throttled=False):
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.increase_every and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+
+class EmbeddingEngine(Embeddings):
+    """
+    Batched, concurrent wrapper around a LangChain embeddings model.
+
+    Texts are grouped into batches that are embedded on a bounded worker pool.
+    The number of batches in flight adapts to throttling: it is halved whenever
+    Bedrock rate limits a request and slowly grows back while requests succeed.
+    The engine implements `embed_documents` and `embed_query`, so it can be passed
+    anywhere LangChain expects an embeddings object (e.g. `FAISS.from_documents`).
+
+    Args:
+        embeddings: Embeddings model to wrap (e.g. BedrockEmbeddings)
+        max_workers: Size of the worker pool (default: 8)
+        batch_size: Number of texts sent to a worker at a time (default: 16)
+        max_retries: Retries per batch after a throttling error (default: 6)
+        base_delay: Initial backoff in seconds, doubled on every retry (default: 0.5)
+        max_delay: Upper bound on a single backoff in seconds (default: 20)
+    """
+
+    def __init__(self, embeddings, max_workers=8, batch_size=16, max_retries=6,
+                 base_delay=0.5, max_delay=20.0):
+        self.embeddings = embeddings
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = AdaptiveLimiter(max_workers)
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Reset the throughput counters."""
+        self.stats = {
+            "texts": 0,
+            "batches": 0,
+            "characters": 0,
+            "throttled": 0,
+            "retries": 0,
+            "seconds": 0.0,
+        }
+
+    def _record(self, **counts):
+        with self._stats_lock:
+            for key, value in counts.items():
+                self.stats[key] += value
+
+    def _embed_batch(self, texts):
+        """Embed one batch, backing off and retrying while it is throttled."""
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+            except Exception as e:
+                self.limiter.release(throttled=is_throttling_error(e))
+                if not is_throttling_error(e) or attempt == self.max_retries:
+                    raise
+                self._record(throttled=1, retries=1)
+
+                # Exponential backoff with full jitter
+                delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+                time.sleep(random.uniform(0, delay))
+            else:
+                self.limiter.release()
+                self._record(batches=1)
+                return vectors
+
+    def embed_documents(self, texts):
+        """
+        Embed a list of texts concurrently.
+
+        Args:
+            texts: List of strings to embed
+
+        Returns:
+            List of embedding vectors in the same order as the input texts
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(self._embed_batch, batches))
+        elapsed = time.perf_counter() - start_time
+
+        self._record(texts=len(texts), characters=sum(len(t) for t in texts), seconds=elapsed)
+
+        return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text):
+        """Embed a single query string (no batching needed)."""
+        return self.embeddings.embed_query(text)
+
+    def throughput_report(self):
+        """Return a one-line summary of the work done so far."""
+        seconds = self.stats["seconds"] or float("nan")
+        return (
+            f"Embedded {self.stats['texts']} texts in {self.stats['batches']} batches "
+            f"in {self.stats['seconds']:.2f}s "
+            f"({self.stats['texts'] / seconds:.1f} texts/s, "
+            f"{self.stats['characters'] / seconds:.0f} chars/s, "
+            f"throttled {self.stats['throttled']}x, final concurrency {self.limiter.limit})"
+        )
+
+
+class StubEmbeddings(Embeddings):
+    """
+    Offline stand-in for BedrockEmbeddings, used to benchmark the engine without AWS.
+
+    Vectors are derived from a hash of the text, so the same text always gets the same
+    unit-length vector. Each request can simulate network latency and, optionally,
+    throttle when too many requests are in flight at once.
+
+    Args:
+        dimensions: Size of the returned vectors (default: 1024, as Titan v2)
+        latency: Simulated seconds per text (default: 0.0)
+        throttle_above: Throttle when more than this many requests overlap (default: None)
+    """
+
+    model_id = "stub-embeddings"
+
+    def __init__(self, dimensions=1024, latency=0.0, throttle_above=None):
+        self.dimensions = dimensions
+        self.model_kwargs = {"dimensions": dimensions}
+        self.latency = latency
+        self.throttle_above = throttle_above
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        rng = random.Random(seed)
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.dimensions)]
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self._in_flight += 1
+            throttled = self.throttle_above is not None and self._in_flight > self.throttle_above
+        try:
+            if throttled:
+                raise ThrottlingError("ThrottlingException: Too many requests, please wait before trying again.")
+            # Titan text embeddings take one text per request
+            time.sleep(self.latency * len(texts))
+            return [self._vector(text) for text in texts]
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+def benchmark(num_texts=512, latency=0.01, max_workers=8, batch_size=16, throttle_above=None):
+    """
+    Compare serial embedding against the engine using StubEmbeddings.
+
+    Returns:
+        Dictionary with the serial and engine timings and the speedup
+    """
+    texts = [f"chunk {i} " + "lorem ipsum " * 50 for i in range(num_texts)]
+    stub = StubEmbeddings(latency=latency, throttle_above=throttle_above)
+
+    start_time = time.perf_counter()
+    serial_vectors = stub.embed_documents(texts)
+    serial_seconds = time.perf_counter() - start_time
+
+    engine = EmbeddingEngine(stub, max_workers=max_workers, batch_size=batch_size, base_delay=0.01)
+    engine_vectors = engine.embed_documents(texts)
+
+    assert engine_vectors == serial_vectors, "engine must preserve input order"
+
+    print(f"Serial: {num_texts} texts in {serial_seconds:.2f}s ({num_texts / serial_seconds:.1f} texts/s)")
+    print(f"Engine: {engine.throughput_report()}")
+
+    return {
+        "serial_seconds": serial_seconds,
+        "engine_seconds": engine.stats["seconds"],
+        "speedup": serial_seconds / engine.stats["seconds"],
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the embedding engine offline with a stub embedder.")
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--latency", type=float, default=0.01, help="Simulated seconds per text")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--throttle-above", type=int, default=None,
+                        help="Simulate throttling above this many concurrent requests")
+    args = parser.parse_args()
+
+    result = benchmark(args.texts, args.latency, args.workers, args.batch_size, args.throttle_above)
+    print(f"Speedup: {result['speedup']:.1f}x")
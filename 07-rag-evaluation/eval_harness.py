@@ -0,0 +1,208 @@
+import asyncio
+import csv
+import json
+import os
+import random
+import re
+import time
+from types import SimpleNamespace
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from rag import build_prompt, get_llm
+
+STAGES = ("embed_query", "search", "clean", "generate")
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def load_dataset(path):
+    """
+    Read question / ground-truth pairs from a JSON, JSONL or CSV file.
+
+    Each record needs a "question" field and a "ground_truth" field
+    ("answer" and "reference" are accepted as aliases for the ground truth).
+
+    Returns:
+        List of dicts with "question" and "ground_truth" keys
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline="", encoding="utf-8") as f:
+        if extension == ".csv":
+            records = list(csv.DictReader(f))
+        elif extension == ".jsonl":
+            records = [json.loads(line) for line in f if line.strip()]
+        else:
+            records = json.load(f)
+
+    dataset = []
+    for record in records:
+        ground_truth = record.get("ground_truth") or record.get("answer") or record.get("reference") or ""
+        dataset.append({"question": record["question"], "ground_truth": ground_truth})
+    return dataset
+
+
+def retrieval_hit(context, ground_truth, threshold=0.5):
+    """True if at least `threshold` of the ground-truth words appear in the retrieved context."""
+    truth_words = set(_WORD_RE.findall(ground_truth.lower()))
+    if not truth_words:
+        return False
+    context_words = set(_WORD_RE.findall(context.lower()))
+    return len(truth_words & context_words) / len(truth_words) >= threshold
+
+
+class StubLLM:
+    """
+    Offline stand-in for ChatBedrock that answers with the first sentence of the context.
+
+    Args:
+        latency: Simulated seconds per generation (default: 0.05)
+        jitter: Extra random latency of up to this many seconds (default: 0.05)
+    """
+
+    def __init__(self, latency=0.05, jitter=0.05):
+        self.latency = latency
+        self.jitter = jitter
+
+    def _respond(self, prompt):
+        context = prompt.split("Context:", 1)[-1].strip().lstrip("['\"")
+        answer = context.split(". ")[0][:300]
+        return SimpleNamespace(
+            content=answer,
+            usage_metadata={"input_tokens": len(prompt.split()), "output_tokens": len(answer.split())},
+        )
+
+    def invoke(self, prompt):
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+        return self._respond(prompt)
+
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+        return self._respond(prompt)
+
+
+def _token_counts(response, prompt):
+    usage = getattr(response, "usage_metadata", None) or {}
+    return (
+        usage.get("input_tokens", len(prompt.split())),
+        usage.get("output_tokens", len(response.content.split())),
+    )
+
+
+async def evaluate_one(record, index, llm, k, semaphore, embeddings=None):
+    """Run retrieval and generation for one question, timing every stage in milliseconds."""
+    embeddings = embeddings or index.embedding_function
+    timings = {}
+
+    async with semaphore:
+        start_time = time.perf_counter()
+        vector = await asyncio.to_thread(embeddings.embed_query, record["question"])
+        timings["embed_query"] = (time.perf_counter() - start_time) * 1000
+
+        start_time = time.perf_counter()
+        vector = np.asarray([vector], dtype=np.float32)
+        if getattr(index, "_normalize_L2", False):
+            faiss.normalize_L2(vector)
+        _, ids = index.index.search(vector, k)
+        docs = [index.docstore.search(index.index_to_docstore_id[i]) for i in ids[0] if i != -1]
+        timings["search"] = (time.perf_counter() - start_time) * 1000
+
+        start_time = time.perf_counter()
+        context, prompt = build_prompt(record["question"], docs)
+        timings["clean"] = (time.perf_counter() - start_time) * 1000
+
+        start_time = time.perf_counter()
+        response = await llm.ainvoke(prompt)
+        timings["generate"] = (time.perf_counter() - start_time) * 1000
+
+    input_tokens, output_tokens = _token_counts(response, prompt)
+    return {
+        "question": record["question"],
+        "ground_truth": record["ground_truth"],
+        "answer": response.content,
+        "retrieval_hit": retrieval_hit(context[0], record["ground_truth"]),
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        **{f"{stage}_ms": timings[stage] for stage in STAGES},
+        "total_ms": sum(timings.values()),
+    }
+
+
+async def run_evaluation(dataset, index, llm, k=2, concurrency=8, embeddings=None):
+    """
+    Evaluate every record of the dataset concurrently.
+
+    Returns:
+        Tuple of (per-question results in dataset order, wall-clock seconds)
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    start_time = time.perf_counter()
+    results = await asyncio.gather(
+        *(evaluate_one(record, index, llm, k, semaphore, embeddings) for record in dataset)
+    )
+    return list(results), time.perf_counter() - start_time
+
+
+def summarize(results, wall_seconds):
+    """Latency percentiles per stage, token totals and retrieval hit rate."""
+    summary = {
+        "questions": len(results),
+        "wall_seconds": wall_seconds,
+        "questions_per_second": len(results) / wall_seconds if wall_seconds else 0.0,
+        "retrieval_hit_rate": float(np.mean([r["retrieval_hit"] for r in results])) if results else 0.0,
+        "input_tokens": int(sum(r["input_tokens"] for r in results)),
+        "output_tokens": int(sum(r["output_tokens"] for r in results)),
+        "latency_ms": {},
+    }
+    for stage in STAGES + ("total",):
+        values = [r[f"{stage}_ms"] for r in results]
+        summary["latency_ms"][stage] = {
+            f"p{p}": float(np.percentile(values, p)) if values else 0.0 for p in (50, 95, 99)
+        }
+    return summary
+
+
+def write_results(results, summary, output_dir):
+    """Write per-question results to results.csv and the summary to summary.json."""
+    os.makedirs(output_dir, exist_ok=True)
+    if results:
+        with open(os.path.join(output_dir, "results.csv"), "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+            writer.writeheader()
+            writer.writerows(results)
+    with open(os.path.join(output_dir, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Evaluate the RAG pipeline over a question/ground-truth dataset.")
+    parser.add_argument("dataset", help="JSON, JSONL or CSV file with question and ground_truth columns")
+    parser.add_argument("--index-dir", default="07-rag-evaluation/vector_store")
+    parser.add_argument("--index-name", default="CWC_index")
+    parser.add_argument("--output-dir", default="07-rag-evaluation/eval_results")
+    parser.add_argument("-k", type=int, default=2, help="Documents retrieved per question")
+    parser.add_argument("--concurrency", type=int, default=8, help="Questions evaluated at the same time")
+    parser.add_argument("--stub", action="store_true",
+                        help="Use the stub embedder and LLM (index must be built with create_vector_store.py --stub)")
+    args = parser.parse_args()
+
+    if args.stub:
+        from embedding_engine import StubEmbeddings
+        embeddings, llm = StubEmbeddings(), StubLLM()
+    else:
+        from langchain_aws import BedrockEmbeddings
+        embeddings = BedrockEmbeddings(model_id='amazon.titan-embed-text-v2:0')
+        llm = get_llm(max_pool_connections=max(args.concurrency, 10))
+
+    index = FAISS.load_local(args.index_dir, embeddings, args.index_name, allow_dangerous_deserialization=True)
+    dataset = load_dataset(args.dataset)
+
+    results, wall_seconds = asyncio.run(run_evaluation(dataset, index, llm, k=args.k, concurrency=args.concurrency))
+    summary = summarize(results, wall_seconds)
+    write_results(results, summary, args.output_dir)
+
+    print(json.dumps(summary, indent=2))
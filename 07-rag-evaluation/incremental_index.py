@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+
+
+def file_hash(path):
+    """SHA-256 hex digest of a file's contents, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_ids_for(source, chunks):
+    """
+    Content-addressed ids for the chunks of one source document.
+
+    A chunk keeps its id as long as its text does not change, so editing one section
+    of a document only changes the ids of the chunks around the edit. Repeated chunks
+    get an occurrence suffix so every id stays unique.
+
+    Args:
+        source: Path (or other identifier) of the source document
+        chunks: List of LangChain Documents produced by the splitter
+
+    Returns:
+        List of chunk ids, one per chunk
+    """
+    ids = []
+    seen = {}
+    for chunk in chunks:
+        digest = hashlib.sha256(f"{source}\0{chunk.page_content}".encode("utf-8")).hexdigest()[:32]
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        ids.append(digest if occurrence == 0 else f"{digest}-{occurrence}")
+    return ids
+
+
+class IndexManifest:
+    """
+    Record of which source documents (and which of their chunks) are in a saved index.
+
+    The manifest is a JSON file saved next to the FAISS index:
+    {"sources": {source: {"hash": <file hash>, "chunk_ids": [...]}}}
+
+    Args:
+        path: Location of the manifest file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.sources = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.sources = json.load(f).get("sources", {})
+
+    @classmethod
+    def for_index(cls, folder_path, index_name):
+        return cls(os.path.join(folder_path, f"{index_name}.manifest.json"))
+
+    def is_unchanged(self, source, doc_hash):
+        return self.sources.get(source, {}).get("hash") == doc_hash
+
+    def chunk_ids(self, source):
+        return self.sources.get(source, {}).get("chunk_ids", [])
+
+    def update(self, source, doc_hash, chunk_ids):
+        self.sources[source] = {"hash": doc_hash, "chunk_ids": list(chunk_ids)}
+
+    def remove(self, source):
+        return self.sources.pop(source, {}).get("chunk_ids", [])
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"sources": self.sources}, f)
+        os.replace(tmp_path, self.path)
+
+
+def missing_sources(manifest, current_paths):
+    """
+    Sources in the manifest whose files no longer exist.
+
+    A source that is still on disk stays in the index even when it is not among the
+    current inputs, so updating a single file leaves the rest of the index alone.
+
+    Args:
+        manifest: IndexManifest for the store
+        current_paths: Files ingested in this run (known to exist)
+    """
+    current_paths = set(current_paths)
+    return [source for source in manifest.sources
+            if source not in current_paths and not os.path.isfile(source)]
+
+
+def remove_sources(db, manifest, sources):
+    """
+    Remove the chunks of the given sources from the index and the manifest.
+
+    Returns:
+        Number of chunks removed from the index
+    """
+    removed = []
+    for source in sources:
+        removed.extend(manifest.remove(source))
+    if removed:
+        db.delete(removed)
+    return len(removed)
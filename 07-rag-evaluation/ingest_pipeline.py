@@ -0,0 +1,288 @@
+import glob
+import os
+import queue
+import re
+import threading
+import time
+from collections import defaultdict
+
+from langchain_community.document_loaders import BSHTMLLoader, PyPDFLoader, TextLoader
+from langchain_community.vectorstores import FAISS
+from langchain_text_splitters import CharacterTextSplitter
+
+from incremental_index import IndexManifest, chunk_ids_for, file_hash, missing_sources, remove_sources
+
+# File types the pipeline knows how to load
+LOADERS = {
+    ".html": BSHTMLLoader,
+    ".htm": BSHTMLLoader,
+    ".pdf": PyPDFLoader,
+    ".txt": TextLoader,
+    ".md": TextLoader,
+}
+
+# Compiled once, used for every document
+_NBSP_RE = re.compile(r"\xa0")
+_SPACES_RE = re.compile(r"[ \t\f\v]+")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n\s*(?:\n\s*)+")
+
+_DONE = object()
+
+
+def discover_files(inputs):
+    """
+    Expand files, directories and glob patterns into a sorted list of loadable files.
+
+    Args:
+        inputs: Iterable of paths, directories (searched recursively) or glob patterns
+
+    Returns:
+        Sorted list of file paths with a supported extension
+    """
+    paths = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "**", "*")
+        for path in glob.glob(pattern, recursive=True):
+            if os.path.isfile(path) and os.path.splitext(path)[1].lower() in LOADERS:
+                paths.add(os.path.normpath(path))
+    return sorted(paths)
+
+
+def clean_document_text(text):
+    """Normalize whitespace without touching the blank lines the splitter splits on."""
+    text = _NBSP_RE.sub(" ", text)
+    text = _SPACES_RE.sub(" ", text)
+    text = _BLANK_LINES_RE.sub("\n\n", text)
+    return text.strip()
+
+
+class StageTimings:
+    """Thread-safe accumulator of busy time and item counts per pipeline stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seconds = defaultdict(float)
+        self.items = defaultdict(int)
+        self.order = []
+
+    def add(self, stage, seconds, items=1):
+        with self._lock:
+            if stage not in self.order:
+                self.order.append(stage)
+            self.seconds[stage] += seconds
+            self.items[stage] += items
+
+    def report(self, wall_seconds=None):
+        lines = [f"{'stage':<10}{'seconds':>10}{'items':>10}"]
+        for stage in self.order:
+            lines.append(f"{stage:<10}{self.seconds[stage]:>10.2f}{self.items[stage]:>10}")
+        if wall_seconds is not None:
+            lines.append(f"{'wall':<10}{wall_seconds:>10.2f}")
+        return "\n".join(lines)
+
+
+def _stage(name, upstream, fn, timings):
+    """Apply `fn` to every upstream item, timing only the work done in this stage."""
+    for item in upstream:
+        start_time = time.perf_counter()
+        results = list(fn(item))
+        timings.add(name, time.perf_counter() - start_time, len(results))
+        yield from results
+
+
+def _prefetch(iterable, maxsize):
+    """
+    Run a generator in a background thread and hand its items over through a bounded queue.
+
+    The bounded queue is what keeps memory flat: a fast stage blocks as soon as it is
+    `maxsize` items ahead of the stage consuming it.
+    """
+    q = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                while not stop.is_set():
+                    try:
+                        q.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            q.put(_DONE)
+        except BaseException as e:
+            q.put(e)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+class SourceChunks:
+    """All chunks of one source document as they move through the pipeline."""
+
+    def __init__(self, source, doc_hash, chunks=None):
+        self.source = source
+        self.doc_hash = doc_hash
+        self.chunks = chunks or []
+        self.ids = []
+        self.new_chunks = []
+        self.new_ids = []
+        self.vectors = []
+
+
+class IngestPipeline:
+    """
+    Streaming load -> clean -> split -> embed -> index pipeline for the FAISS vector store.
+
+    Every stage runs in its own thread and passes one source document at a time to the
+    next stage through a bounded queue, so loading the next file overlaps with embedding
+    the current one and at most `queue_size` documents are held per stage. In incremental
+    mode, unchanged files are skipped before they are loaded and only new chunks of
+    changed files are embedded (see incremental_index.py).
+
+    Args:
+        embeddings: LangChain embeddings object (typically an EmbeddingEngine)
+        index_dir: Folder the FAISS index is saved to
+        index_name: Name of the FAISS index
+        chunk_size: Maximum chunk size in characters (default: 1000)
+        chunk_overlap: Overlap between chunks in characters (default: 200)
+        queue_size: Maximum number of documents buffered between stages (default: 4)
+        incremental: Update the saved index instead of rebuilding it (default: False)
+    """
+
+    def __init__(self, embeddings, index_dir, index_name, chunk_size=1000, chunk_overlap=200,
+                 queue_size=4, incremental=False):
+        self.embeddings = embeddings
+        self.index_dir = index_dir
+        self.index_name = index_name
+        self.text_splitter = CharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self.queue_size = queue_size
+        self.incremental = incremental
+        self.timings = StageTimings()
+        self.manifest = IndexManifest.for_index(index_dir, index_name)
+        self.db = None
+        self.wall_seconds = 0.0
+        self.counts = defaultdict(int)
+
+    def _index_exists(self):
+        return os.path.exists(os.path.join(self.index_dir, f"{self.index_name}.faiss"))
+
+    # Pipeline stages: each takes one item and yields zero or more items for the next stage
+
+    def _hash(self, path):
+        doc_hash = file_hash(path)
+        if self.incremental and self.manifest.is_unchanged(path, doc_hash):
+            self.counts["unchanged"] += 1
+            return
+        yield SourceChunks(path, doc_hash)
+
+    def _load(self, source):
+        loader = LOADERS[os.path.splitext(source.source)[1].lower()](source.source)
+        source.chunks = list(loader.lazy_load())
+        yield source
+
+    def _clean(self, source):
+        for doc in source.chunks:
+            doc.page_content = clean_document_text(doc.page_content)
+        yield source
+
+    def _split(self, source):
+        source.chunks = self.text_splitter.split_documents(source.chunks)
+        source.ids = chunk_ids_for(source.source, source.chunks)
+        yield source
+
+    def _embed(self, source):
+        # Chunks already in the index keep their vectors
+        old_ids = set(self.manifest.chunk_ids(source.source)) if self.incremental else set()
+        for chunk_id, chunk in zip(source.ids, source.chunks):
+            if chunk_id not in old_ids:
+                source.new_ids.append(chunk_id)
+                source.new_chunks.append(chunk)
+        if source.new_chunks:
+            source.vectors = self.embeddings.embed_documents([c.page_content for c in source.new_chunks])
+        yield source
+
+    def _add(self, source):
+        removed = set(self.manifest.chunk_ids(source.source)) - set(source.ids) if self.incremental else set()
+        if removed and self.db is not None:
+            self.db.delete(list(removed))
+
+        if source.new_chunks:
+            text_embeddings = list(zip([c.page_content for c in source.new_chunks], source.vectors))
+            metadatas = [c.metadata for c in source.new_chunks]
+            if self.db is None:
+                self.db = FAISS.from_embeddings(text_embeddings, self.embeddings, metadatas=metadatas, ids=source.new_ids)
+            else:
+                self.db.add_embeddings(text_embeddings, metadatas=metadatas, ids=source.new_ids)
+
+        self.manifest.update(source.source, source.doc_hash, source.ids)
+        self.counts["sources"] += 1
+        self.counts["added"] += len(source.new_ids)
+        self.counts["removed"] += len(removed)
+        yield source
+
+    def run(self, inputs):
+        """
+        Ingest all files matched by `inputs` and save the index.
+
+        Args:
+            inputs: Iterable of paths, directories or glob patterns
+
+        Returns:
+            The LangChain FAISS vector store
+        """
+        start_time = time.perf_counter()
+        os.makedirs(self.index_dir, exist_ok=True)
+
+        if self.incremental and self._index_exists() and self.manifest.sources:
+            self.db = FAISS.load_local(self.index_dir, self.embeddings, self.index_name,
+                                       allow_dangerous_deserialization=True)
+        else:
+            self.incremental = False
+            self.manifest.sources = {}
+
+        paths = discover_files(inputs)
+        if not paths:
+            raise ValueError(f"No HTML, PDF or text files found in {list(inputs)}")
+
+        # Chain the stages, each running in its own thread
+        stream = iter(paths)
+        for name, fn in [("hash", self._hash), ("load", self._load), ("clean", self._clean),
+                         ("split", self._split), ("embed", self._embed)]:
+            stream = _prefetch(_stage(name, stream, fn, self.timings), self.queue_size)
+        for _ in _stage("index", stream, self._add, self.timings):
+            pass
+
+        # Drop sources whose files no longer exist; sources that were simply not among
+        # this run's inputs keep their chunks
+        if self.db is not None:
+            self.counts["removed"] += remove_sources(self.db, self.manifest, missing_sources(self.manifest, paths))
+
+        if self.db is not None:
+            start_save = time.perf_counter()
+            self.db.save_local(self.index_dir, self.index_name)
+            self.manifest.save()
+            self.timings.add("save", time.perf_counter() - start_save)
+
+        self.wall_seconds = time.perf_counter() - start_time
+        return self.db
+
+    def report(self):
+        """Per-stage timings plus a summary of what changed."""
+        summary = (f"Ingested {self.counts['sources']} sources "
+                   f"({self.counts['unchanged']} unchanged): "
+                   f"added {self.counts['added']} chunks, removed {self.counts['removed']} chunks")
+        return summary + "\n" + self.timings.report(self.wall_seconds)
@@ -0,0 +1,130 @@
+import functools
+import re
+
+import faiss
+import numpy as np
+from botocore.config import Config
+from langchain_aws import ChatBedrock
+
+MODEL_ID = "anthropic.claude-3-sonnet-20240229-v1:0"
+
+PROMPT_TEMPLATE = """
+    Given the context below answer the question.
+
+    Question: {query}
+
+    Context: {context}
+
+    Remember to answer only based on the context provided and not from any other source.
+
+    If the question cannot be answered based on the provided context, say I don't know.
+    """
+
+# Compiled once instead of on every call
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+_CITATION_RE = re.compile(r'\[.*?\]')
+
+
+def clean_text(text):
+    """Clean and standardize retrieved text (same rules as `clean_text` in rag-eval.ipynb)."""
+    # Convert non-breaking spaces to regular spaces
+    text = text.replace('\xa0', ' ')
+
+    # Remove HTML tags
+    text = _HTML_TAG_RE.sub('', text)
+
+    # Remove citation references like [1], [2,3], etc.
+    text = _CITATION_RE.sub('', text)
+
+    # Normalize whitespace by removing extra spaces and line breaks
+    return ' '.join(text.split())
+
+
+@functools.lru_cache(maxsize=None)
+def get_llm(model_id=MODEL_ID, temperature=0, max_tokens=2048, max_pool_connections=32):
+    """
+    Return a ChatBedrock client shared by every call with the same settings.
+
+    The underlying boto3 client keeps a connection pool large enough for
+    `max_pool_connections` concurrent generations and retries throttled calls
+    with botocore's adaptive retry mode.
+    """
+    return ChatBedrock(
+        model_id=model_id,
+        model_kwargs={
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        },
+        config=Config(
+            max_pool_connections=max_pool_connections,
+            retries={"max_attempts": 10, "mode": "adaptive"},
+        ),
+    )
+
+
+def retrieve_batch(queries, index, k=2, embeddings=None):
+    """
+    Retrieve the top-k documents for many queries with a single FAISS search.
+
+    Args:
+        queries: List of query strings
+        index: LangChain FAISS vector store
+        k: Number of documents per query (default: 2)
+        embeddings: Embeddings used for the queries (default: the index's own)
+
+    Returns:
+        List with the retrieved Documents for each query, in input order
+    """
+    embeddings = embeddings or index.embedding_function
+    vectors = np.asarray(embeddings.embed_documents(list(queries)), dtype=np.float32)
+    if getattr(index, "_normalize_L2", False):
+        faiss.normalize_L2(vectors)
+
+    _, ids = index.index.search(vectors, k)
+
+    return [
+        [index.docstore.search(index.index_to_docstore_id[i]) for i in row if i != -1]
+        for row in ids
+    ]
+
+
+def build_prompt(query, docs):
+    """Return (retrieved_context, augmented_prompt) for a query and its documents."""
+    retrieved_context = [clean_text("".join(doc.page_content for doc in docs))]
+    return retrieved_context, PROMPT_TEMPLATE.format(query=query, context=retrieved_context)
+
+
+def rag_function(query, index, llm=None):
+    """Answer one query; same output as `rag_function` in rag-eval.ipynb, without a new client per call."""
+    return rag_batch([query], index, llm=llm)[0]
+
+
+def rag_batch(queries, index, k=2, max_concurrency=8, llm=None, embeddings=None):
+    """
+    Answer many queries with one vectorized search and concurrent generations.
+
+    Args:
+        queries: List of query strings
+        index: LangChain FAISS vector store
+        k: Number of documents retrieved per query (default: 2)
+        max_concurrency: Maximum number of generations in flight (default: 8)
+        llm: Chat model to use (default: the shared client from get_llm())
+        embeddings: Embeddings used for the queries (default: the index's own)
+
+    Returns:
+        List of (retrieved_context, answer) tuples in the same order as `queries`
+    """
+    queries = list(queries)
+    if not queries:
+        return []
+
+    llm = llm or get_llm(max_pool_connections=max(max_concurrency, 10))
+
+    # Retrieve relevant documents for all queries at once
+    retrieved = retrieve_batch(queries, index, k=k, embeddings=embeddings)
+    contexts, prompts = zip(*(build_prompt(query, docs) for query, docs in zip(queries, retrieved)))
+
+    # Generate responses concurrently; batch() returns them in input order
+    responses = llm.batch(list(prompts), config={"max_concurrency": max_concurrency})
+
+    return [(context, response.content) for context, response in zip(contexts, responses)]
@@ -1,25 +1,135 @@
 import re
 import unicodedata
 import html
-from bs4 import BeautifulSoup
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-import spacy
+import functools
+from concurrent.futures import ProcessPoolExecutor
 
-# Download NLTK resources (run once)
-nltk.download('punkt')
-nltk.download('stopwords')
+# BeautifulSoup, NLTK and spaCy are imported on first use (see _nltk() and get_spacy_nlp()),
+# so importing this module stays fast and never touches the network
 
-class TextCleaner:
-    def __init__(self):
+# NLTK resources used by the cleaners: download name -> nltk.data path
+NLTK_RESOURCES = {
+    'punkt': 'tokenizers/punkt',
+    'punkt_tab': 'tokenizers/punkt_tab',
+    'stopwords': 'corpora/stopwords',
+}
+
+DEFAULT_SPACY_MODEL = 'en_core_web_sm'
+
+# Regular expressions compiled once and shared by every cleaning call
+_REFERENCES_RE = re.compile(r'\[.*?\]')
+_URLS_RE = re.compile(r'http[s]?://\S+')
+# A tag, skipping over quoted attribute values, which may contain '>' (as in <a title="x>y">)
+_TAG_RE = re.compile(r'''<[a-zA-Z/!?](?:[^<>"']|"[^"]*"|'[^']*')*>''')
+_MARKUP_RE = re.compile(r'<[a-zA-Z/!?]')
+_COMPLEX_MARKUP_RE = re.compile(r'<(?:script|style|!--|!\[CDATA\[)', re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=None)
+def _nltk():
+    """Import NLTK and make sure its resources are available, once per process."""
+    import nltk
+
+    for name, path in NLTK_RESOURCES.items():
         try:
-            self.nlp = spacy.load('en_core_web_sm')
-        except OSError:
-            print("Downloading spaCy model 'en_core_web_sm'...")
-            from spacy.cli import download
-            download('en_core_web_sm')
-            self.nlp = spacy.load('en_core_web_sm')
+            nltk.data.find(path)
+        except LookupError:
+            print(f"Downloading NLTK resource '{name}' (run prepare() ahead of time to avoid this)...")
+            nltk.download(name, quiet=True)
+    return nltk
+
+
+def word_tokenize(text):
+    """nltk.word_tokenize, loading NLTK on first use."""
+    return _nltk().word_tokenize(text)
+
+
+@functools.lru_cache(maxsize=None)
+def _stopword_set(language='english'):
+    """NLTK stopwords as a set, built once per process."""
+    return frozenset(_nltk().corpus.stopwords.words(language))
+
+
+@functools.lru_cache(maxsize=None)
+def get_spacy_nlp(model=DEFAULT_SPACY_MODEL):
+    """Load a spaCy pipeline once per process; every TextCleaner shares it."""
+    import spacy
+
+    try:
+        return spacy.load(model)
+    except OSError:
+        print(f"Downloading spaCy model '{model}' (run prepare() ahead of time to avoid this)...")
+        from spacy.cli import download
+        download(model)
+        return spacy.load(model)
+
+
+def prepare(spacy_model=DEFAULT_SPACY_MODEL):
+    """
+    Download and load every NLTK resource and the spaCy model up front.
+    
+    Run this once while building the environment (e.g. `python utils.py`), so
+    workers never download anything when they first clean a text.
+    """
+    nltk = _nltk()
+    for name in NLTK_RESOURCES:
+        nltk.download(name, quiet=True)
+    _stopword_set()
+    get_spacy_nlp(spacy_model)
+
+
+def _strip_markup(text):
+    """
+    Remove HTML tags, using a regex when the markup is simple enough.
+
+    BeautifulSoup is only used for input with script/style blocks, comments or
+    tags the regex cannot match; plain text skips tag handling entirely.
+    """
+    if not _MARKUP_RE.search(text):
+        # html.parser decodes entities left in the text, so do the same
+        return html.unescape(text) if '&' in text else text
+
+    if not _COMPLEX_MARKUP_RE.search(text):
+        stripped = _TAG_RE.sub(' ', text)
+        if not _MARKUP_RE.search(stripped):
+            return html.unescape(stripped) if '&' in stripped else stripped
+
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(text, "html.parser").get_text(separator=" ")
+
+
+def clean_text_fast(text):
+    """Same result as TextCleaner.clean_text_bs4, without building a parse tree for simple input."""
+    if not text or not isinstance(text, str):
+        return ""
+
+    text = _strip_markup(html.unescape(text))
+    text = _REFERENCES_RE.sub('', text)
+    text = _URLS_RE.sub('', text)
+    text = unicodedata.normalize('NFKC', text)
+    return ' '.join(text.split())
+
+
+def _clean_one(text, method="bs4", remove_stopwords=False):
+    """Clean a single string with the fast path (module level so process pools can pickle it)."""
+    text = clean_text_fast(text)
+    if method == "nltk" and text:
+        tokens = word_tokenize(text)
+        if remove_stopwords:
+            stop_words = _stopword_set()
+            tokens = [word for word in tokens if word.lower() not in stop_words]
+        text = ' '.join(tokens)
+    return text
+
+
+class TextCleaner:
+    def __init__(self, spacy_model=DEFAULT_SPACY_MODEL):
+        self.spacy_model = spacy_model
+
+    @property
+    def nlp(self):
+        """The spaCy pipeline, loaded the first time a spaCy method is used."""
+        return get_spacy_nlp(self.spacy_model)
 
     def clean_text_bs4(self, text):
         """Clean text using BeautifulSoup for better HTML handling."""
@@ -30,14 +140,15 @@ class TextCleaner:
         text = html.unescape(text)
         
         # Use BeautifulSoup to remove HTML tags
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(text, "html.parser")
         text = soup.get_text(separator=" ")
         
         # Remove references in brackets
-        text = re.sub(r'\[.*?\]', '', text)
+        text = _REFERENCES_RE.sub('', text)
         
         # Remove URLs
-        text = re.sub(r'http[s]?://\S+', '', text)
+        text = _URLS_RE.sub('', text)
         
         # Normalize unicode characters
         text = unicodedata.normalize('NFKC', text)
@@ -60,7 +171,7 @@ class TextCleaner:
         
         # Remove stopwords if requested
         if remove_stopwords:
-            stop_words = set(stopwords.words('english'))
+            stop_words = _stopword_set()
             tokens = [word for word in tokens if word.lower() not in stop_words]
         
         # Rejoin tokens
@@ -89,23 +200,54 @@ class TextCleaner:
         # Process with spaCy
         doc = self.nlp(text)
         
+        # Rejoin tokens
+        text = ' '.join(self._spacy_tokens(doc, remove_stopwords, lemmatize))
+        
+        return text
+
+    @staticmethod
+    def _spacy_tokens(doc, remove_stopwords=False, lemmatize=False):
+        """Select token text or lemmas from a spaCy Doc, optionally dropping stopwords."""
         if lemmatize and remove_stopwords:
             # Return lemmatized text without stopwords
-            tokens = [token.lemma_ for token in doc if not token.is_stop]
+            return [token.lemma_ for token in doc if not token.is_stop]
         elif lemmatize:
             # Return lemmatized text with stopwords
-            tokens = [token.lemma_ for token in doc]
+            return [token.lemma_ for token in doc]
         elif remove_stopwords:
             # Return original text without stopwords
-            tokens = [token.text for token in doc if not token.is_stop]
+            return [token.text for token in doc if not token.is_stop]
         else:
             # Return all tokens as they appeared
-            tokens = [token.text for token in doc]
+            return [token.text for token in doc]
+
+    def clean_text_spacy_batch(self, texts, remove_stopwords=False, lemmatize=False, batch_size=256, n_process=1):
+        """
+        Stream cleaned texts through spaCy with nlp.pipe, running only the components needed.
         
-        # Rejoin tokens
-        text = ' '.join(tokens)
+        Stopword flags are lexical attributes, so without lemmatization every pipeline
+        component is disabled and only the tokenizer runs. Lemmatization keeps the
+        components the lemmatizer depends on (tok2vec, tagger, attribute_ruler) while
+        the parser and NER are always skipped.
         
-        return text
+        Args:
+            texts: Iterable of strings to clean
+            remove_stopwords: Whether to remove common stopwords
+            lemmatize: Whether to perform lemmatization
+            batch_size: Number of texts spaCy processes at a time
+            n_process: Number of processes spaCy uses
+            
+        Yields:
+            Cleaned text for each input, in input order
+        """
+        needed = {"tok2vec", "tagger", "attribute_ruler", "lemmatizer"} if lemmatize else set()
+        disable = [name for name in self.nlp.pipe_names if name not in needed]
+        
+        # Basic cleaning happens lazily as spaCy pulls texts
+        cleaned = (clean_text_fast(text) for text in texts)
+        
+        for doc in self.nlp.pipe(cleaned, batch_size=batch_size, n_process=n_process, disable=disable):
+            yield ' '.join(self._spacy_tokens(doc, remove_stopwords, lemmatize))
 
     def clean_text_for_rag(self, text, method="bs4"):
         """
@@ -122,7 +264,7 @@ class TextCleaner:
             return ""
         
         if method == "basic":
-            return self.clean_text_basic(text)
+            return clean_text_fast(text)
         elif method == "bs4":
             return self.clean_text_bs4(text)
         elif method == "nltk":
@@ -132,3 +274,38 @@ class TextCleaner:
         else:
             # Default to bs4 method
             return self.clean_text_bs4(text)
+
+    def clean_batch(self, texts, method="bs4", remove_stopwords=False, lemmatize=False, n_jobs=1, chunksize=256):
+        """
+        Clean many strings at once, using precompiled patterns and a markup fast path.
+        
+        Args:
+            texts: Iterable of strings to clean
+            method: Cleaning method to use ('basic', 'bs4', 'nltk' or 'spacy')
+            remove_stopwords: Whether to remove stopwords (nltk and spacy methods)
+            lemmatize: Whether to perform lemmatization (spacy method only)
+            n_jobs: Number of worker processes (default: 1, no pool)
+            chunksize: Number of strings sent to a worker at a time (spaCy batch size)
+            
+        Returns:
+            List of cleaned strings in input order
+        """
+        if method == "spacy":
+            return list(self.clean_text_spacy_batch(texts, remove_stopwords, lemmatize,
+                                                    batch_size=chunksize, n_process=n_jobs or 1))
+        
+        if method not in ("basic", "bs4", "nltk"):
+            raise ValueError(f"Unsupported batch cleaning method: {method}")
+        
+        clean = functools.partial(_clean_one, method=method, remove_stopwords=remove_stopwords)
+        
+        if n_jobs and n_jobs > 1:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                return list(executor.map(clean, texts, chunksize=chunksize))
+        
+        return [clean(text) for text in texts]
+
+
+if __name__ == "__main__":
+    prepare()
+    print("NLTK resources and spaCy model are ready.")